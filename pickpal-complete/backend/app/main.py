@@ -15,6 +15,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from src.planner.agent import PlannerAgent
 from src.common.utils import logger, generate_request_id
+from src.common.categories import CATEGORY_KEYWORDS
+from src.common.deadline import Deadline
 from src.discovery.simple_gemini import SimpleGeminiSearch
 
 app = FastAPI(title="AI Shopping API", description="AI-powered product recommendation system with agent architecture")
@@ -51,6 +53,11 @@ async def startup_event():
     await init_db()
     logger.info("AI Shopping API started with agent architecture")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await planner.result_cache.close()
+    await planner.ranker.calibrator.flush()
+
 @app.get("/health")
 async def health_check():
     logger.info("Health check endpoint called")
@@ -61,6 +68,8 @@ class SearchQuery(BaseModel):
     max_price: Optional[float] = None
     min_rating: Optional[float] = None
     use_agent_pipeline: Optional[bool] = False  # True for hardcoded options, False for search
+    session_id: Optional[str] = None  # Conversation id; follow-ups refine the previous search locally
+    clarify: Optional[bool] = False  # Ask clarification questions for vague queries (agent pipeline only)
 
 class SearchHistoryItem(BaseModel):
     id: str
@@ -84,49 +93,52 @@ class ProductRecommendation(BaseModel):
     summary: str
     review_count: int
     image_url: Optional[str] = None
+    category: Optional[str] = None  # Set when an ambiguous query was searched in several categories
 
 class SearchResponse(BaseModel):
     query: str
     recommendations: List[ProductRecommendation]
     total_found: int
+    degraded: List[str] = []  # Stages that returned partial results when the request ran out of time
+    clarification: Optional[Dict[str, Any]] = None  # Questions to answer via /clarify, if asked
+
+class ClarificationAnswers(BaseModel):
+    clarification_id: str
+    answers: Dict[str, Any]  # e.g. {"budget": "under $150", "use_case": "exercise"}
 
 @app.get("/healthz")
 async def healthz():
     return {"status": "ok"}
 
-async def search_stream_generator(query: str, constraints: Dict, request_id: str) -> AsyncGenerator[str, None]:
+async def search_stream_generator(query: str, constraints: Dict, request_id: str,
+                                  session_id: Optional[str] = None) -> AsyncGenerator[str, None]:
     """Generator for streaming search progress updates."""
+    deadline = Deadline.from_env()  # REQUEST_TIMEOUT budget for the whole request
     
-    # Send initial status
-    yield f"data: {json.dumps({'type': 'status', 'agent': 'planner', 'message': 'Starting search pipeline...'})}\n\n"
-    await asyncio.sleep(0.5)
-    
-    # Send clarifier status
-    yield f"data: {json.dumps({'type': 'status', 'agent': 'clarifier', 'message': 'Analyzing your request...'})}\n\n"
-    await asyncio.sleep(1)
-    
-    # Send discovery status
-    yield f"data: {json.dumps({'type': 'status', 'agent': 'discovery', 'message': 'Discovering products from multiple sources...'})}\n\n"
-    await asyncio.sleep(1.5)
+    # Progress is paced for display; a cached answer is ready now, so skip the delays
+    cached = planner.has_cached_result(query, constraints, session_id)
+    stages = [
+        ("planner", "Starting search pipeline...", 0.5),
+        ("clarifier", "Analyzing your request...", 1),
+        ("discovery", "Discovering products from multiple sources...", 1.5),
+        ("normalizer", "Enriching product data and quality signals...", 1),
+        ("ranker", "Ranking products and analyzing pros/cons...", 1),
+        ("verifier", "Verifying results and quality checks...", 0.5),
+    ]
     
-    # Send normalizer status
-    yield f"data: {json.dumps({'type': 'status', 'agent': 'normalizer', 'message': 'Enriching product data and quality signals...'})}\n\n"
-    await asyncio.sleep(1)
-    
-    # Send ranker status
-    yield f"data: {json.dumps({'type': 'status', 'agent': 'ranker', 'message': 'Ranking products and analyzing pros/cons...'})}\n\n"
-    await asyncio.sleep(1)
-    
-    # Send verifier status
-    yield f"data: {json.dumps({'type': 'status', 'agent': 'verifier', 'message': 'Verifying results and quality checks...'})}\n\n"
-    await asyncio.sleep(0.5)
+    for agent, message, delay in stages:
+        yield f"data: {json.dumps({'type': 'status', 'agent': agent, 'message': message})}\n\n"
+        if not cached:
+            await asyncio.sleep(delay)
     
     try:
         # Execute the actual search
         result = await planner.handle_user_goal(
             query=query,
             constraints=constraints,
-            request_id=request_id
+            request_id=request_id,
+            deadline=deadline,
+            session_id=session_id
         )
         
         if not result["success"]:
@@ -155,7 +167,8 @@ async def search_stream_generator(query: str, constraints: Dict, request_id: str
             "data": {
                 "query": query,
                 "recommendations": recommendations,
-                "total_found": result["total_found"]
+                "total_found": result["total_found"],
+                "degraded": result.get("degraded", [])
             }
         }
         yield f"data: {json.dumps(final_response)}\n\n"
@@ -178,7 +191,7 @@ async def search_products_stream(query: SearchQuery):
         constraints["min_rating"] = query.min_rating
     
     return StreamingResponse(
-        search_stream_generator(query.query, constraints, request_id),
+        search_stream_generator(query.query, constraints, request_id, query.session_id),
         media_type="text/plain",
         headers={
             "Cache-Control": "no-cache",
@@ -186,11 +199,45 @@ async def search_products_stream(query: SearchQuery):
         }
     )
 
+def agent_result_to_response(query: str, result: Dict) -> SearchResponse:
+    """Convert agent pipeline results to API format."""
+    if not result["success"]:
+        return SearchResponse(
+            query=query,
+            recommendations=[],
+            total_found=0
+        )
+    
+    recommendations = []
+    for rec in result["recommendations"]:
+        recommendation = ProductRecommendation(
+            name=rec["name"],
+            price=rec["price"],
+            rating=rec["rating"],
+            overall_score=rec["overall_score"],
+            pros=rec["pros"],
+            cons=rec["cons"],
+            summary=rec["summary"],
+            review_count=rec["review_count"],
+            image_url=rec.get("image_url"),
+            category=rec.get("category")
+        )
+        recommendations.append(recommendation)
+    
+    return SearchResponse(
+        query=query,
+        recommendations=recommendations,
+        total_found=result["total_found"],
+        degraded=result.get("degraded", []),
+        clarification=result.get("clarification")
+    )
+
 @app.post("/search", response_model=SearchResponse)
 async def search_products(query: SearchQuery):
     """Search for products - uses Gemini directly for search, agent pipeline for hardcoded options."""
     try:
         request_id = generate_request_id()
+        deadline = Deadline.from_env()  # REQUEST_TIMEOUT budget for the whole request
         logger.info(f"[{request_id}] Received search request: {query.query}")
         logger.info(f"[{request_id}] Use agent pipeline: {query.use_agent_pipeline}")
         
@@ -208,37 +255,13 @@ async def search_products(query: SearchQuery):
             result = await planner.handle_user_goal(
                 query=query.query,
                 constraints=constraints,
-                request_id=request_id
+                request_id=request_id,
+                deadline=deadline,
+                session_id=query.session_id,
+                clarify=query.clarify
             )
             
-            if not result["success"]:
-                return SearchResponse(
-                    query=query.query,
-                    recommendations=[],
-                    total_found=0
-                )
-            
-            # Convert agent results to API format
-            recommendations = []
-            for rec in result["recommendations"]:
-                recommendation = ProductRecommendation(
-                    name=rec["name"],
-                    price=rec["price"],
-                    rating=rec["rating"],
-                    overall_score=rec["overall_score"],
-                    pros=rec["pros"],
-                    cons=rec["cons"],
-                    summary=rec["summary"],
-                    review_count=rec["review_count"],
-                    image_url=rec.get("image_url")
-                )
-                recommendations.append(recommendation)
-            
-            return SearchResponse(
-                query=query.query,
-                recommendations=recommendations,
-                total_found=result["total_found"]
-            )
+            return agent_result_to_response(query.query, result)
         
         else:
             # Search function - use Gemini directly
@@ -247,7 +270,8 @@ async def search_products(query: SearchQuery):
             gemini_results = await simple_gemini.search_simple(
                 query=query.query,
                 max_price=query.max_price,
-                min_rating=query.min_rating
+                min_rating=query.min_rating,
+                deadline=deadline
             )
             
             # Convert Gemini results to API format
@@ -269,17 +293,40 @@ async def search_products(query: SearchQuery):
             return SearchResponse(
                 query=query.query,
                 recommendations=recommendations,
-                total_found=len(recommendations)
+                total_found=len(recommendations),
+                degraded=deadline.degraded
             )
         
     except Exception as e:
         logger.error(f"Search failed: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing search: {str(e)}")
 
+@app.post("/clarify", response_model=SearchResponse)
+async def answer_clarification(request: ClarificationAnswers):
+    """Answer clarification questions from /search; results come from the discovery already under way."""
+    try:
+        request_id = generate_request_id()
+        logger.info(f"[{request_id}] Received answers for clarification {request.clarification_id}")
+        
+        pending = planner.pending_clarifications.get(request.clarification_id)
+        query = pending.brief.query if pending else ""
+        
+        result = await planner.answer_clarification(
+            request.clarification_id,
+            request.answers,
+            request_id=request_id,
+            deadline=Deadline.from_env()
+        )
+        return agent_result_to_response(query, result)
+        
+    except Exception as e:
+        logger.error(f"Clarification failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing clarification: {str(e)}")
+
 @app.get("/categories")
 async def get_categories():
     """Get available product categories."""
-    return {"categories": ["wireless_earbuds", "standing_desk", "laptop"]}
+    return {"categories": list(CATEGORY_KEYWORDS)}
 
 @app.get("/search-history", response_model=List[SearchHistoryItem])
 async def get_search_history():
@@ -0,0 +1,80 @@
+"""Throughput benchmark for aspect keyword extraction.
+
+Compares the compiled per-category AspectMatcher against the previous
+sentence x aspect x keyword substring loop on the mock review corpus.
+
+Usage (from the backend directory):
+    python demo/bench_aspects.py [--reviews 20000]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.common.aspects import ASPECT_KEYWORDS, extract_aspects_from_text
+
+MOCKS_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'common', 'mocks')
+
+def legacy_extract_aspects(text: str, category: str):
+    """Reference implementation: substring check per sentence, aspect and keyword."""
+    sentences = re.split(r'[.!?]+', text)
+    aspect_mentions = defaultdict(list)
+    aspect_keywords = ASPECT_KEYWORDS.get(category, {})
+
+    for sentence in sentences:
+        sentence = sentence.strip().lower()
+        if not sentence:
+            continue
+        for aspect, keywords in aspect_keywords.items():
+            if any(keyword in sentence for keyword in keywords):
+                aspect_mentions[aspect].append(sentence)
+
+    return dict(aspect_mentions)
+
+def load_corpus(n_reviews: int):
+    """Load (text, category) pairs from the mock review files, repeated to size."""
+    corpus = []
+    for filename in sorted(os.listdir(MOCKS_DIR)):
+        with open(os.path.join(MOCKS_DIR, filename)) as f:
+            data = json.load(f)
+        for product in data.get("products", []):
+            category = product.get("meta", {}).get("category", "general")
+            for review in product.get("reviews", []):
+                corpus.append((review.get("text", ""), category))
+
+    if not corpus:
+        raise SystemExit(f"No reviews found in {MOCKS_DIR}")
+
+    return (corpus * (n_reviews // len(corpus) + 1))[:n_reviews]
+
+def run(fn, corpus) -> float:
+    start = time.perf_counter()
+    for text, category in corpus:
+        fn(text, category)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reviews", type=int, default=20000, help="number of reviews to process")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.reviews)
+
+    # Warm up (compiles the matchers)
+    run(extract_aspects_from_text, corpus[:100])
+
+    legacy = run(legacy_extract_aspects, corpus)
+    compiled = run(extract_aspects_from_text, corpus)
+
+    print(f"reviews:  {len(corpus)}")
+    print(f"legacy:   {legacy:.3f}s ({len(corpus) / legacy:,.0f} reviews/s)")
+    print(f"compiled: {compiled:.3f}s ({len(corpus) / compiled:,.0f} reviews/s)")
+    print(f"speedup:  {legacy / compiled:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 import re
+from functools import lru_cache
 from typing import Dict, List, Set, Tuple
 from collections import defaultdict, Counter
+import numpy as np
+from .messages import ReviewAnalysis
+from .sentiment import POSITIVE_INDICATORS, NEGATIVE_INDICATORS, get_sentiment_engine
 
 # Aspect keywords for different product categories
 ASPECT_KEYWORDS = {
@@ -39,18 +43,36 @@ ASPECT_KEYWORDS = {
     }
 }
 
-# Sentiment indicators for aspects
-POSITIVE_INDICATORS = [
-    "excellent", "amazing", "great", "good", "perfect", "love", "best", "fantastic", 
-    "outstanding", "incredible", "wonderful", "awesome", "superb", "brilliant",
-    "impressive", "solid", "reliable", "smooth", "comfortable", "easy", "clear"
-]
-
-NEGATIVE_INDICATORS = [
-    "terrible", "awful", "bad", "worst", "hate", "horrible", "disappointing",
-    "poor", "cheap", "flimsy", "uncomfortable", "difficult", "hard", "annoying",
-    "frustrating", "issues", "problems", "broken", "defective", "useless"
-]
+# Aspect importance per use case (aspects missing from a category are ignored)
+USE_CASE_ASPECT_WEIGHTS = {
+    "work": {
+        "call_quality": 0.6, "comfort": 0.5, "battery_life": 0.4, "noise_cancellation": 0.3,
+        "performance": 0.6, "keyboard": 0.5, "display": 0.4,
+        "stability": 0.6, "height_range": 0.4, "desktop_quality": 0.4
+    },
+    "exercise": {
+        "comfort": 1.0, "build_quality": 0.5, "connectivity": 0.4, "controls": 0.4, "battery_life": 0.3
+    },
+    "travel": {
+        "noise_cancellation": 0.8, "battery_life": 0.8, "comfort": 0.4, "weight": 0.8, "build_quality": 0.3
+    },
+    "gaming": {
+        "performance": 1.0, "display": 0.6, "keyboard": 0.3, "connectivity": 0.5, "sound_quality": 0.4,
+        "stability": 0.4
+    },
+    "music": {
+        "sound_quality": 1.0, "noise_cancellation": 0.4, "comfort": 0.3
+    },
+    "calls": {
+        "call_quality": 1.0, "noise_cancellation": 0.4, "connectivity": 0.3
+    },
+    # Single-aspect focus, from refinements like "more battery-focused"
+    "battery": {"battery_life": 1.0},
+    "comfort": {"comfort": 1.0},
+    "noise_cancellation": {"noise_cancellation": 1.0},
+    "performance": {"performance": 1.0},
+    "stability": {"stability": 1.0}
+}
 
 def detect_product_category(product_name: str, query: str = "") -> str:
     """Detect product category from name and query."""
@@ -68,40 +90,104 @@ def detect_product_category(product_name: str, query: str = "") -> str:
     
     return "general"
 
+# Word tokens and sentence terminators, scanned together in one pass
+_TOKEN_PATTERN = re.compile(r"\w+|[.!?]+")
+
+class AspectMatcher:
+    """Multi-keyword aspect matcher compiled once per category.
+
+    Every keyword of the category (plus simple inflections) is folded into
+    a single hash table mapping a word to the aspects it signals. A review
+    is then tokenized once and each token costs one dict lookup, so the
+    scan is linear in the review length regardless of how many aspects and
+    keywords the category defines. Matching is on whole words, so "ear"
+    no longer fires inside "clear" or "year".
+    """
+
+    # Simple inflections accepted after a keyword ("drops", "charged", ...)
+    SUFFIXES = ("s", "es", "ed", "ing")
+
+    def __init__(self, category: str):
+        self.category = category
+        aspect_keywords = ASPECT_KEYWORDS.get(category, {})
+        self.aspects = list(aspect_keywords.keys())
+
+        # A keyword may belong to several aspects (e.g. "quality", "cheap")
+        word_aspects = defaultdict(set)
+        for index, keywords in enumerate(aspect_keywords.values()):
+            for keyword in keywords:
+                keyword = keyword.lower()
+                for suffix in ("",) + self.SUFFIXES:
+                    word_aspects[keyword + suffix].add(index)
+        self._word_aspects = {word: tuple(sorted(v)) for word, v in word_aspects.items()}
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """Return aspect -> mentioning sentences for a review in one scan."""
+        if not self._word_aspects or not text:
+            return {}
+
+        text_lower = text.lower()
+        word_aspects = self._word_aspects
+
+        # (sentence start, sentence end, aspect indices) for sentences with hits
+        hits = []
+        sentence_start = 0
+        current = None
+
+        for token in _TOKEN_PATTERN.finditer(text_lower):
+            word = token.group()
+            aspect_indices = word_aspects.get(word)
+            if aspect_indices is not None:
+                if current is None:
+                    current = set(aspect_indices)
+                else:
+                    current.update(aspect_indices)
+            elif word[0] in ".!?":
+                if current:
+                    hits.append((sentence_start, token.start(), current))
+                    current = None
+                sentence_start = token.end()
+
+        if current:
+            hits.append((sentence_start, len(text_lower), current))
+
+        aspect_mentions = defaultdict(list)
+        for start, end, aspect_indices in hits:
+            sentence = text_lower[start:end].strip()
+            for aspect_idx in sorted(aspect_indices):
+                aspect_mentions[self.aspects[aspect_idx]].append(sentence)
+
+        return dict(aspect_mentions)
+
+def _known_category(category: str) -> str:
+    """Category as keyed in ASPECT_KEYWORDS, or "general" for any other."""
+    category = (category or "").strip().lower()
+    return category if category in ASPECT_KEYWORDS else "general"
+
+def get_aspect_matcher(category: str) -> AspectMatcher:
+    """Get the compiled aspect matcher for a category (built once)."""
+    return _compiled_matcher(_known_category(category))
+
+@lru_cache(maxsize=16)
+def _compiled_matcher(category: str) -> AspectMatcher:
+    return AspectMatcher(category)
+
 def extract_aspects_from_text(text: str, category: str = "general") -> Dict[str, List[str]]:
     """Extract aspect mentions from review text."""
-    if category not in ASPECT_KEYWORDS:
-        category = "general"
-    
-    text_lower = text.lower()
-    sentences = re.split(r'[.!?]+', text)
-    
-    aspect_mentions = defaultdict(list)
-    aspect_keywords = ASPECT_KEYWORDS.get(category, {})
-    
-    for sentence in sentences:
-        sentence = sentence.strip().lower()
-        if not sentence:
-            continue
-            
-        for aspect, keywords in aspect_keywords.items():
-            if any(keyword in sentence for keyword in keywords):
-                aspect_mentions[aspect].append(sentence)
-    
-    return dict(aspect_mentions)
+    return get_aspect_matcher(category).match(text)
 
 def calculate_aspect_sentiment(aspect_mentions: Dict[str, List[str]]) -> Dict[str, float]:
     """Calculate sentiment for each aspect based on mentions."""
     aspect_sentiments = {}
     
+    # Score every mention in one batch
+    sentences = [sentence for mentions in aspect_mentions.values() for sentence in mentions]
+    scores = iter(get_sentiment_engine().score_batch(sentences))
+    
     for aspect, sentences in aspect_mentions.items():
-        if not sentences:
+        sentiment_scores = [next(scores) for _ in sentences]
+        if not sentiment_scores:
             continue
-            
-        sentiment_scores = []
-        for sentence in sentences:
-            score = calculate_sentence_sentiment(sentence)
-            sentiment_scores.append(score)
         
         # Average sentiment for this aspect
         avg_sentiment = sum(sentiment_scores) / len(sentiment_scores)
@@ -110,42 +196,72 @@ def calculate_aspect_sentiment(aspect_mentions: Dict[str, List[str]]) -> Dict[st
     return aspect_sentiments
 
 def calculate_sentence_sentiment(sentence: str) -> float:
-    """Calculate sentiment score for a sentence using keyword matching."""
-    sentence_lower = sentence.lower()
-    
-    positive_count = sum(1 for word in POSITIVE_INDICATORS if word in sentence_lower)
-    negative_count = sum(1 for word in NEGATIVE_INDICATORS if word in sentence_lower)
-    
-    # Simple sentiment calculation
-    if positive_count == 0 and negative_count == 0:
-        return 0.0  # Neutral
-    
-    sentiment = (positive_count - negative_count) / (positive_count + negative_count)
-    return max(-1.0, min(1.0, sentiment))
+    """Calculate sentiment score for a sentence using the configured sentiment engine."""
+    return get_sentiment_engine().score(sentence)
+
+def analyze_reviews(reviews: List[Dict], category: str = "general") -> ReviewAnalysis:
+    """Run aspect extraction and sentence sentiment over reviews once.
+
+    The result holds everything later stages need (aspect mentions,
+    frequencies, per-sentence and per-aspect sentiment) so the normalizer
+    and ranker do not have to re-analyse the same text.
+    """
+    aspect_mentions = defaultdict(list)
+    aspect_counts = Counter()
 
-def extract_pros_and_cons(reviews: List[Dict], category: str = "general") -> Tuple[List[str], List[str]]:
-    """Extract pros and cons from reviews based on aspect analysis."""
-    all_aspects = defaultdict(list)
-    
-    # Collect all aspect mentions
     for review in reviews:
-        text = review.get("text", "")
+        text = review.get("text", "") if isinstance(review, dict) else str(review or "")
         aspects = extract_aspects_from_text(text, category)
-        
+
         for aspect, mentions in aspects.items():
-            all_aspects[aspect].extend(mentions)
+            aspect_counts[aspect] += 1
+            aspect_mentions[aspect].extend(mentions)
     
-    # Calculate sentiment for each aspect
+    # Score each distinct sentence once, in a single batch
+    unique_sentences = list(dict.fromkeys(
+        sentence for mentions in aspect_mentions.values() for sentence in mentions
+    ))
+    scores = get_sentiment_engine().score_batch(unique_sentences)
+    sentence_sentiments = dict(zip(unique_sentences, scores))
+
+    # Average sentiment for each aspect over all of its mentions
     aspect_sentiments = {}
-    for aspect, mentions in all_aspects.items():
-        aspect_sentiments[aspect] = calculate_aspect_sentiment({aspect: mentions})[aspect]
-    
-    # Generate pros and cons
+    for aspect, mentions in aspect_mentions.items():
+        scores = [sentence_sentiments[sentence] for sentence in mentions]
+        aspect_sentiments[aspect] = round(sum(scores) / len(scores), 3)
+
+    return ReviewAnalysis(
+        category=category,
+        aspect_mentions=dict(aspect_mentions),
+        aspect_sentiments=aspect_sentiments,
+        aspect_frequency=dict(aspect_counts),
+        sentence_sentiments=sentence_sentiments,
+        review_count=len(reviews),
+        aspect_vector=[aspect_sentiments.get(aspect, 0.0) for aspect in ASPECT_KEYWORDS.get(category, {})]
+    )
+
+@lru_cache(maxsize=128)
+def _use_case_weight_vector(category: str, use_case: str) -> Tuple[float, ...]:
+    weights = USE_CASE_ASPECT_WEIGHTS.get(use_case, {})
+    return tuple(weights.get(aspect, 0.0) for aspect in ASPECT_KEYWORDS.get(category, {}))
+
+def use_case_weight_vector(category: str, use_case: str) -> np.ndarray:
+    """Aspect weight vector for a use case, aligned with ReviewAnalysis.aspect_vector."""
+    # Any unknown category or use case maps to one cache key, so the cache stays small
+    use_case = use_case if use_case in USE_CASE_ASPECT_WEIGHTS else ""
+    return np.array(_use_case_weight_vector(_known_category(category), use_case), dtype=np.float64)
+
+def extract_pros_and_cons(reviews: List[Dict], category: str = "general") -> Tuple[List[str], List[str]]:
+    """Extract pros and cons from reviews based on aspect analysis."""
+    return pros_and_cons_from_analysis(analyze_reviews(reviews, category))
+
+def pros_and_cons_from_analysis(analysis: ReviewAnalysis) -> Tuple[List[str], List[str]]:
+    """Generate pros and cons from an existing review analysis."""
     pros = []
     cons = []
     
     # Sort aspects by absolute sentiment strength
-    sorted_aspects = sorted(aspect_sentiments.items(), key=lambda x: abs(x[1]), reverse=True)
+    sorted_aspects = sorted(analysis.aspect_sentiments.items(), key=lambda x: abs(x[1]), reverse=True)
     
     for aspect, sentiment in sorted_aspects[:6]:  # Top 6 aspects
         if sentiment > 0.2:  # Positive threshold
@@ -201,34 +317,19 @@ def generate_aspect_summary(aspect: str, sentiment: float, positive: bool = True
 
 def calculate_aspect_frequency(reviews: List[Dict], category: str = "general") -> Dict[str, int]:
     """Calculate how frequently each aspect is mentioned."""
-    aspect_counts = Counter()
-    
-    for review in reviews:
-        text = review.get("text", "")
-        aspects = extract_aspects_from_text(text, category)
-        
-        for aspect in aspects.keys():
-            aspect_counts[aspect] += 1
-    
-    return dict(aspect_counts)
+    return analyze_reviews(reviews, category).aspect_frequency
 
 def get_top_aspects(reviews: List[Dict], category: str = "general", top_n: int = 5) -> List[Tuple[str, int, float]]:
     """Get top aspects by frequency and average sentiment."""
-    aspect_frequency = calculate_aspect_frequency(reviews, category)
-    
-    # Calculate average sentiment for each aspect
-    all_aspects = defaultdict(list)
-    for review in reviews:
-        text = review.get("text", "")
-        aspects = extract_aspects_from_text(text, category)
-        for aspect, mentions in aspects.items():
-            all_aspects[aspect].extend(mentions)
-    
-    aspect_results = []
-    for aspect, frequency in aspect_frequency.items():
-        if aspect in all_aspects:
-            sentiment = calculate_aspect_sentiment({aspect: all_aspects[aspect]})[aspect]
-            aspect_results.append((aspect, frequency, sentiment))
+    return top_aspects_from_analysis(analyze_reviews(reviews, category), top_n)
+
+def top_aspects_from_analysis(analysis: ReviewAnalysis, top_n: int = 5) -> List[Tuple[str, int, float]]:
+    """Get top aspects by frequency and average sentiment from an existing analysis."""
+    aspect_results = [
+        (aspect, frequency, analysis.aspect_sentiments[aspect])
+        for aspect, frequency in analysis.aspect_frequency.items()
+        if aspect in analysis.aspect_sentiments
+    ]
     
     # Sort by frequency first, then by absolute sentiment
     aspect_results.sort(key=lambda x: (x[1], abs(x[2])), reverse=True)
@@ -5,6 +5,8 @@ import json
 import time
 from .utils import logger, log_context
 from .messages import Trace
+from .deadline import Deadline
+from .history import MessageHistory, MessageSummary
 
 @dataclass
 class Message:
@@ -20,10 +22,10 @@ class Message:
 class MessageBus:
     """Lightweight in-process pub/sub message bus with tracing."""
     
-    def __init__(self):
+    def __init__(self, max_history: int = 1000, max_history_bytes: int = 1_000_000):
         self._subscribers: Dict[str, List[Callable]] = {}
-        self._message_history: List[Message] = []
-        self._max_history = 1000
+        # Compact summaries of published messages, not the payloads themselves
+        self._history = MessageHistory(max_history, max_history_bytes)
     
     async def subscribe(self, topic: str, handler: Callable[[Message], Any]):
         """Subscribe to a topic with a handler function."""
@@ -44,9 +46,7 @@ class MessageBus:
         message = Message(topic=topic, payload=payload, trace=trace)
         
         # Store in history
-        self._message_history.append(message)
-        if len(self._message_history) > self._max_history:
-            self._message_history.pop(0)
+        self._history.record(topic, payload, trace, message.timestamp)
         
         with log_context(trace.request_id):
             logger.info(f"Publishing message to topic: {topic} from {trace.source_agent}")
@@ -69,7 +69,9 @@ class MessageBus:
         return results
     
     async def request_response(self, topic: str, payload: Any, trace: Trace, timeout: float = 30.0) -> Any:
-        """Send a request and wait for a single response."""
+        """Send a request and wait for a single response, within the request's deadline if it has one."""
+        if trace.deadline is not None:
+            timeout = trace.deadline.timeout(timeout)
         response_topic = f"{topic}_response_{trace.request_id}_{int(time.time())}"
         response_received = asyncio.Event()
         response_data = None
@@ -97,17 +99,9 @@ class MessageBus:
         finally:
             await self.unsubscribe(response_topic, response_handler)
     
-    def get_message_history(self, request_id: Optional[str] = None, topic: Optional[str] = None) -> List[Message]:
-        """Get message history, optionally filtered by request_id or topic."""
-        messages = self._message_history
-        
-        if request_id:
-            messages = [m for m in messages if m.trace.request_id == request_id]
-        
-        if topic:
-            messages = [m for m in messages if m.topic == topic]
-        
-        return messages
+    def get_message_history(self, request_id: Optional[str] = None, topic: Optional[str] = None) -> List[MessageSummary]:
+        """Get message history (summaries), optionally filtered by request_id or topic."""
+        return self._history.query(request_id=request_id, topic=topic)
     
     def get_trace_summary(self, request_id: str) -> Dict[str, Any]:
         """Get a summary of all messages for a request_id."""
@@ -116,14 +110,15 @@ class MessageBus:
         summary = {
             "request_id": request_id,
             "total_messages": len(messages),
-            "topics": list(set(m.topic for m in messages)),
-            "agents": list(set(m.trace.source_agent for m in messages)),
+            "topics": list(dict.fromkeys(m.topic for m in messages)),
+            "agents": list(dict.fromkeys(m.source_agent for m in messages)),
             "timeline": [
                 {
                     "timestamp": m.timestamp,
                     "topic": m.topic,
-                    "agent": m.trace.source_agent,
-                    "step": m.trace.step
+                    "agent": m.source_agent,
+                    "step": m.step,
+                    "payload": m.payload
                 }
                 for m in messages
             ]
@@ -153,11 +148,12 @@ class AgentBase:
         """Subscribe to a topic."""
         await self.bus.subscribe(topic, handler)
     
-    def create_trace(self, request_id: str, step: str) -> Trace:
+    def create_trace(self, request_id: str, step: str, deadline: Optional[Deadline] = None) -> Trace:
         """Create a trace object for this agent."""
         return Trace(
             request_id=request_id,
             step=step,
             source_agent=self.name,
-            ts=time.time()
+            ts=time.time(),
+            deadline=deadline
         )
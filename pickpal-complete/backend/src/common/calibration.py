@@ -0,0 +1,188 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+import numpy as np
+from .utils import logger
+
+class CategoryScoreStats:
+    """Running statistics of composite scores (0-10) for one category.
+
+    Mean and variance are kept with Welford's algorithm (batches merged
+    with Chan's parallel update) and quantiles with a fixed-bin histogram
+    sketch, so updating and calibrating are O(1) per score regardless of
+    how many requests have been seen.
+    """
+
+    def __init__(self, bins: int = 100, low: float = 0.0, high: float = 10.0):
+        self.low = low
+        self.high = high
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.histogram = np.zeros(bins, dtype=np.int64)
+        self._cdf: Optional[np.ndarray] = None
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return self.variance ** 0.5
+
+    def update(self, scores: np.ndarray):
+        """Add a batch of scores."""
+        scores = np.asarray(scores, dtype=np.float64)
+        if scores.size == 0:
+            return
+
+        batch_mean = float(scores.mean())
+        batch_m2 = float(((scores - batch_mean) ** 2).sum())
+        total = self.count + scores.size
+        delta = batch_mean - self.mean
+        self.mean += delta * scores.size / total
+        self.m2 += batch_m2 + delta ** 2 * self.count * scores.size / total
+        self.count = total
+
+        self.histogram += np.bincount(self._bin_of(scores), minlength=len(self.histogram))
+        self._cdf = None
+
+    def z_scores(self, scores: np.ndarray) -> np.ndarray:
+        std = self.std
+        if std == 0:
+            return np.zeros(len(scores))
+        return (np.asarray(scores, dtype=np.float64) - self.mean) / std
+
+    def percentiles(self, scores: np.ndarray) -> np.ndarray:
+        """Share of the population (0-100) scoring below each score, interpolated within bins."""
+        if self.count == 0:
+            return np.full(len(scores), 50.0)
+
+        if self._cdf is None:
+            self._cdf = np.concatenate([[0], np.cumsum(self.histogram)]) / self.count
+
+        scores = np.clip(np.asarray(scores, dtype=np.float64), self.low, self.high)
+        position = (scores - self.low) / (self.high - self.low) * len(self.histogram)
+        bins = np.minimum(position.astype(np.int64), len(self.histogram) - 1)
+        fraction = position - bins
+        below = self._cdf[bins] + fraction * (self._cdf[bins + 1] - self._cdf[bins])
+        return below * 100
+
+    def _bin_of(self, scores: np.ndarray) -> np.ndarray:
+        position = (np.clip(scores, self.low, self.high) - self.low) / (self.high - self.low)
+        return np.minimum((position * len(self.histogram)).astype(np.int64), len(self.histogram) - 1)
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "low": self.low,
+            "high": self.high,
+            "histogram": self.histogram.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CategoryScoreStats":
+        stats = cls(bins=len(data["histogram"]), low=data["low"], high=data["high"])
+        stats.count = data["count"]
+        stats.mean = data["mean"]
+        stats.m2 = data["m2"]
+        stats.histogram = np.array(data["histogram"], dtype=np.int64)
+        return stats
+
+def population_key(category: str, weights: Optional[Dict[str, float]] = None) -> str:
+    """Key of a score population: scores are only comparable under the same weights."""
+    if not weights:
+        return category
+    return category + "|" + ",".join(f"{name}={weight:g}" for name, weight in sorted(weights.items()))
+
+class ScoreCalibrator:
+    """Calibrates composite scores against their population across requests.
+
+    A population is a category ranked under one set of weights. Statistics
+    are persisted as JSON to `path` (SCORE_CALIBRATION_PATH by default;
+    kept in memory only when unset), at most once per `save_interval`
+    seconds and off the event loop. Until a population has `min_count`
+    observations its calibration is not reported.
+    """
+
+    def __init__(self, path: Optional[str] = None, min_count: int = 20, save_interval: float = 5.0):
+        self.path = path if path is not None else os.getenv("SCORE_CALIBRATION_PATH")
+        self.min_count = min_count
+        self.save_interval = save_interval
+        self.stats: Dict[str, CategoryScoreStats] = {}
+        self._save_task: Optional[asyncio.Task] = None
+        self._write_lock = threading.Lock()
+        self._load()
+
+    def observe(self, category: str, scores: np.ndarray, weights: Optional[Dict[str, float]] = None):
+        """Add the scores of one request's products to their population."""
+        if len(scores) == 0:
+            return
+        self.stats.setdefault(population_key(category, weights), CategoryScoreStats()).update(scores)
+        self._schedule_save()
+
+    def calibrate(self, category: str, scores: np.ndarray,
+                  weights: Optional[Dict[str, float]] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(percentiles, z-scores) of scores within their population, or None if too few observations."""
+        stats = self.stats.get(population_key(category, weights))
+        if stats is None or stats.count < self.min_count:
+            return None
+        return stats.percentiles(scores), stats.z_scores(scores)
+
+    def save(self):
+        """Write the statistics now."""
+        if self.path:
+            self._write(self._snapshot())
+
+    async def flush(self):
+        """Write pending statistics now, off the event loop (e.g. at shutdown)."""
+        if self._save_task is None:
+            return
+        self._save_task.cancel()
+        self._save_task = None
+        await asyncio.to_thread(self._write, self._snapshot())
+
+    def _schedule_save(self):
+        if not self.path or self._save_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop to defer to
+            self.save()
+            return
+        self._save_task = loop.create_task(self._save_after_interval())
+
+    async def _save_after_interval(self):
+        await asyncio.sleep(self.save_interval)
+        # Snapshot on the loop, where the statistics are updated, then write in a thread
+        snapshot = self._snapshot()
+        self._save_task = None
+        await asyncio.to_thread(self._write, snapshot)
+
+    def _snapshot(self) -> Dict:
+        return {key: stats.to_dict() for key, stats in self.stats.items()}
+
+    def _write(self, snapshot: Dict):
+        with self._write_lock:
+            try:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Failed to save score calibration to {self.path}: {e}")
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.stats = {key: CategoryScoreStats.from_dict(stats) for key, stats in data.items()}
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Failed to load score calibration from {self.path}: {e}")
@@ -0,0 +1,58 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Searchable product categories (the mock catalog's categories), in tie-break
+# order. Each keyword's weight is how strongly it signals the category:
+# product nouns are decisive, features and use cases only hint.
+CATEGORY_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "wireless_earbuds": {
+        "earbuds": 1.0, "airpods": 1.0, "buds": 1.0, "in-ear": 1.0,
+        "wireless": 0.5, "bluetooth": 0.5, "true wireless": 0.5,
+        "running": 0.25, "workout": 0.25, "gym": 0.25
+    },
+    "standing_desk": {
+        "desk": 1.0, "sit-stand": 1.0, "workstation": 1.0, "standing": 1.0,
+        "ergonomic": 0.5, "posture": 0.5, "office": 0.25, "home office": 0.25
+    },
+    "gaming_laptop": {
+        "laptop": 1.0, "macbook": 1.0, "notebook": 1.0,
+        "computer": 0.5, "gaming": 0.5, "battery life": 0.25
+    },
+    "noise_canceling_headphones": {
+        "headphones": 1.0, "over-ear": 1.0, "headset": 1.0,
+        "noise": 0.25, "canceling": 0.25, "cancelling": 0.25, "anc": 0.25,
+        "travel": 0.25, "flights": 0.25, "commute": 0.25
+    }
+}
+
+# A category is detected only when it leads the runner-up by this much
+AMBIGUITY_MARGIN = 0.5
+
+_KEYWORD_PATTERNS = {
+    category: [(re.compile(rf"\b{re.escape(keyword)}\b"), weight) for keyword, weight in keywords.items()]
+    for category, keywords in CATEGORY_KEYWORDS.items()
+}
+
+def score_categories(query: str) -> List[Tuple[str, float]]:
+    """(category, score) for every category, best first (ties in CATEGORY_KEYWORDS order)."""
+    query_lower = query.lower()
+    scores = [
+        (category, sum(weight for pattern, weight in patterns if pattern.search(query_lower)))
+        for category, patterns in _KEYWORD_PATTERNS.items()
+    ]
+    return sorted(scores, key=lambda item: -item[1])
+
+def detect_category(query: str) -> Optional[str]:
+    """The query's category, or None when no category clearly leads."""
+    (best, best_score), (_, runner_up) = score_categories(query)[:2]
+    if best_score > 0 and (runner_up == 0 or best_score - runner_up >= AMBIGUITY_MARGIN):
+        return best
+    return None
+
+def candidate_categories(query: str, limit: int = 3) -> List[Tuple[str, float]]:
+    """Up to `limit` categories the query hints at, best first.
+
+    Empty when no keyword matches: the query names none of our categories,
+    so none of them is worth a search.
+    """
+    return [(category, score) for category, score in score_categories(query) if score > 0][:limit]
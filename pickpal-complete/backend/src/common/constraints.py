@@ -0,0 +1,158 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Evidence (`brief.success["min_reviews"]`) is required of the top results only
+EVIDENCE_TOP_N = 3
+
+def _field_value(item: Any, field: str) -> float:
+    """Numeric value of a field on a raw candidate dict or a product dataclass (0 if missing)."""
+    if isinstance(item, dict):
+        if field == "reviews":
+            value = item.get("reviews_count", len(item.get("reviews", [])))
+        else:
+            value = item.get(field, 0)
+    elif field == "reviews":
+        value = item.meta.get("reviews_count") or len(item.raw_reviews)
+    else:
+        value = getattr(item, field, 0)
+    return float(value or 0)
+
+@dataclass(frozen=True)
+class Predicate:
+    """One bound on a numeric product field."""
+    name: str  # Constraint key, e.g. "max_price"
+    field: str  # "price", "stars", "reviews" or "score"
+    upper: bool  # True: value <= limit, False: value >= limit
+    limit: float
+    label: str  # Wording for violation reasons
+
+    def mask(self, values: np.ndarray) -> np.ndarray:
+        return values <= self.limit if self.upper else values >= self.limit
+
+    def reason(self, value: float) -> str:
+        op = ">" if self.upper else "<"
+        kind = "max" if self.upper else "min"
+        unit = "$" if self.field == "price" else ""
+        return f"{self.label} {unit}{value:g} {op} {kind} {unit}{self.limit:g}"
+
+# Constraint key -> (field, upper bound?, label)
+CONSTRAINT_PREDICATES = {
+    "max_price": ("price", True, "price"),
+    "min_price": ("price", False, "price"),
+    "min_rating": ("stars", False, "rating"),
+    "min_reviews": ("reviews", False, "reviews")
+}
+
+class ConstraintCheck:
+    """Result of evaluating predicates over a batch of items.
+
+    Masks are computed eagerly; violation reasons are only formatted
+    when asked for.
+    """
+
+    def __init__(self, items: Sequence, predicates: Tuple[Predicate, ...], values: Dict[str, np.ndarray]):
+        self.items = items
+        self.predicates = predicates
+        self.values = values
+        self.masks = {p.name: p.mask(values[p.field]) for p in predicates}
+        self.passed = np.ones(len(items), dtype=bool)
+        for mask in self.masks.values():
+            self.passed &= mask
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.passed.all())
+
+    def failed(self, name: str) -> bool:
+        """Whether any item violates the named predicate."""
+        return name in self.masks and not self.masks[name].all()
+
+    def kept(self) -> List:
+        return [item for item, passed in zip(self.items, self.passed) if passed]
+
+    def violations(self, name: str = None) -> List[Tuple[Any, str]]:
+        """(item, "; "-joined reasons) for each violating item, optionally for one predicate."""
+        predicates = [p for p in self.predicates if name is None or p.name == name]
+        failing = np.zeros(len(self.items), dtype=bool)
+        for p in predicates:
+            failing |= ~self.masks[p.name]
+
+        result = []
+        for index in np.flatnonzero(failing):
+            reasons = [p.reason(self.values[p.field][index]) for p in predicates if not self.masks[p.name][index]]
+            result.append((self.items[index], "; ".join(reasons)))
+        return result
+
+class ConstraintSet:
+    """Compiled brief constraints and success criteria.
+
+    `filters` are the hard constraints (`brief.constraints`) every
+    candidate must meet; `evidence` are the success criteria
+    (`brief.success`) checked on the top ranked results. Build with
+    `compile_constraints`, which memoizes per distinct constraints.
+    """
+
+    def __init__(self, filters: Tuple[Predicate, ...], evidence: Tuple[Predicate, ...], evidence_top_n: int):
+        self.filters = filters
+        self.evidence = evidence
+        self.evidence_top_n = evidence_top_n
+
+    def get(self, name: str) -> Optional[Predicate]:
+        return next((p for p in self.filters + self.evidence if p.name == name), None)
+
+    def check(self, items: Sequence, names: Sequence[str] = None) -> ConstraintCheck:
+        """Evaluate the filters (or just the named ones) over items in one vectorized pass per field."""
+        predicates = tuple(p for p in self.filters if names is None or p.name in names)
+        return self._evaluate(items, predicates)
+
+    def check_evidence(self, items: Sequence) -> ConstraintCheck:
+        """Evaluate the evidence checks over the top results."""
+        return self._evaluate(items[:self.evidence_top_n], self.evidence)
+
+    def mask(self, items: Sequence) -> np.ndarray:
+        return self.check(items).passed
+
+    def narrows(self, other: "ConstraintSet") -> bool:
+        """Whether these filters are at least as strict as `other`'s.
+
+        If so, everything passing them also passes `other`, so a pool
+        gathered under `other` can be re-filtered instead of re-fetched.
+        """
+        for bound in other.filters:
+            own = self.get(bound.name)
+            if own is None:
+                return False
+            if (own.limit > bound.limit) if bound.upper else (own.limit < bound.limit):
+                return False
+        return True
+
+    def _evaluate(self, items: Sequence, predicates: Tuple[Predicate, ...]) -> ConstraintCheck:
+        fields = {p.field for p in predicates}
+        values = {
+            field: np.fromiter((_field_value(item, field) for item in items), dtype=np.float64, count=len(items))
+            for field in fields
+        }
+        return ConstraintCheck(items, predicates, values)
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def compile_constraints(constraints: Dict = None, success: Dict = None) -> ConstraintSet:
+    """Compile `brief.constraints` (and `brief.success`, for evidence checks) into predicates."""
+    min_reviews = (success or {}).get("min_reviews")
+    return _compile(tuple(sorted((constraints or {}).items())), min_reviews if _is_number(min_reviews) else None)
+
+@lru_cache(maxsize=256)
+def _compile(constraints: Tuple, min_reviews: Optional[float]) -> ConstraintSet:
+    filters = []
+    for name, limit in constraints:
+        if name in CONSTRAINT_PREDICATES and _is_number(limit):
+            field, upper, label = CONSTRAINT_PREDICATES[name]
+            filters.append(Predicate(name, field, upper, float(limit), label))
+
+    evidence = ()
+    if min_reviews is not None:
+        evidence = (Predicate("evidence", "reviews", False, float(min_reviews), "reviews"),)
+    return ConstraintSet(tuple(filters), evidence, EVIDENCE_TOP_N)
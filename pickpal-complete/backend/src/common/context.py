@@ -0,0 +1,22 @@
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+# Request being served by the current task. asyncio copies the context into
+# every task it creates, so concurrent requests never see each other's id,
+# unlike request state kept on the shared agent instances.
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+def current_request_id(default: Optional[str] = "unknown") -> Optional[str]:
+    """Id of the request the current task is serving, or `default` outside of one."""
+    request_id = _request_id.get()
+    return request_id if request_id is not None else default
+
+@contextmanager
+def request_context(request_id: str):
+    """Serve `request_id` in this block, restoring the enclosing request on exit."""
+    token = _request_id.set(request_id)
+    try:
+        yield
+    finally:
+        _request_id.reset(token)
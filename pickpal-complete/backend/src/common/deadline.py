@@ -0,0 +1,57 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+class Deadline:
+    """Latency budget for one request, shared by every stage that serves it.
+
+    Stages ask for a timeout bounded by what is left (`timeout`) or carve
+    out a sub-deadline for a share of it (`share`). Sub-deadlines share
+    the parent's `degraded` notes, so anything that returned a partial
+    result because its budget ran out is reported once for the request.
+    """
+
+    def __init__(self, budget: float, expires_at: float = None, degraded: List[str] = None):
+        self.budget = budget
+        self.expires_at = expires_at if expires_at is not None else time.monotonic() + budget
+        self.degraded = degraded if degraded is not None else []
+
+    @classmethod
+    def from_env(cls, default: float = 30.0) -> "Deadline":
+        """Deadline for a new request from REQUEST_TIMEOUT (seconds)."""
+        return cls(float(os.getenv("REQUEST_TIMEOUT", default)))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Time left, bounded by a stage's own static `cap`."""
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+    def share(self, fraction: float, cap: Optional[float] = None) -> "Deadline":
+        """Sub-deadline for `fraction` of the remaining budget."""
+        budget = self.remaining() * fraction
+        if cap is not None:
+            budget = min(budget, cap)
+        return Deadline(budget, expires_at=time.monotonic() + budget, degraded=self.degraded)
+
+    def degrade(self, note: str):
+        """Record that a stage returned a partial result because its budget ran out."""
+        if note not in self.degraded:
+            self.degraded.append(note)
+
+async def within(deadline: Optional[Deadline], awaitable: Awaitable[T], cap: Optional[float] = None) -> T:
+    """Await with the deadline's remaining time (or `cap`), raising asyncio.TimeoutError past it."""
+    if deadline is None:
+        if cap is None:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, timeout=cap)
+    return await asyncio.wait_for(awaitable, timeout=deadline.timeout(cap))
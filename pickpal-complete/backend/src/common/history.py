@@ -0,0 +1,101 @@
+from collections import deque
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Any, Deque, Dict, List, Optional
+from pydantic import BaseModel
+from .messages import Trace
+
+# Rough fixed cost of one summary (object, fields, index entries), in bytes
+_SUMMARY_OVERHEAD = 400
+
+@dataclass(frozen=True)
+class MessageSummary:
+    """What the bus history keeps of a published message: no payload, just its shape."""
+    topic: str
+    request_id: str
+    source_agent: str
+    step: str
+    timestamp: float
+    payload: str  # Compact description, e.g. "RankedList(items=5)"
+
+    @property
+    def size(self) -> int:
+        """Approximate bytes held for this summary."""
+        return (_SUMMARY_OVERHEAD + len(self.topic) + len(self.request_id) + len(self.source_agent)
+                + len(self.step) + len(self.payload))
+
+def describe_payload(payload: Any, max_chars: int = 200, nested: bool = True) -> str:
+    """Compact description of a payload: types and collection sizes, never contents."""
+    if isinstance(payload, BaseModel) or (is_dataclass(payload) and not isinstance(payload, type)):
+        values = payload if isinstance(payload, BaseModel) else (
+            (field.name, getattr(payload, field.name)) for field in fields(payload))
+        sizes = [f"{name}={len(value)}" for name, value in values if isinstance(value, (list, dict))]
+        description = f"{type(payload).__name__}({', '.join(sizes)})"
+    elif isinstance(payload, dict) and nested:
+        # Request payloads wrap the data: {"data": ..., "response_topic": ...}
+        description = "{" + ", ".join(
+            f"{key}: {describe_payload(value, max_chars, nested=False)}" for key, value in payload.items()
+        ) + "}"
+    elif isinstance(payload, (list, tuple, dict, set)):
+        description = f"{type(payload).__name__}[{len(payload)}]"
+    else:
+        description = type(payload).__name__
+    return description if len(description) <= max_chars else description[:max_chars - 3] + "..."
+
+class MessageHistory:
+    """Bounded, indexed history of published messages.
+
+    A ring buffer of compact summaries (payloads are described, not
+    kept), bounded by both message count and approximate bytes held; the
+    oldest summaries are evicted first, in O(1). Secondary indexes by
+    request id and by topic make per-request and per-topic lookups
+    proportional to the matches, not to the whole history.
+    """
+
+    def __init__(self, max_messages: int = 1000, max_bytes: int = 1_000_000):
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self._ring: Deque[MessageSummary] = deque()
+        self._by_request: Dict[str, Deque[MessageSummary]] = {}
+        self._by_topic: Dict[str, Deque[MessageSummary]] = {}
+        self.bytes = 0
+
+    def record(self, topic: str, payload: Any, trace: Trace, timestamp: float) -> MessageSummary:
+        summary = MessageSummary(
+            topic=topic,
+            request_id=trace.request_id,
+            source_agent=trace.source_agent,
+            step=trace.step,
+            timestamp=timestamp,
+            payload=describe_payload(payload)
+        )
+        self._ring.append(summary)
+        self._by_request.setdefault(summary.request_id, deque()).append(summary)
+        self._by_topic.setdefault(summary.topic, deque()).append(summary)
+        self.bytes += summary.size
+
+        while self._ring and (len(self._ring) > self.max_messages or self.bytes > self.max_bytes):
+            self._evict_oldest()
+
+        return summary
+
+    def query(self, request_id: Optional[str] = None, topic: Optional[str] = None) -> List[MessageSummary]:
+        """Summaries in publication order, optionally filtered by request id and/or topic."""
+        if request_id:
+            summaries = self._by_request.get(request_id, ())
+            return [s for s in summaries if s.topic == topic] if topic else list(summaries)
+        if topic:
+            return list(self._by_topic.get(topic, ()))
+        return list(self._ring)
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+    def _evict_oldest(self):
+        # The oldest summary overall is also the oldest in both of its indexes
+        summary = self._ring.popleft()
+        self.bytes -= summary.size
+        for index, key in ((self._by_request, summary.request_id), (self._by_topic, summary.topic)):
+            entries = index[key]
+            entries.popleft()
+            if not entries:
+                del index[key]
@@ -1,13 +1,17 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Optional
 from dataclasses import dataclass, field
 import time
+from .deadline import Deadline
 
 class Trace(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
     request_id: str
     step: str
     source_agent: str
     ts: float = Field(default_factory=time.time)
+    deadline: Optional[Deadline] = Field(default=None, exclude=True)  # Request latency budget, never serialized
 
 class ShoppingBrief(BaseModel):
     trace: Trace
@@ -30,6 +34,17 @@ class ProductCandidate:
     trace: Optional[Trace] = None
     image_url: Optional[str] = None
 
+@dataclass
+class ReviewAnalysis:
+    """Aspect and sentiment analysis of a product's reviews, computed once per product."""
+    category: str
+    aspect_mentions: Dict[str, List[str]] = field(default_factory=dict)  # Aspect -> mentioning sentences
+    aspect_sentiments: Dict[str, float] = field(default_factory=dict)  # Aspect -> average sentence sentiment
+    aspect_frequency: Dict[str, int] = field(default_factory=dict)  # Aspect -> number of reviews mentioning it
+    sentence_sentiments: Dict[str, float] = field(default_factory=dict)  # Sentence -> sentiment score
+    review_count: int = 0
+    aspect_vector: List[float] = field(default_factory=list)  # Aspect sentiments in ASPECT_KEYWORDS[category] order
+
 @dataclass
 class EnrichedProduct:
     """A product with enriched data and quality signals."""
@@ -43,6 +58,8 @@ class EnrichedProduct:
     meta: Dict = field(default_factory=dict)
     trace: Optional['Trace'] = None
     image_url: Optional[str] = None
+    analysis: Optional[ReviewAnalysis] = None  # Shared review analysis reused by later stages
+    canonical_id: str = ""  # Stable cross-source product id from the canonical registry
 
 @dataclass
 class RankedProduct:
@@ -61,6 +78,7 @@ class RankedProduct:
     meta: Dict = field(default_factory=dict)
     trace: Optional['Trace'] = None
     image_url: Optional[str] = None
+    canonical_id: str = ""
 
 @dataclass
 class RankedList:
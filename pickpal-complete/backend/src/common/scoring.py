@@ -2,6 +2,14 @@ from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 import math
 import statistics
+import numpy as np
+
+DEFAULT_WEIGHTS = {
+    "rating": 0.4,
+    "sentiment": 0.3,
+    "recency": 0.2,
+    "helpfulness": 0.1
+}
 
 def calculate_composite_score(
     rating: float,
@@ -12,12 +20,7 @@ def calculate_composite_score(
 ) -> float:
     """Calculate composite score from multiple factors."""
     if weights is None:
-        weights = {
-            "rating": 0.4,
-            "sentiment": 0.3,
-            "recency": 0.2,
-            "helpfulness": 0.1
-        }
+        weights = DEFAULT_WEIGHTS
     
     # Normalize rating (0-5 scale to 0-10)
     rating_score = (rating / 5.0) * 10
@@ -25,8 +28,8 @@ def calculate_composite_score(
     # Normalize sentiment (-1 to 1 scale to 0-10)
     sentiment_score = (sentiment + 1) * 5
     
-    # Recency decay (exponential decay over 365 days)
-    recency_score = 10 * math.exp(-recency_days / 180)  # Half-life of ~125 days
+    # Recency decay (exponential decay over 365 days); future dates count as today
+    recency_score = 10 * math.exp(-max(recency_days, 0) / 180)  # Half-life of ~125 days
     
     # Helpfulness score (already 0-10 scale)
     helpfulness_score = min(helpfulness, 10)
@@ -40,6 +43,128 @@ def calculate_composite_score(
     
     return round(composite, 2)
 
+def calculate_score_components(
+    rating: np.ndarray,
+    sentiment: np.ndarray,
+    recency_days: np.ndarray,
+    helpfulness: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """Unweighted 0-10 component scores for arrays of products."""
+    return {
+        # Normalize rating (0-5 scale to 0-10)
+        "rating": np.asarray(rating, dtype=np.float64) / 5.0 * 10,
+        # Normalize sentiment (-1 to 1 scale to 0-10)
+        "sentiment": (np.asarray(sentiment, dtype=np.float64) + 1) * 5,
+        # Recency decay; future dates count as today
+        "recency": 10 * np.exp(-np.maximum(np.asarray(recency_days, dtype=np.float64), 0) / 180),
+        # Helpfulness score (already 0-10 scale)
+        "helpfulness": np.minimum(np.asarray(helpfulness, dtype=np.float64), 10)
+    }
+
+def combine_score_components(
+    components: Dict[str, np.ndarray],
+    weights: Dict[str, float] = None
+) -> tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Weighted sum of component scores.
+    
+    Returns the rounded composite scores and the weighted contribution of
+    each component (the contributions sum to the unrounded score).
+    """
+    if weights is None:
+        weights = DEFAULT_WEIGHTS
+    
+    contributions = {name: values * weights.get(name, 0) for name, values in components.items()}
+    composite = sum(contributions.values())
+    
+    return np.round(composite, 2), contributions
+
+def calculate_composite_scores(
+    rating: np.ndarray,
+    sentiment: np.ndarray,
+    recency_days: np.ndarray,
+    helpfulness: np.ndarray,
+    weights: Dict[str, float] = None
+) -> tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Vectorized calculate_composite_score over arrays of products.
+    
+    Returns the rounded composite scores and the weighted contribution of
+    each component (the contributions sum to the unrounded score).
+    """
+    components = calculate_score_components(rating, sentiment, recency_days, helpfulness)
+    return combine_score_components(components, weights)
+
+def select_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, using argpartition.
+    
+    Ties are broken by index so the result matches a stable descending sort.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    
+    if k < n:
+        # k-th best score, then everything strictly above it plus the earliest ties
+        kth_score = scores[np.argpartition(-scores, k - 1)[:k]].min()
+        above = np.flatnonzero(scores > kth_score)
+        ties = np.flatnonzero(scores == kth_score)[:k - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(n)
+    
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+def calculate_score_bounds(
+    stars: np.ndarray,
+    weights: Dict[str, float] = None,
+    recency_days_range: tuple[np.ndarray, np.ndarray] = None,
+    helpfulness_range: tuple[np.ndarray, np.ndarray] = None,
+    max_variance_penalty: float = 0.3
+) -> tuple[np.ndarray, np.ndarray]:
+    """Bound the composite score of products before they are enriched.
+
+    Rating is exact. Sentiment is derived from the rating minus a variance
+    penalty of at most `max_variance_penalty` (see RankerAgent). Recency and
+    helpfulness use the given (low, high) ranges when known; they and any
+    other weighted component otherwise lie anywhere in [0, 10].
+    Returns (lower, upper) arrays.
+    """
+    if weights is None:
+        weights = DEFAULT_WEIGHTS
+    
+    stars = np.asarray(stars, dtype=np.float64)
+    rating_score = (stars / 5.0) * 10 * weights.get("rating", 0)
+    lower = rating_score.copy()
+    upper = rating_score.copy()
+    
+    base_sentiment = (stars - 3) / 2
+    sentiment_weight = weights.get("sentiment", 0)
+    upper += (np.clip(base_sentiment, -1, 1) + 1) * 5 * sentiment_weight
+    lower += (np.clip(base_sentiment - max_variance_penalty, -1, 1) + 1) * 5 * sentiment_weight
+    
+    recency_weight = weights.get("recency", 0)
+    if recency_days_range is not None:
+        days_low, days_high = (np.maximum(np.asarray(d, dtype=np.float64), 0) for d in recency_days_range)
+        upper += 10 * np.exp(-days_low / 180) * recency_weight
+        lower += 10 * np.exp(-days_high / 180) * recency_weight
+    else:
+        upper += 10 * recency_weight
+    
+    helpfulness_weight = weights.get("helpfulness", 0)
+    if helpfulness_range is not None:
+        helpful_low, helpful_high = (np.clip(np.asarray(h, dtype=np.float64), 0, 10) for h in helpfulness_range)
+        upper += helpful_high * helpfulness_weight
+        lower += helpful_low * helpfulness_weight
+    else:
+        upper += 10 * helpfulness_weight
+    
+    # Any other weighted component: anywhere in [0, 10]
+    known = ("rating", "sentiment", "recency", "helpfulness")
+    upper += sum(10 * w for name, w in weights.items() if name not in known)
+    
+    return lower, upper
+
 def calculate_z_scores(scores: List[float]) -> List[float]:
     """Calculate z-scores for normalization."""
     if len(scores) < 2:
@@ -60,23 +185,35 @@ def apply_decay_factor(base_score: float, days_old: float, decay_rate: float = 0
     return base_score * decay_factor
 
 def calculate_diversity_penalty(scores: List[float], diversity_threshold: float = 0.3) -> List[float]:
-    """Apply penalty for lack of diversity in top results."""
+    """Apply penalty for lack of diversity in top results.
+    
+    Each score is penalized by 0.1 * (threshold - diff) for every other
+    score closer than the threshold. Scores are sorted once and the
+    neighbours of each score are summed with prefix sums, so the cost is
+    O(n log n) instead of all pairs.
+    """
     if len(scores) < 2:
         return scores
     
-    # Calculate pairwise differences
-    penalties = []
-    for i, score in enumerate(scores):
-        penalty = 0
-        for j, other_score in enumerate(scores):
-            if i != j:
-                diff = abs(score - other_score)
-                if diff < diversity_threshold:
-                    penalty += (diversity_threshold - diff) * 0.1
-        
-        penalties.append(max(0, score - penalty))
+    values = np.asarray(scores, dtype=np.float64)
+    sorted_values = np.sort(values)
+    prefix = np.concatenate([[0.0], np.cumsum(sorted_values)])
     
-    return penalties
+    # Neighbours strictly within the threshold, split at each score
+    lo = np.searchsorted(sorted_values, values - diversity_threshold, side="right")
+    mid = np.searchsorted(sorted_values, values, side="right")
+    hi = np.searchsorted(sorted_values, values + diversity_threshold, side="left")
+    
+    left_count = mid - lo
+    right_count = hi - mid
+    left_diff = left_count * values - (prefix[mid] - prefix[lo])
+    right_diff = (prefix[hi] - prefix[mid]) - right_count * values
+    
+    # Sum of (threshold - diff) over neighbours, minus the score itself (diff 0)
+    closeness = (left_count + right_count) * diversity_threshold - left_diff - right_diff - diversity_threshold
+    penalties = np.maximum(0, values - closeness * 0.1)
+    
+    return penalties.tolist()
 
 def calculate_confidence_interval(scores: List[float], confidence: float = 0.95) -> tuple[float, float]:
     """Calculate confidence interval for scores."""
@@ -145,6 +282,42 @@ def calculate_review_quality_score(
     
     return round(quality_score, 2)
 
+def calculate_review_quality_scores(
+    review_lengths: np.ndarray,
+    verified_purchases: np.ndarray,
+    helpfulness_votes: np.ndarray,
+    total_votes: np.ndarray
+) -> np.ndarray:
+    """Vectorized calculate_review_quality_score over arrays of reviews."""
+    review_lengths = np.asarray(review_lengths, dtype=np.float64)
+    verified_purchases = np.asarray(verified_purchases, dtype=bool)
+    helpfulness_votes = np.asarray(helpfulness_votes, dtype=np.float64)
+    total_votes = np.asarray(total_votes, dtype=np.float64)
+    
+    # Length score (optimal around 100-300 characters)
+    length_score = np.where(
+        review_lengths < 50,
+        review_lengths / 50 * 5,
+        np.where(review_lengths <= 300, 10.0, np.maximum(5.0, 10 - (review_lengths - 300) / 100))
+    )
+    
+    # Verification bonus
+    verification_score = np.where(verified_purchases, 10.0, 7.0)
+    
+    # Helpfulness ratio (neutral for no votes)
+    helpfulness_score = np.divide(
+        helpfulness_votes * 10, total_votes,
+        out=np.full(total_votes.shape, 5.0), where=total_votes > 0
+    )
+    
+    quality_scores = (
+        length_score * 0.3 +
+        verification_score * 0.4 +
+        helpfulness_score * 0.3
+    )
+    
+    return np.round(quality_scores, 2)
+
 def calculate_aspect_importance(
     aspect_frequency: Dict[str, int],
     total_reviews: int,
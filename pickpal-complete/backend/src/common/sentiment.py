@@ -0,0 +1,173 @@
+import os
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, List, Optional
+import numpy as np
+from .utils import logger
+
+# Sentiment indicators for aspects
+POSITIVE_INDICATORS = [
+    "excellent", "amazing", "great", "good", "perfect", "love", "best", "fantastic",
+    "outstanding", "incredible", "wonderful", "awesome", "superb", "brilliant",
+    "impressive", "solid", "reliable", "smooth", "comfortable", "easy", "clear"
+]
+
+NEGATIVE_INDICATORS = [
+    "terrible", "awful", "bad", "worst", "hate", "horrible", "disappointing",
+    "poor", "cheap", "flimsy", "uncomfortable", "difficult", "hard", "annoying",
+    "frustrating", "issues", "problems", "broken", "defective", "useless"
+]
+
+# Words that flip the polarity of the lexicon terms that follow them
+NEGATORS = [
+    "not", "no", "never", "without", "hardly", "barely", "nothing", "neither", "nor",
+    "isn't", "aren't", "wasn't", "weren't", "don't", "doesn't", "didn't", "won't",
+    "wouldn't", "can't", "cannot", "couldn't", "shouldn't", "dont", "doesnt", "isnt", "wasnt"
+]
+
+class SentimentEngine(ABC):
+    """Base class for sentence sentiment backends.
+
+    Backends score a batch of sentences at once and return polarities in
+    [-1, 1], one per input sentence and in the same order.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def score_batch(self, sentences: List[str]) -> List[float]:
+        """Polarity of each sentence, in order."""
+
+    def score(self, sentence: str) -> float:
+        """Score a single sentence."""
+        return self.score_batch([sentence])[0]
+
+class LexiconSentimentEngine(SentimentEngine):
+    """Lexicon backend scoring a whole batch with one sparse product.
+
+    The batch is tokenized once. Lexicon hits form a sparse
+    sentence x term matrix that is multiplied with the term polarity
+    vector; hits within `negation_window` tokens after a negator (and in
+    the same clause) have their polarity flipped. A sentence scores
+    (positive - negative) / (positive + negative) as before.
+    """
+
+    name = "lexicon"
+
+    # Token codes; lexicon terms are encoded as _TERM + term index
+    _OTHER, _SENTENCE, _CLAUSE, _NEGATOR, _TERM = 0, 1, 2, 3, 4
+
+    # Sentences are joined with a record separator so one findall covers the batch
+    _SEPARATOR = "\x1e"
+    _TOKEN_PATTERN = re.compile(r"\w+(?:'\w+)?|[,;:\x1e]")
+
+    def __init__(self, positive: List[str] = None, negative: List[str] = None,
+                 negators: List[str] = None, negation_window: int = 3):
+        positive = POSITIVE_INDICATORS if positive is None else positive
+        negative = NEGATIVE_INDICATORS if negative is None else negative
+        negators = NEGATORS if negators is None else negators
+        self.negation_window = negation_window
+
+        terms: Dict[str, float] = {}
+        for word in positive:
+            terms[word.lower()] = 1.0
+        for word in negative:
+            terms[word.lower()] = -1.0
+        self._polarity = np.array(list(terms.values()), dtype=np.float64)
+
+        self._codes: Dict[str, int] = {self._SEPARATOR: self._SENTENCE}
+        for mark in ",;:":
+            self._codes[mark] = self._CLAUSE
+        for word in negators:
+            self._codes[word.lower()] = self._NEGATOR
+        for index, word in enumerate(terms):
+            self._codes[word] = self._TERM + index
+
+    def score_batch(self, sentences: List[str]) -> List[float]:
+        if not sentences:
+            return []
+
+        text = self._SEPARATOR.join(
+            s.lower().replace(self._SEPARATOR, " ").replace("’", "'") for s in sentences
+        )
+        tokens = self._TOKEN_PATTERN.findall(text)
+        codes = np.fromiter((self._codes.get(t, self._OTHER) for t in tokens), dtype=np.int64, count=len(tokens))
+
+        hits = np.flatnonzero(codes >= self._TERM)
+        if hits.size == 0:
+            return [0.0] * len(sentences)
+
+        positions = np.arange(codes.size)
+        sentence_ids = np.cumsum(codes == self._SENTENCE)
+
+        # Negation scope: last negator after the last sentence/clause boundary, within the window
+        boundaries = (codes == self._SENTENCE) | (codes == self._CLAUSE)
+        last_boundary = np.maximum.accumulate(np.where(boundaries, positions, -1))
+        last_negator = np.maximum.accumulate(np.where(codes == self._NEGATOR, positions, -1))
+        negated = (last_negator[hits] > last_boundary[hits]) & (hits - last_negator[hits] <= self.negation_window)
+
+        # Sparse (sentence x term) matrix times the polarity vector
+        rows = sentence_ids[hits]
+        polarity = self._polarity[codes[hits] - self._TERM]
+        polarity = np.where(negated, -polarity, polarity)
+
+        net = np.bincount(rows, weights=polarity, minlength=len(sentences))
+        total = np.bincount(rows, minlength=len(sentences))
+        scores = np.divide(net, total, out=np.zeros(len(sentences)), where=total > 0)
+
+        return np.clip(scores, -1.0, 1.0).tolist()
+
+class TextBlobSentimentEngine(SentimentEngine):
+    """TextBlob pattern analyzer backend with per-sentence memoization."""
+
+    name = "textblob"
+
+    def __init__(self, cache_size: int = 10000):
+        from textblob import TextBlob
+        self._textblob = TextBlob
+        self._cached_polarity = lru_cache(maxsize=cache_size)(self._score_uncached)
+
+    def _score_uncached(self, sentence: str) -> float:
+        return float(self._textblob(sentence).sentiment.polarity)
+
+    def score_batch(self, sentences: List[str]) -> List[float]:
+        # Score each distinct sentence once per batch, then fan results back out
+        unique = {sentence: None for sentence in sentences}
+        for sentence in unique:
+            unique[sentence] = max(-1.0, min(1.0, self._cached_polarity(sentence)))
+        return [unique[sentence] for sentence in sentences]
+
+SENTIMENT_BACKENDS = {
+    LexiconSentimentEngine.name: LexiconSentimentEngine,
+    TextBlobSentimentEngine.name: TextBlobSentimentEngine
+}
+
+_engine: Optional[SentimentEngine] = None
+
+def create_sentiment_engine(backend: str = None) -> SentimentEngine:
+    """Create a sentiment engine; falls back to the lexicon backend if unavailable."""
+    backend = (backend or os.getenv("SENTIMENT_BACKEND", LexiconSentimentEngine.name)).lower()
+    engine_cls = SENTIMENT_BACKENDS.get(backend)
+
+    if engine_cls is None:
+        logger.warning(f"Unknown sentiment backend '{backend}', using lexicon")
+        return LexiconSentimentEngine()
+
+    try:
+        return engine_cls()
+    except ImportError as e:
+        logger.warning(f"Sentiment backend '{backend}' unavailable ({e}), using lexicon")
+        return LexiconSentimentEngine()
+
+def get_sentiment_engine() -> SentimentEngine:
+    """Get the process-wide sentiment engine (created on first use)."""
+    global _engine
+    if _engine is None:
+        _engine = create_sentiment_engine()
+    return _engine
+
+def set_sentiment_engine(engine: SentimentEngine):
+    """Replace the process-wide sentiment engine."""
+    global _engine
+    _engine = engine
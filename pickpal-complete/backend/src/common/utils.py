@@ -5,7 +5,7 @@ import functools
 from typing import Any, Callable, Optional
 import uuid
 import re
-from contextlib import contextmanager
+from .context import current_request_id, request_context
 
 # Configure logging with request_id correlation
 class RequestIDFilter(logging.Filter):
@@ -34,21 +34,25 @@ def generate_request_id() -> str:
     """Generate a unique request ID."""
     return str(uuid.uuid4())[:8]
 
-@contextmanager
-def log_context(request_id: str):
-    """Context manager to set request_id for logging."""
-    old_factory = logging.getLogRecordFactory()
-    
-    def record_factory(*args, **kwargs):
-        record = old_factory(*args, **kwargs)
+_base_record_factory = logging.getLogRecordFactory()
+
+def _record_factory(*args, **kwargs):
+    """Stamp log records with the current task's request id, if it is serving one."""
+    record = _base_record_factory(*args, **kwargs)
+    request_id = current_request_id(None)
+    if request_id is not None:
         record.request_id = request_id
-        return record
+    return record
+
+logging.setLogRecordFactory(_record_factory)
+
+def log_context(request_id: str):
+    """Context manager to set request_id for logging.
     
-    logging.setLogRecordFactory(record_factory)
-    try:
-        yield
-    finally:
-        logging.setLogRecordFactory(old_factory)
+    The id is held in a context variable rather than a swapped global
+    record factory, so concurrent requests each log under their own id.
+    """
+    return request_context(request_id)
 
 def retry_async(max_retries: int = 3, delay: float = 1.0, backoff: float = 2.0):
     """Async retry decorator with exponential backoff."""
@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 from urllib.parse import quote_plus, urljoin
 from bs4 import BeautifulSoup
 import xml.etree.ElementTree as ET
+from ..common.deadline import Deadline
 
 class BaseAdapter:
     """Base class for all discovery adapters."""
@@ -17,8 +18,12 @@ class BaseAdapter:
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
     
-    async def fetch(self, url: str, timeout: int = 10) -> Optional[str]:
-        """Fetch content from URL with error handling."""
+    async def fetch(self, url: str, timeout: int = 10, deadline: Optional[Deadline] = None) -> Optional[str]:
+        """Fetch content from URL with error handling, within the request deadline if given."""
+        if deadline is not None:
+            if deadline.expired:
+                return None
+            timeout = deadline.timeout(timeout)
         try:
             async with self.session.get(url, headers=self.headers, timeout=timeout) as response:
                 if response.status == 200:
@@ -35,7 +40,8 @@ class AmazonAdapter(BaseAdapter):
         self.api_key = api_key
         self.base_url = "https://webservices.amazon.com/paapi5"
         
-    async def search_products(self, queries: List[str], category: str, max_results: int = 20) -> List[Dict]:
+    async def search_products(self, queries: List[str], category: str, max_results: int = 20,
+                              deadline: Optional[Deadline] = None) -> List[Dict]:
         """Search for products using Amazon API or web scraping fallback."""
         candidates = []
         
@@ -44,7 +50,7 @@ class AmazonAdapter(BaseAdapter):
             candidates = await self._search_via_api(queries, category, max_results)
         else:
             # Fallback to web scraping (for demonstration - requires careful implementation)
-            candidates = await self._search_via_scraping(queries, category, max_results)
+            candidates = await self._search_via_scraping(queries, category, max_results, deadline)
         
         return candidates
     
@@ -76,14 +82,17 @@ class AmazonAdapter(BaseAdapter):
         
         return candidates[:max_results]
     
-    async def _search_via_scraping(self, queries: List[str], category: str, max_results: int) -> List[Dict]:
+    async def _search_via_scraping(self, queries: List[str], category: str, max_results: int,
+                                   deadline: Optional[Deadline] = None) -> List[Dict]:
         """Fallback web scraping for Amazon search results."""
         candidates = []
         
         for query in queries[:2]:  # Limit scraping requests
+            if deadline is not None and deadline.expired:
+                break  # Out of time: return what we have
             search_url = f"https://www.amazon.com/s?k={quote_plus(query)}"
             
-            content = await self.fetch(search_url)
+            content = await self.fetch(search_url, deadline=deadline)
             if content:
                 scraped_products = self._parse_amazon_search_results(content, query)
                 candidates.extend(scraped_products)
@@ -173,9 +182,9 @@ class AmazonAdapter(BaseAdapter):
         mapping = {
             "wireless_earbuds": "Electronics",
             "standing_desk": "OfficeProducts",
-            "laptop": "Computers",
-            "smartphone": "Electronics",
-            "headphones": "Electronics"
+            "gaming_laptop": "Computers",
+            "noise_canceling_headphones": "Electronics",
+            "smartphone": "Electronics"
         }
         return mapping.get(category, "All")
     
@@ -223,17 +232,18 @@ class RedditAdapter(BaseAdapter):
         self.access_token = None
         self.base_url = "https://oauth.reddit.com"
     
-    async def search_products(self, queries: List[str], category: str, max_results: int = 15) -> List[Dict]:
+    async def search_products(self, queries: List[str], category: str, max_results: int = 15,
+                              deadline: Optional[Deadline] = None) -> List[Dict]:
         """Search Reddit for product discussions and recommendations."""
         candidates = []
         
         if self.client_id and self.client_secret:
             # Use official Reddit API
             await self._authenticate()
-            candidates = await self._search_via_api(queries, category, max_results)
+            candidates = await self._search_via_api(queries, category, max_results, deadline)
         else:
             # Fallback to web scraping Reddit
-            candidates = await self._search_via_scraping(queries, category, max_results)
+            candidates = await self._search_via_scraping(queries, category, max_results, deadline)
         
         return candidates
     
@@ -254,7 +264,8 @@ class RedditAdapter(BaseAdapter):
         except Exception:
             pass
     
-    async def _search_via_api(self, queries: List[str], category: str, max_results: int) -> List[Dict]:
+    async def _search_via_api(self, queries: List[str], category: str, max_results: int,
+                              deadline: Optional[Deadline] = None) -> List[Dict]:
         """Search using official Reddit API."""
         candidates = []
         
@@ -268,6 +279,8 @@ class RedditAdapter(BaseAdapter):
         
         for query in queries[:3]:
             for subreddit in subreddits[:2]:  # Limit subreddit searches
+                if deadline is not None and deadline.expired:
+                    return candidates[:max_results]  # Out of time: return what we have
                 search_url = f"{self.base_url}/r/{subreddit}/search"
                 params = {
                     'q': query,
@@ -277,7 +290,8 @@ class RedditAdapter(BaseAdapter):
                 }
                 
                 try:
-                    async with self.session.get(search_url, headers=headers, params=params) as response:
+                    timeout = deadline.timeout(10) if deadline is not None else 10
+                    async with self.session.get(search_url, headers=headers, params=params, timeout=timeout) as response:
                         if response.status == 200:
                             data = await response.json()
                             posts = self._parse_reddit_api_response(data, query, subreddit)
@@ -290,16 +304,19 @@ class RedditAdapter(BaseAdapter):
         
         return candidates[:max_results]
     
-    async def _search_via_scraping(self, queries: List[str], category: str, max_results: int) -> List[Dict]:
+    async def _search_via_scraping(self, queries: List[str], category: str, max_results: int,
+                                   deadline: Optional[Deadline] = None) -> List[Dict]:
         """Fallback web scraping for Reddit."""
         candidates = []
         subreddits = self._get_relevant_subreddits(category)
         
         for query in queries[:2]:
             for subreddit in subreddits[:2]:
+                if deadline is not None and deadline.expired:
+                    return candidates[:max_results]  # Out of time: return what we have
                 search_url = f"https://www.reddit.com/r/{subreddit}/search/?q={quote_plus(query)}&restrict_sr=1"
                 
-                content = await self.fetch(search_url)
+                content = await self.fetch(search_url, deadline=deadline)
                 if content:
                     scraped_posts = self._parse_reddit_search_results(content, query, subreddit)
                     candidates.extend(scraped_posts)
@@ -313,7 +330,8 @@ class RedditAdapter(BaseAdapter):
         subreddit_mapping = {
             "wireless_earbuds": ["headphones", "audiophile", "BuyItForLife"],
             "standing_desk": ["battlestations", "HomeOffice", "BuyItForLife"],
-            "laptop": ["laptops", "SuggestALaptop", "BuyItForLife"],
+            "gaming_laptop": ["GamingLaptops", "SuggestALaptop", "laptops"],
+            "noise_canceling_headphones": ["headphones", "HeadphoneAdvice", "onebag"],
             "smartphone": ["Android", "iphone", "PickAnAndroidForMe"]
         }
         
@@ -411,14 +429,17 @@ class ReviewBlogAdapter(BaseAdapter):
             "consumerreports.org"
         ]
     
-    async def search_products(self, queries: List[str], category: str, max_results: int = 10) -> List[Dict]:
+    async def search_products(self, queries: List[str], category: str, max_results: int = 10,
+                              deadline: Optional[Deadline] = None) -> List[Dict]:
         """Search review blogs for product recommendations."""
         candidates = []
         
         for query in queries[:2]:  # Limit queries
             for site in self.review_sites[:3]:  # Limit sites
+                if deadline is not None and deadline.expired:
+                    return candidates[:max_results]  # Out of time: return what we have
                 try:
-                    site_candidates = await self._search_site(site, query, category)
+                    site_candidates = await self._search_site(site, query, category, deadline)
                     candidates.extend(site_candidates)
                     
                     await asyncio.sleep(1)  # Rate limiting
@@ -428,12 +449,13 @@ class ReviewBlogAdapter(BaseAdapter):
         
         return candidates[:max_results]
     
-    async def _search_site(self, site: str, query: str, category: str) -> List[Dict]:
+    async def _search_site(self, site: str, query: str, category: str,
+                           deadline: Optional[Deadline] = None) -> List[Dict]:
         """Search a specific review site."""
         # Use Google site search
         search_url = f"https://www.google.com/search?q=site:{site} {quote_plus(query)}"
         
-        content = await self.fetch(search_url)
+        content = await self.fetch(search_url, deadline=deadline)
         if not content:
             return []
         
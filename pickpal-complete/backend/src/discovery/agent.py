@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional, Set
+from typing import List, Dict, Optional, Set, Tuple, Callable, Awaitable
 import json
 import os
 import asyncio
@@ -9,7 +9,12 @@ from datetime import datetime, timedelta
 from ..common.messages import *
 from ..common.bus import AgentBase
 from ..common.utils import logger, log_context
+from ..common.context import current_request_id
 from ..common.aspects import detect_product_category
+from ..common.categories import CATEGORY_KEYWORDS, detect_category
+from ..common.constraints import compile_constraints
+from ..common.deadline import Deadline, within
+from .cache import CandidatePoolCache
 from .helpers import deduplicate_candidates, gather_evidence_and_filter, expand_search_queries
 from .adapters import AmazonAdapter, RedditAdapter, ReviewBlogAdapter
 from .gemini_adapter import GeminiAdapter
@@ -28,7 +33,13 @@ class DiscoveryAgent(AgentBase):
         self.review_blog_adapter = None
         self.gemini_adapter = None
         
-        # Source priority configuration
+        # Share of the request's remaining time budget given to discovery
+        self.budget_share = 0.6
+        
+        # Raw per-source pools, shared by requests differing only in constraints
+        self.pool_cache = CandidatePoolCache()
+        
+        # Source priority configuration (timeouts cap each source within the budget)
         self.sources = {
             "mock_fallback": {"priority": 1, "enabled": True, "timeout": 1},
             "gemini_ai": {"priority": 2, "enabled": True, "timeout": 15},
@@ -103,8 +114,7 @@ class DiscoveryAgent(AgentBase):
     
     async def discover_products(self, brief: ShoppingBrief) -> List[ProductCandidate]:
         """Discover product candidates from internet sources based on shopping brief."""
-        trace = self.create_trace(brief.trace.request_id, "discovery")
-        self._current_request_id = trace.request_id
+        trace = self.create_trace(brief.trace.request_id, "discovery", self._budget(brief))
         
         with log_context(trace.request_id):
             logger.info(f"Starting internet-based product discovery for query: {brief.query}")
@@ -113,8 +123,7 @@ class DiscoveryAgent(AgentBase):
         
         try:
             # Step 1: Source selection & query building
-            category = self._detect_category(brief.query, brief.category or "")
-            search_queries = self._build_search_queries(brief, category)
+            category, search_queries = self.search_plan(brief)
             
             with log_context(trace.request_id):
                 logger.info(f"Detected category: {category}")
@@ -124,79 +133,185 @@ class DiscoveryAgent(AgentBase):
             all_candidates = []
             sources_tried = []
             
-            for source_name, config in sorted(self.sources.items(), key=lambda x: x[1]['priority']):
-                if not config['enabled']:
-                    continue
-                    
-                try:
-                    with log_context(trace.request_id):
-                        logger.info(f"Trying source: {source_name} (priority {config['priority']})")
-                    
-                    source_candidates = await self._fetch_from_source(
-                        source_name, search_queries, category, brief, trace
-                    )
-                    
-                    sources_tried.append({
-                        'name': source_name,
-                        'candidates_found': len(source_candidates),
-                        'status': 'success'
-                    })
-                    
-                    all_candidates.extend(source_candidates)
-                    
-                    with log_context(trace.request_id):
-                        logger.info(f"Source {source_name}: found {len(source_candidates)} candidates")
-                    
-                except Exception as e:
-                    sources_tried.append({
-                        'name': source_name,
-                        'candidates_found': 0,
-                        'status': f'error: {str(e)[:100]}'
-                    })
-                    
-                    with log_context(trace.request_id):
-                        logger.warning(f"Source {source_name} failed: {e}")
+            for source_name, config in self._enabled_sources():
+                source_candidates, status = await self._try_source(
+                    source_name, config, search_queries, category, brief, trace
+                )
+                sources_tried.append(status)
+                all_candidates.extend(source_candidates)
             
-            # Step 3: De-duplication at URL/name level
-            deduplicated_candidates = deduplicate_candidates(all_candidates, trace.request_id)
+            return await self._finalize_candidates(all_candidates, sources_tried, brief, category, trace)
             
-            # Step 4: Evidence gathering & filtering
-            filtered_candidates = gather_evidence_and_filter(
-                deduplicated_candidates, brief, trace.request_id
-            )
+        except Exception as e:
+            with log_context(trace.request_id):
+                logger.error(f"Discovery failed, falling back to mock data: {e}")
             
-            # Step 5: Backoff & expansion if needed
-            if len(filtered_candidates) < brief.success.get('k', 3):
-                with log_context(trace.request_id):
-                    logger.info(f"Only {len(filtered_candidates)} candidates found, attempting expansion")
-                
-                expanded_candidates = await self._expand_search(
-                    brief, category, trace, current_candidates=filtered_candidates
+            # Fallback to mock data
+            return await self._fallback_to_mock_data(brief, category, trace)
+    
+    async def discover_streaming(self, brief: ShoppingBrief,
+                                 on_batch: Callable[[str, List[Dict]], Awaitable[None]]) -> List[ProductCandidate]:
+        """Discover products, fetching all sources concurrently.
+        
+        Each source's raw candidates are handed to `on_batch` as soon as
+        that source completes, so later stages can start early. The
+        returned candidates are the same as `discover_products`: results
+        are merged in source priority order before finalizing.
+        """
+        trace = self.create_trace(brief.trace.request_id, "discovery", self._budget(brief))
+        
+        with log_context(trace.request_id):
+            logger.info(f"Starting concurrent product discovery for query: {brief.query}")
+        
+        await self._ensure_session()
+        
+        try:
+            category, search_queries = self.search_plan(brief)
+            
+            with log_context(trace.request_id):
+                logger.info(f"Detected category: {category}")
+                logger.info(f"Built {len(search_queries)} search queries: {search_queries}")
+            
+            async def fetch(source_name: str, config: Dict):
+                source_candidates, status = await self._try_source(
+                    source_name, config, search_queries, category, brief, trace
                 )
-                filtered_candidates.extend(expanded_candidates)
+                if source_candidates:
+                    await on_batch(source_name, source_candidates)
+                return source_candidates, status
             
-            # Final constraint filtering
-            final_candidates = self._filter_by_constraints(filtered_candidates, brief.constraints)
+            results = await asyncio.gather(*(fetch(name, config) for name, config in self._enabled_sources()))
             
-            # Log final results with sources
-            with log_context(trace.request_id):
-                logger.info(f"Discovery complete: {len(final_candidates)} candidates from {len(sources_tried)} sources")
-                logger.info(f"Sources tried: {sources_tried}")
-                
-                for candidate in final_candidates:
-                    source_info = candidate.meta.get('source', 'unknown')
-                    logger.info(f"  - {candidate.name}: ${candidate.price}, {candidate.stars}★, "
-                              f"{len(candidate.raw_reviews)} reviews (from {source_info})")
+            # Deterministic merge: source priority order, whatever order they finished in
+            all_candidates = [candidate for source_candidates, _ in results for candidate in source_candidates]
+            sources_tried = [status for _, status in results]
             
-            return final_candidates
+            return await self._finalize_candidates(all_candidates, sources_tried, brief, category, trace)
             
         except Exception as e:
             with log_context(trace.request_id):
                 logger.error(f"Discovery failed, falling back to mock data: {e}")
             
-            # Fallback to mock data
             return await self._fallback_to_mock_data(brief, category, trace)
     
+    def search_plan(self, brief: ShoppingBrief) -> Tuple[str, List[str]]:
+        """Category and search queries discovery will use for a brief."""
+        category = self._detect_category(brief.query, brief.category or "")
+        return category, self._build_search_queries(brief, category)
+    
+    def _budget(self, brief: ShoppingBrief) -> Optional[Deadline]:
+        """Discovery's share of the request deadline, if the request has one."""
+        deadline = brief.trace.deadline
+        return deadline.share(self.budget_share) if deadline is not None else None
+    
+    def _enabled_sources(self) -> List[Tuple[str, Dict]]:
+        """Enabled sources in priority order."""
+        return [(name, config) for name, config in sorted(self.sources.items(), key=lambda x: x[1]['priority'])
+                if config['enabled']]
+    
+    async def _try_source(self, source_name: str, config: Dict, search_queries: List[str], category: str,
+                          brief: ShoppingBrief, trace: Trace) -> Tuple[List[Dict], Dict]:
+        """Fetch one source. Returns its candidates and a status entry for logging."""
+        try:
+            with log_context(trace.request_id):
+                logger.info(f"Trying source: {source_name} (priority {config['priority']})")
+            
+            source_candidates = await within(
+                trace.deadline, self._fetch_pool(source_name, search_queries, category, brief, trace),
+                cap=config['timeout']
+            )
+            
+            with log_context(trace.request_id):
+                logger.info(f"Source {source_name}: found {len(source_candidates)} candidates")
+            
+            return source_candidates, {
+                'name': source_name,
+                'candidates_found': len(source_candidates),
+                'status': 'success'
+            }
+            
+        except asyncio.TimeoutError:
+            with log_context(trace.request_id):
+                logger.warning(f"Source {source_name} ran out of time, continuing without it")
+            if trace.deadline is not None:
+                trace.deadline.degrade(f"discovery: {source_name} timed out")
+            
+            return [], {
+                'name': source_name,
+                'candidates_found': 0,
+                'status': 'timeout'
+            }
+            
+        except Exception as e:
+            with log_context(trace.request_id):
+                logger.warning(f"Source {source_name} failed: {e}")
+            
+            return [], {
+                'name': source_name,
+                'candidates_found': 0,
+                'status': f'error: {str(e)[:100]}'
+            }
+    
+    async def _fetch_pool(self, source_name: str, queries: List[str], category: str,
+                          brief: ShoppingBrief, trace: Trace) -> List[Dict]:
+        """A source's candidates for the queries, from the pool cache when fetched recently.
+        
+        Pools are constraint-agnostic: price and rating constraints are
+        applied to them afterwards, in `_finalize_candidates`.
+        """
+        key = (source_name, category, tuple(queries), brief.success.get('k', 3))
+        return await self.pool_cache.get_or_fetch(
+            key, lambda: self._fetch_from_source(source_name, queries, category, brief, trace)
+        )
+    
+    async def _finalize_candidates(self, all_candidates: List[Dict], sources_tried: List[Dict],
+                                   brief: ShoppingBrief, category: str, trace: Trace) -> List[ProductCandidate]:
+        """Turn raw source results (in source priority order) into final candidates.
+        
+        De-duplicates, gathers evidence, expands the search if too few
+        candidates remain and applies the brief's constraints.
+        """
+        # Step 3: De-duplication at URL/name level
+        deduplicated_candidates = deduplicate_candidates(all_candidates, trace.request_id)
+        
+        # Step 4: Evidence gathering & filtering
+        filtered_candidates = gather_evidence_and_filter(
+            deduplicated_candidates, brief, trace.request_id
+        )
+        
+        # Step 5: Backoff & expansion if needed (and there is time left for it)
+        if len(filtered_candidates) < brief.success.get('k', 3):
+            with log_context(trace.request_id):
+                logger.info(f"Only {len(filtered_candidates)} candidates found, attempting expansion")
+            
+            try:
+                if trace.deadline is not None and trace.deadline.expired:
+                    raise asyncio.TimeoutError()
+                expanded_candidates = await within(trace.deadline, self._expand_search(
+                    brief, category, trace, current_candidates=filtered_candidates
+                ))
+                filtered_candidates.extend(expanded_candidates)
+            except asyncio.TimeoutError:
+                with log_context(trace.request_id):
+                    logger.warning("No time left for search expansion, keeping current candidates")
+                if trace.deadline is not None:
+                    trace.deadline.degrade("discovery: search expansion skipped")
+        
+        # Final constraint filtering
+        final_candidates = self._filter_by_constraints(filtered_candidates, brief.constraints, trace.request_id)
+        
+        # Log final results with sources
+        with log_context(trace.request_id):
+            logger.info(f"Discovery complete: {len(final_candidates)} candidates from {len(sources_tried)} sources")
+            logger.info(f"Sources tried: {sources_tried}")
+            
+            for candidate in final_candidates:
+                source_info = candidate.meta.get('source', 'unknown')
+                logger.info(f"  - {candidate.name}: ${candidate.price}, {candidate.stars}★, "
+                          f"{len(candidate.raw_reviews)} reviews (from {source_info})")
+        
+        return final_candidates
+    
     def _detect_category(self, query: str, category: str) -> str:
         # Detect product category based on query matching the 4 predefined options
         query_lower = query.lower()
@@ -211,21 +326,15 @@ class DiscoveryAgent(AgentBase):
         elif "noise" in query_lower and "canceling" in query_lower and "headphones" in query_lower and "travel" in query_lower:
             return "noise_canceling_headphones"
         
-        # Fallback detection for partial matches
-        if any(word in query_lower for word in ["earbuds", "airpods", "wireless earbuds"]):
-            return "wireless_earbuds"
-        elif any(word in query_lower for word in ["desk", "standing", "workstation"]):
-            return "standing_desk"
-        elif any(word in query_lower for word in ["laptop", "gaming", "computer"]):
-            return "gaming_laptop"
-        elif any(word in query_lower for word in ["headphones", "noise", "canceling", "cancelling"]):
-            return "noise_canceling_headphones"
+        # The planner's category (one of its candidates for ambiguous queries)
+        if category in CATEGORY_KEYWORDS:
+            return category
         
-        # Default fallback to wireless earbuds for any other query
-        return "wireless_earbuds"
+        # No category to guess for an ambiguous query: search its own words
+        return detect_category(query) or "general"
     
     def _build_search_queries(self, brief: ShoppingBrief, category: str) -> List[str]:
-        """Build search queries with synonyms and constraints."""
+        """Build search queries from category synonyms and use cases (not constraints)."""
         queries = []
         
         # Get base terms for category
@@ -242,20 +351,14 @@ class DiscoveryAgent(AgentBase):
         if "work" in query_lower or "office" in query_lower:
             use_case_terms.extend(["work", "office", "professional"])
         
-        # Build queries combining base terms with use cases
+        # Build queries combining base terms with use cases. Constraints are left
+        # out so that pools can be shared across budgets; they are applied afterwards
         for base_term in base_terms:
             if use_case_terms:
                 for use_case in use_case_terms[:2]:  # Limit to avoid too many queries
-                    query = f"{base_term} {use_case}"
-                    # Add price constraint to query for discovery (not filtering)
-                    if "max_price" in brief.constraints:
-                        query += f" under ${brief.constraints['max_price']}"
-                    queries.append(query)
+                    queries.append(f"{base_term} {use_case}")
             else:
-                query = base_term
-                if "max_price" in brief.constraints:
-                    query += f" under ${brief.constraints['max_price']}"
-                queries.append(query)
+                queries.append(base_term)
         
         return queries[:5]  # Limit to 5 queries to avoid rate limits
     
@@ -280,14 +383,16 @@ class DiscoveryAgent(AgentBase):
                                brief: ShoppingBrief, trace: Trace) -> List[Dict]:
         """Fetch candidates from a specific source using real adapters."""
         try:
+            deadline = trace.deadline
             if source_name == "gemini_ai" and self.gemini_adapter:
-                return await self.gemini_adapter.search_products(queries, category, max_results=3)
+                return await self.gemini_adapter.search_products(queries, category, max_results=3, deadline=deadline)
             elif source_name == "amazon" and self.amazon_adapter:
-                return await self.amazon_adapter.search_products(queries, category, max_results=20)
+                return await self.amazon_adapter.search_products(queries, category, max_results=20, deadline=deadline)
             elif source_name == "reddit" and self.reddit_adapter:
-                return await self.reddit_adapter.search_products(queries, category, max_results=15)
+                return await self.reddit_adapter.search_products(queries, category, max_results=15, deadline=deadline)
             elif source_name == "review_blogs" and self.review_blog_adapter:
-                return await self.review_blog_adapter.search_products(queries, category, max_results=10)
+                return await self.review_blog_adapter.search_products(queries, category, max_results=10,
+                                                                      deadline=deadline)
             elif source_name == "mock_fallback":
                 return await self._fetch_from_mock_fallback(brief, category, trace)
             else:
@@ -355,7 +460,7 @@ class DiscoveryAgent(AgentBase):
                 continue
                 
             try:
-                source_candidates = await self._fetch_from_source(
+                source_candidates = await self._fetch_pool(
                     source_name, expanded_queries, category, brief, trace
                 )
                 expanded_candidates.extend(source_candidates)
@@ -383,78 +488,53 @@ class DiscoveryAgent(AgentBase):
             logger.warning("All internet sources failed, falling back to mock data")
         
         mock_candidates = await self._fetch_from_mock_fallback(brief, category, trace)
-        return self._filter_by_constraints(mock_candidates, brief.constraints)
+        return self._filter_by_constraints(mock_candidates, brief.constraints, trace.request_id)
     
-    def _filter_by_constraints(self, candidates: List[Dict], constraints: Dict) -> List[ProductCandidate]:
+    def _filter_by_constraints(self, candidates: List[Dict], constraints: Dict,
+                               request_id: str = None) -> List[ProductCandidate]:
         """Filter candidates based on constraints and convert to ProductCandidate objects."""
-        filtered = []
-        filtered_out = []
+        request_id = request_id or current_request_id()
+        check = compile_constraints(constraints).check(candidates)
         
-        for candidate in candidates:
-            should_filter = False
-            filter_reason = []
-            
-            # Price constraint
-            if "max_price" in constraints:
-                if candidate.get("price", 0) > constraints["max_price"]:
-                    should_filter = True
-                    filter_reason.append(f"price ${candidate.get('price', 0)} > max ${constraints['max_price']}")
-            
-            if "min_price" in constraints:
-                if candidate.get("price", 0) < constraints["min_price"]:
-                    should_filter = True
-                    filter_reason.append(f"price ${candidate.get('price', 0)} < min ${constraints['min_price']}")
-            
-            # Rating constraint
-            if "min_rating" in constraints:
-                if candidate.get("stars", 0) < constraints["min_rating"]:
-                    should_filter = True
-                    filter_reason.append(f"rating {candidate.get('stars', 0)} < min {constraints['min_rating']}")
-            
-            # Review count constraint
-            if "min_reviews" in constraints:
-                review_count = candidate.get("reviews_count", len(candidate.get("reviews", [])))
-                if review_count < constraints["min_reviews"]:
-                    should_filter = True
-                    filter_reason.append(f"reviews {review_count} < min {constraints['min_reviews']}")
-            
-            if should_filter:
-                filtered_out.append({
-                    "name": candidate.get("name", "Unknown"),
-                    "price": candidate.get("price"),
-                    "reason": "; ".join(filter_reason)
-                })
-            else:
-                # Convert to ProductCandidate
-                product_candidate = ProductCandidate(
-                    name=candidate.get("name", "Unknown Product"),
-                    price=candidate.get("price", 0.0),
-                    stars=candidate.get("stars", 0.0),
-                    url=candidate.get("url", ""),
-                    raw_reviews=candidate.get("reviews", []),
-                    meta={
-                        "source": candidate.get("source", "unknown"),
-                        "reviews_count": candidate.get("reviews_count", 0),
-                        "last_updated": candidate.get("last_updated", ""),
-                        "upvotes": candidate.get("upvotes", 0),
-                        "mentions": candidate.get("mentions", 0),
-                        "evidence_score": candidate.get("evidence_score", 0),
-                        "evidence_notes": candidate.get("evidence_notes", [])
-                    },
-                    trace=Trace(request_id=getattr(self, '_current_request_id', 'unknown'), 
-                               step="filter", source_agent="discovery"),
-                    image_url=candidate.get("image_url", "")
-                )
-                filtered.append(product_candidate)
+        filtered = [self.to_product_candidate(candidate, request_id) for candidate in check.kept()]
+        filtered_out = [
+            {"name": candidate.get("name", "Unknown"), "price": candidate.get("price"), "reason": reason}
+            for candidate, reason in check.violations()
+        ]
         
         # Log filtering results
-        with log_context(getattr(self, '_current_request_id', 'unknown')):
+        with log_context(request_id):
             logger.info(f"Constraint filtering: {len(filtered)} candidates passed, {len(filtered_out)} filtered out")
             for item in filtered_out:
                 logger.info(f"Filtered out: {item['name']} (${item['price']}) - {item['reason']}")
         
         return filtered
     
+    def to_product_candidate(self, candidate: Dict, request_id: str = None) -> ProductCandidate:
+        """Convert a raw source candidate into a ProductCandidate.
+        
+        Defaults to the request the current task is serving.
+        """
+        return ProductCandidate(
+            name=candidate.get("name", "Unknown Product"),
+            price=candidate.get("price", 0.0),
+            stars=candidate.get("stars", 0.0),
+            url=candidate.get("url", ""),
+            raw_reviews=candidate.get("reviews", []),
+            meta={
+                "source": candidate.get("source", "unknown"),
+                "reviews_count": candidate.get("reviews_count", 0),
+                "last_updated": candidate.get("last_updated", ""),
+                "upvotes": candidate.get("upvotes", 0),
+                "mentions": candidate.get("mentions", 0),
+                "evidence_score": candidate.get("evidence_score", 0),
+                "evidence_notes": candidate.get("evidence_notes", [])
+            },
+            trace=Trace(request_id=request_id or current_request_id(), 
+                       step="filter", source_agent="discovery"),
+            image_url=candidate.get("image_url", "")
+        )
+    
     async def handle_discovery_request(self, message):
         """Handle discovery request from message bus."""
         try:
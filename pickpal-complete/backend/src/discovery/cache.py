@@ -0,0 +1,93 @@
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# (source name, category, search queries, desired count)
+PoolKey = Tuple[str, str, Tuple[str, ...], int]
+
+class CandidatePoolCache:
+    """TTL + LRU cache of raw per-source candidate pools.
+
+    Pools are keyed only by what the source is asked for - category and
+    search queries (base terms plus use-case terms) - never by price or
+    rating constraints, which are applied to the pool afterwards. So
+    "earbuds under $150" and "earbuds under $200" share one fetch.
+    Concurrent fetches of the same pool are coalesced. Empty pools are
+    not cached: adapters report failures as empty results.
+    """
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._pools: "OrderedDict[PoolKey, Tuple[List[Dict], float]]" = OrderedDict()
+        self._in_flight: Dict[PoolKey, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_fetch(self, key: PoolKey, fetch: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """Copies of the pool's candidates, fetching it on a miss.
+
+        Callers annotate candidate dicts (evidence scores, notes) and the
+        review lists become their products' raw reviews, hence deep
+        copies: no two requests share any part of a candidate.
+        """
+        pool = self._get(key)
+        if pool is not None:
+            self.hits += 1
+            return copy.deepcopy(pool)
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            pool = await asyncio.shield(in_flight)
+            if pool is None:
+                # The fetch we joined was cancelled with its caller; fetch for ourselves
+                return await self.get_or_fetch(key, fetch)
+            self.hits += 1
+            return copy.deepcopy(pool)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            pool = await fetch()
+            # Waiters copy the pool as it was fetched, before our caller annotates it
+            snapshot = copy.deepcopy(pool)
+            if pool:
+                self._put(key, snapshot)
+            future.set_result(snapshot)
+            return pool
+        except asyncio.CancelledError:
+            future.set_result(None)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't leave "exception never retrieved" behind
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    def invalidate(self, category: Optional[str] = None) -> int:
+        """Drop all pools, or those of one category. Returns how many were dropped."""
+        keys = [key for key in self._pools if category is None or key[1] == category]
+        for key in keys:
+            del self._pools[key]
+        return len(keys)
+
+    def _get(self, key: PoolKey) -> Optional[List[Dict]]:
+        entry = self._pools.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] > self.ttl:
+            del self._pools[key]
+            return None
+        self._pools.move_to_end(key)
+        return entry[0]
+
+    def _put(self, key: PoolKey, pool: List[Dict]):
+        self._pools[key] = (pool, time.monotonic())
+        self._pools.move_to_end(key)
+        while len(self._pools) > self.max_entries:
+            self._pools.popitem(last=False)
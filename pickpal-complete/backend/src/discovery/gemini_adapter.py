@@ -1,15 +1,18 @@
+import asyncio
 import json
 import re
 from typing import List, Dict, Optional
 import google.generativeai as genai
 from datetime import datetime
 from ..common.utils import logger, log_context
+from ..common.deadline import Deadline, within
 
 class GeminiAdapter:
     """Adapter for Gemini API to generate product recommendations."""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, timeout: float = 15.0):
         self.api_key = api_key
+        self.timeout = timeout  # Upper bound per call, within the request deadline
         self.model = None
         self._initialized = False
     
@@ -20,7 +23,8 @@ class GeminiAdapter:
             self.model = genai.GenerativeModel('gemini-1.5-flash')
             self._initialized = True
     
-    async def search_products(self, queries: List[str], category: str, max_results: int = 3) -> List[Dict]:
+    async def search_products(self, queries: List[str], category: str, max_results: int = 3,
+                              deadline: Optional[Deadline] = None) -> List[Dict]:
         """Generate product recommendations using Gemini API."""
         try:
             # Ensure model is initialized
@@ -31,11 +35,16 @@ class GeminiAdapter:
             
             prompt = self._build_product_prompt(main_query, category, max_results)
             
-            response = self.model.generate_content(prompt)
+            # The client blocks, so run it off the event loop and stop waiting at the deadline
+            response = await within(deadline, asyncio.to_thread(self.model.generate_content, prompt), cap=self.timeout)
             products = self._parse_gemini_response(response.text)
             
             return products[:max_results]
             
+        except asyncio.TimeoutError:
+            logger.warning("Gemini API call ran out of time")
+            return []
+            
         except Exception as e:
             logger.error(f"Gemini API error: {e}")
             return []
@@ -1,15 +1,18 @@
+import asyncio
 import json
 import re
 from typing import List, Dict, Optional
 import google.generativeai as genai
 from datetime import datetime
 from ..common.utils import logger, log_context
+from ..common.deadline import Deadline, within
 
 class SimpleGeminiSearch:
     """Simple Gemini search for direct product recommendations without agent pipeline."""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, timeout: float = 15.0):
         self.api_key = api_key
+        self.timeout = timeout  # Upper bound per call, within the request deadline
         self.model = None
         self._initialized = False
     
@@ -20,17 +23,25 @@ class SimpleGeminiSearch:
             self.model = genai.GenerativeModel('gemini-1.5-flash')
             self._initialized = True
     
-    async def search_simple(self, query: str, max_price: Optional[float] = None, min_rating: Optional[float] = None) -> List[Dict]:
+    async def search_simple(self, query: str, max_price: Optional[float] = None, min_rating: Optional[float] = None,
+                            deadline: Optional[Deadline] = None) -> List[Dict]:
         """Generate simple product recommendations using Gemini API."""
         try:
             self._ensure_initialized()
             
             prompt = self._build_simple_prompt(query, max_price, min_rating)
-            response = self.model.generate_content(prompt)
+            # The client blocks, so run it off the event loop and stop waiting at the deadline
+            response = await within(deadline, asyncio.to_thread(self.model.generate_content, prompt), cap=self.timeout)
             products = self._parse_simple_response(response.text)
             
             return products[:3]  # Always return exactly 3 products
             
+        except asyncio.TimeoutError:
+            logger.warning("Simple Gemini search ran out of time, using fallback products")
+            if deadline is not None:
+                deadline.degrade("search: Gemini timed out, fallback products returned")
+            return self._generate_simple_fallback(query)
+            
         except Exception as e:
             logger.error(f"Simple Gemini search error: {e}")
             return self._generate_simple_fallback(query)
@@ -1,17 +1,25 @@
-from typing import List, Dict
-import hashlib
-from rapidfuzz import fuzz
-from datetime import datetime
+from typing import List, Dict, Tuple
+from collections import OrderedDict
+from dataclasses import replace
+from datetime import datetime, date
 from ..common.messages import *
 from ..common.bus import AgentBase
 from ..common.utils import logger, log_context, clean_text
-from ..common.aspects import calculate_aspect_frequency
+from ..common.aspects import ASPECT_KEYWORDS, analyze_reviews, detect_product_category
+from .canon import ReviewDeduplicator, ReviewIndex
+from .registry import CanonicalRegistry
 
 class NormalizerAgent(AgentBase):
     """Agent responsible for normalizing and enriching product candidates."""
     
-    def __init__(self):
+    def __init__(self, enrichment_cache_size: int = 512):
         super().__init__("normalizer")
+        self.review_filter = ReviewDeduplicator()
+        self.registry = CanonicalRegistry()
+        self.enrichment_cache_size = enrichment_cache_size
+        self._enrichment_cache: "OrderedDict[tuple, tuple]" = OrderedDict()  # Content key -> (signals, analysis, aspects)
+        self._review_indexes: "OrderedDict[str, ReviewIndex]" = OrderedDict()  # Request id -> prewarmed reviews
+        self.max_review_indexes = 64
     
     async def normalize_products(self, candidates: List[ProductCandidate]) -> List[EnrichedProduct]:
         """Normalize and enrich product candidates."""
@@ -23,13 +31,25 @@ class NormalizerAgent(AgentBase):
         with log_context(trace.request_id):
             logger.info(f"Normalizing {len(candidates)} product candidates")
         
-        # Deduplicate products
+        # Drop low-quality and near-duplicate reviews before any text analysis, exactly as
+        # prewarm did for this request so its enrichments are reused
+        index = self._review_indexes.pop(trace.request_id, None)
+        candidates, review_stats = self.review_filter.filter_batch(candidates, index)
+        
+        with log_context(trace.request_id):
+            logger.info(f"Review filtering: kept {review_stats['kept']}, dropped "
+                        f"{review_stats['duplicates']} near-duplicates and {review_stats['low_quality']} low-quality")
+        
+        # Resolve canonical ids and merge candidates of the same product
+        await self.registry.load()
         deduplicated = self._deduplicate_products(candidates)
+        await self.registry.flush()
         
         # Enrich with signals and aspects
         enriched_products = []
-        for candidate in deduplicated:
+        for canonical_id, candidate in deduplicated:
             enriched = await self._enrich_product(candidate, trace)
+            enriched.canonical_id = canonical_id
             enriched_products.append(enriched)
         
         with log_context(trace.request_id):
@@ -40,45 +60,83 @@ class NormalizerAgent(AgentBase):
         
         return enriched_products
     
-    def _deduplicate_products(self, candidates: List[ProductCandidate]) -> List[ProductCandidate]:
-        """Remove duplicate products using fuzzy matching."""
-        if len(candidates) <= 1:
-            return candidates
+    async def prewarm(self, candidates: List[ProductCandidate], trace: Trace) -> List[EnrichedProduct]:
+        """Speculatively enrich a partial batch of candidates.
+        
+        Used while discovery is still running. Reviews are filtered
+        against the request's earlier batches through a shared review
+        index, which the request's final `normalize_products` reuses, so
+        every product keeps the same reviews there and its enrichment is
+        served from the cache. Only products merged across sources at the
+        end (their combined reviews are new) are enriched again.
+        """
+        index = self._review_indexes.pop(trace.request_id, None) or ReviewIndex()
+        self._review_indexes[trace.request_id] = index
+        while len(self._review_indexes) > self.max_review_indexes:
+            self._review_indexes.popitem(last=False)
+        
+        candidates, _ = self.review_filter.filter_batch(candidates, index)
+        return [await self._enrich_product(candidate, trace) for candidate in candidates]
+    
+    def _deduplicate_products(self, candidates: List[ProductCandidate]) -> List[Tuple[str, ProductCandidate]]:
+        """Group candidates by canonical id, merging reviews from every source.
         
-        unique_products = []
-        seen_names = []
+        Returns (canonical_id, candidate) pairs in first-seen order. The
+        first candidate of a product is kept, with the reviews of later
+        duplicates appended.
+        """
+        merged: Dict[str, ProductCandidate] = {}
+        batch_names: Dict[str, str] = {}
         
         for candidate in candidates:
-            is_duplicate = False
-            clean_name = clean_text(candidate.name)
-            
-            for seen_name in seen_names:
-                similarity = fuzz.ratio(clean_name.lower(), seen_name.lower())
-                if similarity > 85:  # 85% similarity threshold
-                    is_duplicate = True
-                    break
+            canonical_id = self.registry.resolve(candidate.name, candidate.url or "", batch_names)
+            existing = merged.get(canonical_id)
+            if existing is None:
+                merged[canonical_id] = candidate
+                continue
             
-            if not is_duplicate:
-                unique_products.append(candidate)
-                seen_names.append(clean_name)
-        
-        return unique_products
+            # Same product from another source: keep one candidate with all reviews
+            meta = dict(existing.meta)
+            meta["reviews_count"] = (meta.get("reviews_count") or len(existing.raw_reviews)) + \
+                (candidate.meta.get("reviews_count") or len(candidate.raw_reviews))
+            meta["merged_sources"] = meta.get("merged_sources", [meta.get("source", "unknown")]) + \
+                [candidate.meta.get("source", "unknown")]
+            merged[canonical_id] = replace(existing, raw_reviews=existing.raw_reviews + candidate.raw_reviews, meta=meta)
+        
+        return list(merged.items())
     
     async def _enrich_product(self, candidate: ProductCandidate, trace: Trace) -> EnrichedProduct:
         """Enrich a product candidate with quality signals and aspects."""
         # Extract data from candidate
         reviews = candidate.raw_reviews
         
-        # Calculate quality signals
-        signals = self._calculate_signals(reviews)
+        category = candidate.meta.get("category")
+        if category not in ASPECT_KEYWORDS:
+            category = detect_product_category(candidate.name, "")
         
-        # Calculate aspect frequencies
-        category = candidate.meta.get("category", "general")
-        aspect_counts = calculate_aspect_frequency(reviews, category)
+        # Enrichment depends only on the reviews and category (and today's date for recency)
+        cache_key = (category, date.today(), tuple(
+            (r.get("text"), r.get("stars"), r.get("date"), r.get("helpful"), r.get("verified")) for r in reviews
+        ))
+        cached = self._enrichment_cache.get(cache_key)
         
-        # Convert counts to frequencies (normalize by total reviews)
-        total_reviews = len(reviews) if reviews else 1
-        aspects = {aspect: count / total_reviews for aspect, count in aspect_counts.items()}
+        if cached is not None:
+            self._enrichment_cache.move_to_end(cache_key)
+            signals, analysis, aspects = cached
+        else:
+            # Calculate quality signals
+            signals = self._calculate_signals(reviews)
+            
+            # Analyse review text once; the ranker reuses this analysis
+            analysis = analyze_reviews(reviews, category)
+            
+            # Convert counts to frequencies (normalize by total reviews)
+            total_reviews = len(reviews) if reviews else 1
+            aspects = {aspect: count / total_reviews for aspect, count in analysis.aspect_frequency.items()}
+            
+            self._enrichment_cache[cache_key] = (signals, analysis, aspects)
+            if len(self._enrichment_cache) > self.enrichment_cache_size:
+                self._enrichment_cache.popitem(last=False)
         
         enriched = EnrichedProduct(
             name=candidate.name,
@@ -86,19 +144,15 @@ class NormalizerAgent(AgentBase):
             stars=candidate.stars or 0.0,
             url=candidate.url or "",
             raw_reviews=candidate.raw_reviews,
-            aspects=aspects,
-            quality_signals=signals,
+            aspects=dict(aspects),
+            quality_signals=dict(signals),
             meta=candidate.meta,
             trace=trace,
-            image_url=candidate.image_url
+            image_url=candidate.image_url,
+            analysis=analysis
         )
         return enriched
     
-    def _generate_canonical_id(self, product_name: str) -> str:
-        """Generate a canonical ID for the product."""
-        clean_name = clean_text(product_name).lower()
-        return hashlib.md5(clean_name.encode()).hexdigest()[:12]
-    
     def _calculate_signals(self, reviews: List[Dict]) -> Dict[str, float]:
         """Calculate quality signals from reviews."""
         if not reviews:
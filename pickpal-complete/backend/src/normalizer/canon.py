@@ -0,0 +1,167 @@
+from typing import List, Dict, Tuple
+from dataclasses import replace
+import hashlib
+import re
+import numpy as np
+from ..common.messages import ProductCandidate
+from ..common.scoring import calculate_review_quality_scores
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+def normalize_review(review) -> Dict:
+    """Coerce a raw review (adapters sometimes emit plain strings) into a dict."""
+    if isinstance(review, dict):
+        return review
+    return {"text": str(review or "")}
+
+def simhash(text: str, shingle_size: int = 3) -> Tuple[int, int]:
+    """64-bit SimHash over word shingles. Returns (fingerprint, token count)."""
+    tokens = _WORD_PATTERN.findall(text.lower())
+    if not tokens:
+        return 0, 0
+
+    if len(tokens) < shingle_size:
+        shingles = [" ".join(tokens)]
+    else:
+        shingles = [" ".join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)]
+
+    digests = b"".join(hashlib.blake2b(s.encode(), digest_size=8).digest() for s in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(len(shingles), 64)
+
+    # Majority vote per bit position
+    votes = bits.sum(axis=0) * 2 > len(shingles)
+    fingerprint = int.from_bytes(np.packbits(votes).tobytes(), "big")
+    return fingerprint, len(tokens)
+
+class ReviewIndex:
+    """Reviews kept so far by successive `ReviewDeduplicator.filter_batch` calls.
+
+    Sharing one index across a request's batches makes filtering depend
+    on the order products first arrived in, not on how they were
+    batched: a product filtered before keeps exactly the reviews it kept
+    then, and later products are checked against every earlier one.
+    """
+
+    def __init__(self):
+        self.buckets: Dict[Tuple[int, int], List[Tuple[int, int, bool]]] = {}  # band key -> (fingerprint, product, cross)
+        self.products: Dict[Tuple, Tuple[int, List[Dict], int, int]] = {}  # key -> (number, kept, low quality, duplicates)
+        self.seen = 0  # Products filtered so far, numbered in order
+
+    @staticmethod
+    def product_key(candidate: ProductCandidate) -> Tuple:
+        """Identity of a candidate and its raw reviews."""
+        return (candidate.name, candidate.url or "",
+                tuple(str(normalize_review(r).get("text", "") or "") for r in candidate.raw_reviews))
+
+class ReviewDeduplicator:
+    """Near-duplicate and low-quality review filter applied before enrichment.
+
+    Reviews are first pre-filtered with the vectorized review quality
+    score, then fingerprinted with SimHash. Fingerprints are indexed by
+    `bands` equal slices, so any two fingerprints within `max_distance`
+    bits share at least one slice (pigeonhole) and a lookup only inspects
+    one bucket per slice, keeping indexing linear in the number of reviews.
+
+    Near-duplicates are dropped within a product regardless of length.
+    Across products only reviews of at least `min_cross_tokens` words are
+    compared, since short phrases ("Great sound") legitimately repeat.
+    """
+
+    def __init__(self, max_distance: int = 3, bands: int = 4, shingle_size: int = 3,
+                 min_cross_tokens: int = 8, min_quality: float = 4.0):
+        if max_distance >= bands:
+            raise ValueError("bands must exceed max_distance for the band index to be exact")
+        self.max_distance = max_distance
+        self.bands = bands
+        self.band_bits = 64 // bands
+        self.shingle_size = shingle_size
+        self.min_cross_tokens = min_cross_tokens
+        self.min_quality = min_quality
+
+    def filter_batch(self, candidates: List[ProductCandidate],
+                     index: ReviewIndex = None) -> Tuple[List[ProductCandidate], Dict[str, int]]:
+        """Filter reviews of a batch of candidates.
+
+        Returns new candidates with filtered reviews (inputs are not
+        modified) and counts of dropped reviews by reason. With an
+        `index` from earlier batches, products it already holds keep
+        their earlier result and new ones are also checked against them.
+        """
+        stats = {"low_quality": 0, "duplicates": 0, "kept": 0}
+        if not candidates:
+            return candidates, stats
+
+        index = index if index is not None else ReviewIndex()
+        earlier = index.seen
+        reviews = [[normalize_review(r) for r in c.raw_reviews] for c in candidates]
+        keep_quality = self._quality_mask([r for product_reviews in reviews for r in product_reviews])
+
+        band_mask = (1 << self.band_bits) - 1
+        filtered = []
+        offset = 0
+
+        for candidate, product_reviews in zip(candidates, reviews):
+            key = ReviewIndex.product_key(candidate)
+            known = index.products.get(key)
+            offset += len(product_reviews)
+            if known is not None and known[0] < earlier:
+                _, kept, low_quality, duplicates = known
+                stats["low_quality"] += low_quality
+                stats["duplicates"] += duplicates
+                stats["kept"] += len(kept)
+                filtered.append(replace(candidate, raw_reviews=list(kept)))
+                continue
+
+            product_number = index.seen
+            index.seen += 1
+            kept = []
+            low_quality = duplicates = 0
+            for review, passes_quality in zip(product_reviews, keep_quality[offset - len(product_reviews):offset]):
+                if not passes_quality:
+                    low_quality += 1
+                    continue
+
+                fingerprint, n_tokens = simhash(review.get("text", ""), self.shingle_size)
+                cross = n_tokens >= self.min_cross_tokens
+                keys = [(band, (fingerprint >> (band * self.band_bits)) & band_mask) for band in range(self.bands)]
+
+                if self._is_duplicate(index.buckets, keys, fingerprint, product_number, cross):
+                    duplicates += 1
+                    continue
+
+                for band_key in keys:
+                    index.buckets.setdefault(band_key, []).append((fingerprint, product_number, cross))
+                kept.append(review)
+
+            index.products.setdefault(key, (product_number, kept, low_quality, duplicates))
+            stats["low_quality"] += low_quality
+            stats["duplicates"] += duplicates
+            stats["kept"] += len(kept)
+            filtered.append(replace(candidate, raw_reviews=kept))
+
+        return filtered, stats
+
+    def _is_duplicate(self, index: Dict, keys: List[Tuple[int, int]], fingerprint: int,
+                      product_idx: int, cross: bool) -> bool:
+        for key in keys:
+            for other_fingerprint, other_product, other_cross in index.get(key, ()):
+                if other_product != product_idx and not (cross and other_cross):
+                    continue
+                if (fingerprint ^ other_fingerprint).bit_count() <= self.max_distance:
+                    return True
+        return False
+
+    def _quality_mask(self, reviews: List[Dict]) -> np.ndarray:
+        """Vectorized pre-filter: drop empty reviews and those below min_quality."""
+        if not reviews:
+            return np.zeros(0, dtype=bool)
+
+        texts = [str(r.get("text", "") or "").strip() for r in reviews]
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.float64, count=len(texts))
+        verified = np.fromiter((bool(r.get("verified", False)) for r in reviews), dtype=bool, count=len(reviews))
+        helpful = np.fromiter((r.get("helpful", 0) or 0 for r in reviews), dtype=np.float64, count=len(reviews))
+        total = np.fromiter((r.get("total_votes", r.get("helpful", 0)) or 0 for r in reviews),
+                            dtype=np.float64, count=len(reviews))
+
+        quality = calculate_review_quality_scores(lengths, verified, helpful, total)
+        return (lengths > 0) & (quality >= self.min_quality)
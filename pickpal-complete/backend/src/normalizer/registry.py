@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import aiosqlite
+from rapidfuzz import fuzz
+from ..common.utils import logger, clean_text
+
+_NAME_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_TERMINAL = "\0"
+
+def normalize_name(name: str) -> str:
+    """Lowercase alphanumeric tokens of a product name, space separated."""
+    return " ".join(_NAME_TOKEN_PATTERN.findall(clean_text(name or "").lower()))
+
+def normalize_url(url: str) -> str:
+    """Host and path of a URL, without scheme, query, fragment, "www." or trailing slash."""
+    if not url:
+        return ""
+    parsed = urlparse(url if "//" in url else f"//{url}")
+    host = parsed.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parsed.path.rstrip("/")
+    return f"{host}{path}" if host else ""
+
+def _is_model_token(token: str) -> bool:
+    """Model numbers mix letters and digits ("1000xm4", "qc45") or are long numbers ("1080")."""
+    if token.isdigit():
+        return len(token) >= 4
+    return any(c.isdigit() for c in token) and any(c.isalpha() for c in token)
+
+def _numbered_tokens(name_key: str) -> frozenset:
+    """Tokens with a digit: model numbers, generations and sizes tell products of one line apart."""
+    return frozenset(token for token in name_key.split() if any(c.isdigit() for c in token))
+
+class CanonicalRegistry:
+    """Resolves product names and URLs from any source to stable canonical ids.
+
+    Aliases (normalized names and URLs) map to canonical ids through an
+    in-memory hash index, so repeat resolutions are O(1). Names are also
+    kept in a token trie: a name that extends a known name containing a
+    model number with descriptive words only ("sony wf 1000xm4 noise
+    canceling earbuds" after "sony wf 1000xm4") resolves to it. Anything
+    else falls back to a fuzzy comparison against the names seen in the
+    current batch, only between names with exactly the same tokens
+    containing digits ("wf 1000xm5" never merges into "wf 1000xm4"). A fuzzy
+    match holds for its batch only and is never recorded as an alias.
+
+    The index keeps the `max_aliases` most recently used aliases. They
+    persist to an SQLite table at `path` (CANONICAL_REGISTRY_PATH by
+    default; memory only when unset), read by `load()` and written by
+    `flush()` through aiosqlite, off the event loop.
+    """
+
+    def __init__(self, path: Optional[str] = None, fuzzy_threshold: float = 85, url_name_threshold: float = 60,
+                 max_aliases: int = 100_000):
+        self.path = path if path is not None else os.getenv("CANONICAL_REGISTRY_PATH")
+        self.fuzzy_threshold = fuzzy_threshold
+        self.url_name_threshold = url_name_threshold
+        self.max_aliases = max_aliases
+
+        self._aliases: "OrderedDict[str, str]" = OrderedDict()
+        self._names: Dict[str, str] = {}  # canonical id -> first registered name
+        self._trie: Dict = {}
+        self._new_aliases: List[Tuple[str, str]] = []
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    def resolve(self, name: str, url: str = "", batch_names: Dict[str, str] = None) -> str:
+        """Canonical id for a product, registering its name and URL as aliases.
+
+        `batch_names` (normalized name -> id) holds the names resolved so
+        far in the current batch, for the fuzzy fallback. Only in-memory
+        aliases are consulted; `load()` them first.
+        """
+        name_key = normalize_name(name)
+        url_key = normalize_url(url)
+
+        canonical_id = (
+            self._match_url(url_key, name_key)
+            or self._alias(f"name:{name_key}")
+            or self._match_prefix(name_key)
+        )
+        fuzzy_id = self._match_fuzzy(name_key, batch_names or {}) if canonical_id is None else None
+
+        if fuzzy_id is not None:
+            canonical_id = fuzzy_id
+        else:
+            canonical_id = canonical_id or hashlib.md5(name_key.encode()).hexdigest()[:12]
+            self._add_alias(f"name:{name_key}", canonical_id)
+            if url_key and f"url:{url_key}" not in self._aliases:
+                self._add_alias(f"url:{url_key}", canonical_id)
+        if batch_names is not None:
+            batch_names.setdefault(name_key, canonical_id)
+
+        return canonical_id
+
+    async def load(self):
+        """Read persisted aliases into memory, once."""
+        async with self._load_lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.path:
+                return
+            try:
+                async with aiosqlite.connect(self.path) as db:
+                    await db.execute("CREATE TABLE IF NOT EXISTS aliases (alias TEXT PRIMARY KEY, canonical_id TEXT NOT NULL)")
+                    await db.commit()
+                    # The newest aliases, oldest first, so the index keeps its most recent ones
+                    async with db.execute("SELECT alias, canonical_id FROM aliases ORDER BY rowid DESC LIMIT ?",
+                                          (self.max_aliases,)) as cursor:
+                        rows = await cursor.fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to load canonical aliases from {self.path}: {e}")
+                return
+
+            for alias, canonical_id in reversed(rows):
+                if alias not in self._aliases:
+                    self._aliases[alias] = canonical_id
+                    if alias.startswith("name:"):
+                        self._insert_name(alias[5:], canonical_id)
+
+    async def flush(self):
+        """Persist aliases registered since the last flush."""
+        pending, self._new_aliases = self._new_aliases, []
+        if not self.path or not pending:
+            return
+        try:
+            async with aiosqlite.connect(self.path) as db:
+                await db.executemany("INSERT OR IGNORE INTO aliases (alias, canonical_id) VALUES (?, ?)", pending)
+                await db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist canonical aliases to {self.path}: {e}")
+            self._new_aliases = pending + self._new_aliases
+
+    def _alias(self, alias: str) -> Optional[str]:
+        canonical_id = self._aliases.get(alias)
+        if canonical_id is not None:
+            self._aliases.move_to_end(alias)
+        return canonical_id
+
+    def _add_alias(self, alias: str, canonical_id: str):
+        if alias in self._aliases:
+            return
+        self._aliases[alias] = canonical_id
+        self._new_aliases.append((alias, canonical_id))
+        if alias.startswith("name:"):
+            self._insert_name(alias[5:], canonical_id)
+        while len(self._aliases) > self.max_aliases:
+            evicted, evicted_id = self._aliases.popitem(last=False)
+            if evicted.startswith("name:"):
+                self._remove_name(evicted[5:], evicted_id)
+
+    def _insert_name(self, name_key: str, canonical_id: str):
+        self._names.setdefault(canonical_id, name_key)
+        node = self._trie
+        for token in name_key.split():
+            node = node.setdefault(token, {})
+        node.setdefault(_TERMINAL, canonical_id)
+
+    def _remove_name(self, name_key: str, canonical_id: str):
+        if self._names.get(canonical_id) == name_key:
+            del self._names[canonical_id]
+        path = [self._trie]
+        for token in name_key.split():
+            node = path[-1].get(token)
+            if node is None:
+                return
+            path.append(node)
+        if path[-1].get(_TERMINAL) != canonical_id:
+            return
+        del path[-1][_TERMINAL]
+        # Drop the nodes left empty, deepest first
+        for parent, token, node in reversed(list(zip(path, name_key.split(), path[1:]))):
+            if node:
+                break
+            del parent[token]
+
+    def _match_url(self, url_key: str, name_key: str) -> Optional[str]:
+        """Id registered for the URL, if its product name is compatible.
+
+        Some sources reuse URLs across unrelated products (mock and listing
+        URLs), so a URL hit needs some token overlap with the known name.
+        """
+        canonical_id = self._alias(f"url:{url_key}") if url_key else None
+        if canonical_id is None:
+            return None
+        if fuzz.token_set_ratio(name_key, self._names.get(canonical_id, "")) < self.url_name_threshold:
+            return None
+        return canonical_id
+
+    def _match_prefix(self, name_key: str) -> Optional[str]:
+        """Id of the longest known name this name extends with descriptive words only."""
+        tokens = name_key.split()
+        node = self._trie
+        match = None
+        has_model = False
+
+        for depth, token in enumerate(tokens):
+            node = node.get(token)
+            if node is None:
+                break
+            has_model = has_model or _is_model_token(token)
+            if _TERMINAL in node and has_model and not any(_is_model_token(t) for t in tokens[depth + 1:]):
+                match = node[_TERMINAL]
+
+        return match
+
+    def _match_fuzzy(self, name_key: str, batch_names: Dict[str, str]) -> Optional[str]:
+        """Id of a similar name in the batch with exactly the same tokens containing digits."""
+        numbered = _numbered_tokens(name_key)
+        for seen_name, canonical_id in batch_names.items():
+            if _numbered_tokens(seen_name) == numbered and \
+                    fuzz.ratio(name_key, seen_name) > self.fuzzy_threshold:
+                return canonical_id
+        return None
@@ -1,19 +1,62 @@
+import asyncio
+import re
 import time
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from typing import List, Dict, Optional, Callable, Awaitable, Tuple
 from ..common.messages import *
 from ..common.bus import AgentBase
 from ..common.utils import logger, log_context, generate_request_id
+from ..common.aspects import USE_CASE_ASPECT_WEIGHTS
+from ..common.categories import AMBIGUITY_MARGIN, candidate_categories, detect_category
+from ..common.constraints import compile_constraints, ConstraintSet
+from ..common.deadline import Deadline
+from .pipeline import StagePipeline
+from .cache import PlannerResultCache, brief_cache_key
+from .memory import PendingClarification, SessionState, SessionStore
 from ..discovery.agent import DiscoveryAgent
 from ..normalizer.agent import NormalizerAgent
 from ..ranker.agent import RankerAgent
 from ..verifier.agent import VerifierAgent
 from ..clarifier.agent import ClarifierAgent
 
+# Adaptation strategies, most preferred first: meeting the budget matters most
+ADAPTATION_PREFERENCE = ("budget", "evidence", "diversity")
+
+def diversity_weights(weights: Dict[str, float]) -> Dict[str, float]:
+    """Weights the diversity strategy re-ranks with: a quarter of the rating weight moves to sentiment."""
+    adjusted = weights.copy()
+    shift = adjusted.get("rating", 0) / 4  # 0.4 -> 0.3 with the default weights
+    adjusted["rating"] = adjusted.get("rating", 0) - shift
+    adjusted["sentiment"] = adjusted.get("sentiment", 0) + shift
+    return adjusted
+
+# Follow-up refinements of a session's previous search
+_FOLLOW_UP = re.compile(r"\b(same|but|instead|rather|more|less|cheaper|only)\b")
+# A number is matched whole: backing "4.5" off to "4" would dodge the stars lookahead
+_NUMBER = r"(\d+(?:\.\d+)?)(?!\.?\d)"
+_NOT_STARS = r"(?!\s*\+?\s*stars?)"
+_MAX_PRICE = re.compile(r"\b(?:under|below|less than|cheaper than|up to|max)\s*\$?\s*" + _NUMBER + _NOT_STARS)
+_MIN_PRICE = re.compile(r"\b(?:over|above|more than|at least)\s*\$?\s*" + _NUMBER + _NOT_STARS)
+_MIN_RATING = re.compile(r"(\d(?:\.\d)?)\s*\+?\s*stars?")
+_FOCUS_KEYWORDS = {
+    "battery": ["battery"],
+    "comfort": ["comfort"],
+    "noise_cancellation": ["noise", "anc"],
+    "performance": ["performance", "faster", "speed"],
+    "stability": ["stable", "stability", "wobble"]
+}
+
 class PlannerAgent(AgentBase):
     """Main orchestrator agent that coordinates the entire shopping workflow."""
     
-    def __init__(self):
+    def __init__(self, use_case_weight: float = 0.15, pipelined: bool = True,
+                 result_cache: PlannerResultCache = None, request_timeout: float = None,
+                 max_pending_clarifications: int = 256, max_categories: int = 3):
         super().__init__("planner")
+        self.use_case_weight = use_case_weight  # Share of the score given to use-case aspect fit
+        self.pipelined = pipelined  # Overlap enrichment and ranking with discovery
+        self.request_timeout = request_timeout  # Default request budget; None reads REQUEST_TIMEOUT
+        self.max_categories = max_categories  # Categories searched concurrently for an ambiguous query
         
         # Initialize other agents
         self.discovery = DiscoveryAgent()
@@ -21,33 +64,348 @@ class PlannerAgent(AgentBase):
         self.ranker = RankerAgent()
         self.verifier = VerifierAgent()
         self.clarifier = ClarifierAgent()
+        
+        # Final results per normalized brief; catalog changes also drop cached stock statuses and pools
+        self.result_cache = result_cache or PlannerResultCache()
+        self.result_cache.add_invalidation_hook(lambda category: self.verifier.availability.invalidate())
+        self.result_cache.add_invalidation_hook(lambda category: self.discovery.pool_cache.invalidate(category))
+        
+        # Last brief and candidate pool per conversation, for follow-up refinements
+        self.sessions = SessionStore()
+        
+        # Clarifications awaiting answers, by clarification id (oldest first)
+        self.pending_clarifications: "OrderedDict[str, PendingClarification]" = OrderedDict()
+        self.max_pending_clarifications = max_pending_clarifications
     
-    async def handle_user_goal(self, query: str, constraints: Dict = None, request_id: str = None) -> Dict:
-        """Handle user shopping goal and orchestrate the entire pipeline."""
+    async def handle_user_goal(self, query: str, constraints: Dict = None, request_id: str = None,
+                               on_provisional: Callable[[RankedList], Awaitable[None]] = None,
+                               deadline: Deadline = None, session_id: str = None, clarify: bool = False) -> Dict:
+        """Handle user shopping goal and orchestrate the entire pipeline.
+        
+        Results are served from the result cache when an equivalent brief
+        was answered recently. When pipelined, `on_provisional` receives
+        provisional rankings while discovery is still running.
+        
+        `deadline` is the request's latency budget; every stage gets a
+        share of what is left and the result lists under "degraded" the
+        stages that returned partial results because theirs ran out.
+        
+        With a `session_id`, a follow-up refining the session's previous
+        search ("same but under $100", "more battery-focused") re-filters
+        and re-ranks that search's candidate pool locally when it can.
+        
+        A query that names no clear category but hints at several is
+        searched in those categories concurrently; see `_answer_ambiguous`.
+        
+        With `clarify`, a vague query returns clarification questions
+        (under "clarification") instead of results, and discovery starts
+        for the brief as-is while the user answers; see
+        `answer_clarification`.
+        """
         if request_id is None:
             request_id = generate_request_id()
         
-        trace = self.create_trace(request_id, "parse")
+        trace = self.create_trace(request_id, "parse", deadline or self._new_deadline())
         
         with log_context(request_id):
             logger.info(f"Starting shopping pipeline for query: {query}")
         
-        # Build initial shopping brief
-        brief = self._build_shopping_brief(query, constraints or {}, trace)
+        session = self.sessions.get(session_id) if session_id else None
+        brief = self._refine_brief(session.brief, query, constraints or {}, trace) if session else None
         
-        # Check if clarification is needed
-        if await self.clarifier.should_clarify(brief):
-            clarification_request = await self.clarifier.generate_clarification_request(brief)
+        if brief is not None:
+            refined = await self._refine_locally(session_id, session, brief)
+            if refined is not None:
+                return refined
+        else:
+            # Build initial shopping brief
+            brief = self._build_shopping_brief(query, constraints or {}, trace)
             
-            # For demo purposes, we'll simulate answers or skip clarification
-            # In a real implementation, this would wait for user input
+            # Check if clarification is needed
+            if await self.clarifier.should_clarify(brief):
+                clarification_request = await self.clarifier.generate_clarification_request(brief)
+                if clarify:
+                    return self._start_clarification(brief, clarification_request, session_id)
+                
+                with log_context(request_id):
+                    logger.info("Clarification needed but not requested, searching with the brief as-is")
+        
+        return await self._answer(brief, on_provisional, session_id)
+    
+    async def answer_clarification(self, clarification_id: str, answers: Dict, request_id: str = None,
+                                   deadline: Deadline = None) -> Dict:
+        """Results for a clarified brief.
+        
+        The answers are applied to the original brief and, as they only
+        add constraints or shift weights, the candidate pool fetched
+        speculatively while the questions were outstanding is re-filtered
+        and re-ranked locally. A full run happens only if that pool is
+        unusable.
+        """
+        if request_id is None:
+            request_id = generate_request_id()
+        
+        pending = self.pending_clarifications.pop(clarification_id, None)
+        if pending is None:
+            return {
+                "success": False,
+                "message": "Clarification not found or expired, please search again",
+                "recommendations": []
+            }
+        
+        trace = self.create_trace(request_id, "clarify", deadline or self._new_deadline())
+        answered = self.clarifier.apply_clarification_answers(pending.brief, ClarificationAnswer(trace=trace, answers=answers))
+        brief = answered.model_copy(update={
+            "trace": trace,
+            "weights": self._with_use_case_weight(answered.weights, answered.use_case)
+        })
+        
+        with log_context(request_id):
+            logger.info(f"Clarification {clarification_id} answered: {list(answers)}")
+        
+        try:
+            speculative = await pending.speculation
+        except Exception as e:
+            with log_context(request_id):
+                logger.warning(f"Speculative discovery for clarification {clarification_id} failed: {e}")
+            speculative = None
+        
+        unchanged = (brief.constraints, brief.use_case, brief.weights) == (
+            pending.brief.constraints, pending.brief.use_case, pending.brief.weights)
+        if unchanged and speculative is not None and speculative.get("success"):
+            speculative["request_id"] = speculative["query"] = request_id
+            return speculative
+        
+        session = self.sessions.get(pending.session_id)
+        if session is not None:
+            refined = await self._refine_locally(pending.session_id, session, brief)
+            if refined is not None:
+                return refined
+        
+        return await self._answer(brief, session_id=pending.session_id)
+    
+    def _start_clarification(self, brief: ShoppingBrief, request: ClarificationRequest,
+                             session_id: Optional[str]) -> Dict:
+        """Return clarification questions, starting discovery for the brief as-is meanwhile."""
+        clarification_id = brief.trace.request_id
+        pool_session = session_id or f"clarification:{clarification_id}"
+        # Run the pipeline itself rather than the result cache, so the pool is always recorded
+        if self._is_ambiguous(brief):
+            speculation = asyncio.create_task(self._answer_ambiguous(brief, session_id=pool_session, cached=False))
+        else:
+            speculation = asyncio.create_task(self._run_pipeline(brief, session_id=pool_session))
+        
+        self.pending_clarifications[clarification_id] = PendingClarification(
+            brief=brief, request=request, session_id=pool_session, speculation=speculation
+        )
+        while len(self.pending_clarifications) > self.max_pending_clarifications:
+            _, abandoned = self.pending_clarifications.popitem(last=False)
+            abandoned.speculation.cancel()
+        
+        with log_context(clarification_id):
+            logger.info(f"Asking {len(request.suggested_questions)} clarification questions, "
+                        f"discovering speculatively meanwhile")
+        
+        return {
+            "success": True,
+            "recommendations": [],
+            "total_found": 0,
+            "request_id": clarification_id,
+            "clarification": {
+                "clarification_id": clarification_id,
+                "missing": request.missing,
+                "questions": request.suggested_questions
+            }
+        }
+    
+    async def _answer(self, brief: ShoppingBrief, on_provisional: Callable[[RankedList], Awaitable[None]] = None,
+                      session_id: str = None) -> Dict:
+        """Results for a brief, from the result cache or a pipeline run."""
+        if self._is_ambiguous(brief):
+            return await self._answer_ambiguous(brief, session_id=session_id)
+        
+        request_id = brief.trace.request_id
+        search_category, search_queries = self.discovery.search_plan(brief)
+        cache_key = brief_cache_key(brief, search_category, search_queries)
+        
+        async def refresh() -> Dict:
+            # Background refresh of a stale entry runs as its own request
+            refresh_trace = self.create_trace(generate_request_id(), "parse", self._new_deadline())
+            return await self._run_pipeline(brief.model_copy(update={"trace": refresh_trace}))
+        
+        ran = False
+        
+        async def compute() -> Dict:
+            nonlocal ran
+            ran = True
+            return await self._run_pipeline(brief, on_provisional, session_id)
+        
+        results, status = await self.result_cache.get_or_compute(
+            cache_key, compute, refresh=refresh, category=search_category
+        )
+        
+        if session_id and not ran:
+            # Answered by another computation, which recorded no pool here; follow-ups must still
+            # refine this brief, so the session keeps it (with no pool, they run discovery)
+            self.sessions.put(session_id, SessionState(brief=brief, pool_constraints=dict(brief.constraints),
+                                                       enriched=[]))
+        
+        if status != "miss":
             with log_context(request_id):
-                logger.info("Clarification needed but skipping for demo")
+                logger.info(f"Serving {'stale ' if status == 'stale' else ''}cached results "
+                            f"for {search_category} ({len(results['recommendations'])} recommendations)")
+        
+        if results.get("success"):
+            # Cached or shared results were produced under another request id
+            results["request_id"] = results["query"] = request_id
+        return results
+    
+    def has_cached_result(self, query: str, constraints: Dict = None, session_id: str = None) -> bool:
+        """Whether `handle_user_goal` would answer this query from the result cache or the session's pool."""
+        trace = self.create_trace(generate_request_id(), "parse")
+        session = self.sessions.get(session_id) if session_id else None
+        if session is not None:
+            refined = self._refine_brief(session.brief, query, constraints or {}, trace)
+            if refined is not None and self._pool_covers(session, refined):
+                return True
+        
+        brief = self._build_shopping_brief(query, constraints or {}, trace)
+        briefs = self._category_briefs(brief).values() if self._is_ambiguous(brief) else [brief]
+        return all(
+            self.result_cache.get(brief_cache_key(b, *self.discovery.search_plan(b))) is not None for b in briefs
+        )
+    
+    async def _answer_ambiguous(self, brief: ShoppingBrief, session_id: str = None, cached: bool = True) -> Dict:
+        """Results for a query naming no clear category.
+        
+        The most plausible categories (up to `max_categories`) are searched
+        concurrently, sharing the agents' connections and caches, each as
+        its own request within this request's deadline. The most relevant
+        category with results wins; categories scoring about as well
+        (within AMBIGUITY_MARGIN) are merged into it, alternating products.
+        The session keeps the winning category's candidate pool. Without
+        `cached`, branches bypass the result cache so pools are recorded.
+        Provisional rankings are not streamed, the category being unknown
+        until the branches finish.
+        """
+        request_id = brief.trace.request_id
+        scores = dict(candidate_categories(brief.query, self.max_categories))
+        briefs = self._category_briefs(brief)
+        branch_sessions = {category: f"{session_id}#{category}" if session_id else None for category in briefs}
+        
+        with log_context(request_id):
+            logger.info(f"Ambiguous category, searching {list(scores)} concurrently (scores {scores})")
+        
+        run = self._answer if cached else self._run_pipeline
+        outcomes = await asyncio.gather(
+            *(run(branch, session_id=branch_sessions[category]) for category, branch in briefs.items()),
+            return_exceptions=True
+        )
+        
+        answered = []
+        for category, outcome in zip(briefs, outcomes):
+            if isinstance(outcome, BaseException):
+                with log_context(request_id):
+                    logger.warning(f"Search in category {category} failed: {outcome}")
+            elif outcome.get("success") and outcome["recommendations"]:
+                answered.append((category, outcome))
+        
+        if not answered:
+            return {
+                "success": False,
+                "message": "No products found matching your criteria",
+                "recommendations": []
+            }
+        
+        # Most relevant first: category score, then the best product's score
+        answered.sort(key=lambda item: (-scores[item[0]], -item[1]["recommendations"][0]["overall_score"]))
+        winner = answered[0][0]
+        merged = [(category, result) for category, result in answered
+                  if scores[winner] - scores[category] < AMBIGUITY_MARGIN]
+        
+        if session_id:
+            state = self.sessions.get(branch_sessions[winner])
+            if state is not None:
+                self.sessions.put(session_id, state)
+            for branch_session in branch_sessions.values():
+                self.sessions.drop(branch_session)
+        
+        # Alternate the categories' products, most relevant category first
+        cards = []
+        for rank in range(max(len(result["recommendations"]) for _, result in merged)):
+            for category, result in merged:
+                if rank < len(result["recommendations"]):
+                    cards.append({**result["recommendations"][rank], "category": category})
+        
+        with log_context(request_id):
+            logger.info(f"Using results from {[category for category, _ in merged]}")
+        
+        degraded = []
+        for _, result in merged:
+            degraded.extend(note for note in result.get("degraded", []) if note not in degraded)
+        
+        return {
+            "success": True,
+            "query": request_id,
+            "recommendations": cards[:5],
+            "total_found": sum(result["total_found"] for _, result in merged),
+            "request_id": request_id,
+            "degraded": degraded,
+            "categories": [category for category, _ in merged]
+        }
+    
+    def _is_ambiguous(self, brief: ShoppingBrief) -> bool:
+        """Whether the brief names no clear category but hints at several.
+        
+        A query hinting at no category at all is searched once, on its own
+        words, rather than in categories it has nothing to do with.
+        """
+        return brief.category is None and bool(candidate_categories(brief.query, self.max_categories))
+    
+    def _category_briefs(self, brief: ShoppingBrief) -> Dict[str, ShoppingBrief]:
+        """A brief per plausible category of an ambiguous query, each its own request.
+        
+        Branches get their own request ids, as enrichment and feature
+        caches are per request, but share the request's deadline.
+        """
+        request_id = brief.trace.request_id
+        return {
+            category: brief.model_copy(update={
+                "category": category,
+                "trace": self.create_trace(f"{request_id}:{category}", brief.trace.step, brief.trace.deadline)
+            })
+            for category, _ in candidate_categories(brief.query, self.max_categories)
+        }
+    
+    async def invalidate_cache(self, category: str = None) -> int:
+        """Drop cached results after catalog data changes, for one category or all."""
+        dropped = await self.result_cache.invalidate(category)
+        logger.info(f"Invalidated {dropped} cached planner results"
+                    f"{f' for {category}' if category else ''}")
+        return dropped
+    
+    def _new_deadline(self) -> Deadline:
+        if self.request_timeout is not None:
+            return Deadline(self.request_timeout)
+        return Deadline.from_env()
+    
+    async def _run_pipeline(self, brief: ShoppingBrief,
+                            on_provisional: Callable[[RankedList], Awaitable[None]] = None,
+                            session_id: str = None) -> Dict:
+        """Discover, enrich, rank, verify and adapt for a brief, recording the pool for the session."""
+        request_id = brief.trace.request_id
+        deadline = brief.trace.deadline
         
         # Discovery phase
-        candidates = await self.discovery.discover_products(brief)
+        if self.pipelined:
+            candidates = await self._discover_pipelined(brief, on_provisional)
+        else:
+            candidates = await self.discovery.discover_products(brief)
         
         if not candidates:
+            if session_id:
+                self.sessions.put(session_id, SessionState(brief=brief, pool_constraints=dict(brief.constraints),
+                                                           enriched=[]))
             with log_context(request_id):
                 logger.warning("No candidates found")
             return {
@@ -56,17 +414,33 @@ class PlannerAgent(AgentBase):
                 "recommendations": []
             }
         
+        # Prune candidates that cannot reach the top-k before expensive enrichment
+        discovered = candidates
+        candidates = self.ranker.prune_candidates(candidates, brief.weights,
+                                                  alternatives=self._adaptation_rankings(brief))
+        
         # Normalization phase
         enriched = await self.normalizer.normalize_products(candidates)
         
         # Ranking phase
-        ranked_list = await self.ranker.rank_products(enriched, brief.weights)
+        ranked_list = await self.ranker.rank_products(enriched, brief.weights, use_case=brief.use_case)
+        
+        if session_id:
+            kept = {id(candidate) for candidate in candidates}
+            self.sessions.put(session_id, SessionState(
+                brief=brief, pool_constraints=dict(brief.constraints), enriched=enriched, candidates=discovered,
+                pruned=[candidate for candidate in discovered if id(candidate) not in kept]
+            ))
         
         # Verification phase
         verification_report = await self.verifier.verify_products(ranked_list, brief)
         
         # Handle verification failures with adaptation
-        if not verification_report.passed:
+        if not verification_report.passed and deadline is not None and deadline.expired:
+            with log_context(request_id):
+                logger.warning("Verification failed but no time left to adapt, returning current ranking")
+            deadline.degrade("planner: adaptation skipped")
+        elif not verification_report.passed:
             with log_context(request_id):
                 logger.info("Verification failed, attempting adaptation")
             
@@ -75,13 +449,63 @@ class PlannerAgent(AgentBase):
                 ranked_list = adapted_results
         
         # Convert to final output format
-        final_results = self._to_product_cards(ranked_list, request_id)
+        final_results = self._to_product_cards(ranked_list, request_id, deadline.degraded if deadline else [])
         
         with log_context(request_id):
             logger.info(f"Pipeline completed successfully with {len(final_results['recommendations'])} recommendations")
         
         return final_results
     
+    async def _discover_pipelined(self, brief: ShoppingBrief,
+                                  on_provisional: Callable[[RankedList], Awaitable[None]] = None) -> List[ProductCandidate]:
+        """Run discovery with enrichment, ranking and verification overlapping it.
+        
+        Sources are fetched concurrently. Each source's batch is enriched
+        speculatively as soon as it arrives, fed to a streaming ranker, and
+        the provisional top-k has its availability prefetched. None of that
+        decides the result: the returned candidates are exactly what
+        sequential discovery returns, and the normal normalize/rank/verify
+        steps then run on them, hitting the warm enrichment, feature and
+        availability caches.
+        """
+        request_id = brief.trace.request_id
+        trace = self.create_trace(request_id, "pipeline")
+        constraints = compile_constraints(brief.constraints)
+        stream = self.ranker.stream(weights=brief.weights, use_case=brief.use_case)
+        
+        async def enrich(batch):
+            source_name, raw_candidates = batch
+            candidates = [self.discovery.to_product_candidate(c, request_id)
+                          for c in constraints.check(raw_candidates).kept()]
+            return await self.normalizer.prewarm(candidates, trace) or None
+        
+        async def rank(enriched: List[EnrichedProduct]):
+            stream.extend(enriched)
+            return stream.provisional()
+        
+        async def verify(provisional: RankedList):
+            await self.verifier.prefetch_availability(provisional.items, brief.trace.deadline)
+            if on_provisional is not None:
+                await on_provisional(provisional)
+        
+        pipeline = (StagePipeline(request_id)
+                    .add_stage("enrich", enrich)
+                    .add_stage("rank", rank)
+                    .add_stage("verify", verify))
+        
+        async def discover(emit):
+            async def on_batch(source_name: str, raw_candidates: List[Dict]):
+                await emit((source_name, raw_candidates))
+            return await self.discovery.discover_streaming(brief, on_batch)
+        
+        candidates = await pipeline.run(discover)
+        
+        with log_context(request_id):
+            logger.info(f"Pipelined discovery: {stream.seen} products enriched speculatively, "
+                        f"{len(candidates)} final candidates")
+        
+        return candidates
+    
     def _build_shopping_brief(self, query: str, constraints: Dict, trace: Trace) -> ShoppingBrief:
         """Build shopping brief from user query and constraints."""
         # Parse category from query
@@ -90,13 +514,7 @@ class PlannerAgent(AgentBase):
         # Extract use case from query
         use_case = self._extract_use_case(query)
         
-        # Default weights
-        weights = {
-            "rating": 0.4,
-            "sentiment": 0.3,
-            "recency": 0.2,
-            "helpfulness": 0.1
-        }
+        weights = self._default_weights(use_case)
         success = {
             "k": 5,
             "diversity": True,
@@ -113,19 +531,145 @@ class PlannerAgent(AgentBase):
             success=success
         )
     
-    def _detect_category(self, query: str) -> Optional[str]:
-        """Detect product category from query."""
+    def _default_weights(self, use_case: Optional[str]) -> Dict[str, float]:
+        weights = {
+            "rating": 0.4,
+            "sentiment": 0.3,
+            "recency": 0.2,
+            "helpfulness": 0.1
+        }
+        return self._with_use_case_weight(weights, use_case)
+    
+    def _with_use_case_weight(self, weights: Dict[str, float], use_case: Optional[str]) -> Dict[str, float]:
+        if use_case in USE_CASE_ASPECT_WEIGHTS and "use_case" not in weights:
+            # Give use-case fit a share of the score, scaling the rest down
+            weights = {name: round(weight * (1 - self.use_case_weight), 3) for name, weight in weights.items()}
+            weights["use_case"] = self.use_case_weight
+        return weights
+    
+    def _refine_brief(self, previous: ShoppingBrief, query: str, constraints: Dict,
+                      trace: Trace) -> Optional[ShoppingBrief]:
+        """Brief for a follow-up refining the previous search, or None for a new search.
+        
+        A follow-up names no category, or the same one with follow-up
+        wording ("same but ..."). Price and rating bounds, use case and
+        aspect focus it mentions are applied to the previous brief.
+        """
         query_lower = query.lower()
+        category = self._detect_category(query)
+        if category is not None and (category != previous.category or not _FOLLOW_UP.search(query_lower)):
+            return None
         
-        if any(word in query_lower for word in ["earbuds", "headphones", "airpods", "wireless"]):
-            return "wireless_earbuds"
-        elif any(word in query_lower for word in ["desk", "standing", "sit-stand", "workstation"]):
-            return "standing_desk"
-        elif any(word in query_lower for word in ["laptop", "macbook", "notebook", "computer"]):
-            return "laptop"
+        refined_constraints = {**previous.constraints, **self._parse_bounds(query_lower, previous.constraints),
+                               **constraints}
+        use_case = self._extract_focus(query_lower) or self._extract_use_case(query) or previous.use_case
+        if refined_constraints == previous.constraints and use_case == previous.use_case:
+            return None
         
+        return ShoppingBrief(
+            trace=trace,
+            query=previous.query,
+            category=previous.category,
+            use_case=use_case,
+            constraints=refined_constraints,
+            weights=previous.weights if use_case == previous.use_case else self._default_weights(use_case),
+            success=dict(previous.success)
+        )
+    
+    def _parse_bounds(self, query_lower: str, previous: Dict) -> Dict:
+        """Price and rating bounds stated in a follow-up."""
+        bounds = {}
+        if match := _MAX_PRICE.search(query_lower):
+            bounds["max_price"] = float(match.group(1))
+        elif "cheaper" in query_lower and "max_price" in previous:
+            bounds["max_price"] = round(float(previous["max_price"]) * 0.8, 2)
+        if match := _MIN_PRICE.search(query_lower):
+            bounds["min_price"] = float(match.group(1))
+        if match := _MIN_RATING.search(query_lower):
+            bounds["min_rating"] = float(match.group(1))
+        return bounds
+    
+    def _extract_focus(self, query_lower: str) -> Optional[str]:
+        """Aspect a follow-up asks to focus on ("more battery-focused")."""
+        for focus, keywords in _FOCUS_KEYWORDS.items():
+            if any(keyword in query_lower for keyword in keywords):
+                return focus
         return None
     
+    async def _refine_locally(self, session_id: str, session: SessionState, brief: ShoppingBrief) -> Optional[Dict]:
+        """Answer a refinement from the session's candidate pool, or None if discovery is needed.
+        
+        The pool can be re-filtered when the refined constraints are at
+        least as strict as those it was discovered under; its features are
+        re-ranked with the refined weights and use case, then verified
+        and adapted as usual.
+        """
+        request_id = brief.trace.request_id
+        constraints = compile_constraints(brief.constraints)
+        
+        if not self._pool_covers(session, brief):
+            with log_context(request_id):
+                logger.info("The session's pool cannot answer the refinement, running discovery")
+            return None
+        
+        ranked_list = await self._rerank(session.features_id, session.enriched, brief.weights, brief.use_case,
+                                         constraints)
+        if not ranked_list.items:
+            with log_context(request_id):
+                logger.info("No pooled products meet the refinement, running discovery")
+            return None
+        
+        with log_context(request_id):
+            logger.info(f"Refined session {session_id} locally: {brief.constraints}, use case {brief.use_case}")
+        
+        verification_report = await self.verifier.verify_products(ranked_list, brief)
+        if not verification_report.passed:
+            adapted_results = await self._adapt_and_retry(brief, [], session.enriched, ranked_list, verification_report)
+            if adapted_results:
+                ranked_list = adapted_results
+        
+        self.sessions.put(session_id, SessionState(brief=brief, pool_constraints=session.pool_constraints,
+                                                   enriched=session.enriched, candidates=session.candidates,
+                                                   pruned=session.pruned))
+        
+        deadline = brief.trace.deadline
+        return self._to_product_cards(ranked_list, request_id, deadline.degraded if deadline else [])
+    
+    def _pool_covers(self, session: SessionState, brief: ShoppingBrief) -> bool:
+        """Whether the session's pool holds everything that could rank for a refined brief.
+        
+        The refined constraints must be at least as strict as those the
+        pool was discovered under, and no candidate pruned before
+        enrichment may be a top-k contender under the refined weights and
+        constraints (pruning only knew the previous brief's).
+        """
+        if not session.enriched:
+            return False
+        constraints = compile_constraints(brief.constraints)
+        if not constraints.narrows(compile_constraints(session.pool_constraints)):
+            return False
+        if not session.pruned:
+            return True
+        pruned = {id(candidate) for candidate in session.pruned}
+        return not any(id(candidate) in pruned
+                       for weights, ranking_constraints in self._adaptation_rankings(brief)
+                       for candidate in self.ranker.contenders(session.candidates, weights,
+                                                               constraints=ranking_constraints))
+    
+    def _adaptation_rankings(self, brief: ShoppingBrief) -> List[Tuple[Dict[str, float], ConstraintSet]]:
+        """(weights, constraints) of every ranking a search for `brief` may produce.
+        
+        The brief's own ranking and the re-rankings of the budget and
+        diversity adaptation strategies, all without products failing the
+        constraints.
+        """
+        constraints = compile_constraints(brief.constraints)
+        return [(brief.weights, constraints), (diversity_weights(brief.weights), constraints)]
+    
+    def _detect_category(self, query: str) -> Optional[str]:
+        """Detect product category from query (None when no category clearly leads)."""
+        return detect_category(query)
+    
     def _extract_use_case(self, query: str) -> Optional[str]:
         """Extract use case from query."""
         query_lower = query.lower()
@@ -148,31 +692,126 @@ class PlannerAgent(AgentBase):
     async def _adapt_and_retry(self, brief: ShoppingBrief, candidates: List[ProductCandidate], 
                               enriched: List[EnrichedProduct], ranked_list: RankedList, 
                               report: VerificationReport) -> Optional[RankedList]:
-        """Adapt and retry when verification fails."""
-        
-        # Simple adaptation strategies
-        if not report.checks.get("budget", True):
-            # Relax budget constraint or find alternatives
-            if "max_price" in brief.constraints:
-                # Try removing the most expensive product and re-ranking
-                filtered_enriched = [p for p in enriched if not p.price or p.price <= brief.constraints["max_price"]]
-                if filtered_enriched:
-                    return await self.ranker.rank_products(filtered_enriched, brief.weights)
-        
-        if not report.checks.get("evidence", True):
-            # Lower evidence threshold
-            brief.success["min_reviews"] = 1
-            return await self.ranker.rank_products(enriched, brief.weights)
+        """Adapt and retry when verification fails.
         
-        if not report.checks.get("diversity", True):
-            # Adjust ranking to promote diversity
-            adjusted_weights = brief.weights.copy()
-            adjusted_weights["rating"] = 0.3  # Reduce rating weight
-            adjusted_weights["sentiment"] = 0.4  # Increase sentiment weight
-            return await self.ranker.rank_products(enriched, adjusted_weights)
+        Every strategy addressing a failed check runs concurrently,
+        re-ranking from the ranker's cached per-request features, and each
+        result is verified. The first strategy in ADAPTATION_PREFERENCE
+        whose result passes wins; the others are cancelled as soon as no
+        more preferred strategy is still running. If none passes, the
+        result failing the fewest checks is used.
+        """
+        request_id = brief.trace.request_id
+        strategies = self._adaptation_strategies(brief, enriched, ranked_list, report)
+        if not strategies:
+            return None
+        
+        async def attempt(name: str, adapt: Callable[[], Awaitable[Tuple[Optional[RankedList], ShoppingBrief]]]):
+            adapted, adapted_brief = await adapt()
+            if adapted is None or not adapted.items:
+                return None
+            return adapted, await self.verifier.verify_products(adapted, adapted_brief)
         
+        tasks = {asyncio.create_task(attempt(name, adapt)): name for name, adapt in strategies.items()}
+        pending = set(tasks)
+        outcomes: Dict[str, Optional[Tuple[RankedList, VerificationReport]]] = {}
+        winner = None
+        
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = tasks[task]
+                    try:
+                        outcomes[name] = task.result()
+                    except Exception as e:
+                        with log_context(request_id):
+                            logger.warning(f"Adaptation strategy '{name}' failed: {e}")
+                        outcomes[name] = None
+                winner = self._clear_winner(strategies, outcomes)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        with log_context(request_id):
+            for name in strategies:
+                outcome = outcomes.get(name)
+                status = "cancelled" if name not in outcomes else "no result" if outcome is None else (
+                    "passed" if outcome[1].passed else
+                    f"failed {[check for check, ok in outcome[1].checks.items() if not ok]}")
+                logger.info(f"Adaptation strategy {name}: {status}")
+        
+        if winner is None:
+            tried = [name for name in strategies if outcomes.get(name) is not None]
+            if not tried:
+                return None
+            # Nothing passed: fewest failed checks, preference order breaking ties
+            winner = min(tried, key=lambda name: sum(not ok for ok in outcomes[name][1].checks.values()))
+        
+        with log_context(request_id):
+            logger.info(f"Using adaptation strategy: {winner}")
+        
+        return outcomes[winner][0]
+    
+    def _clear_winner(self, strategies: Dict, outcomes: Dict) -> Optional[str]:
+        """Most preferred passing strategy, once no more preferred one is still running."""
+        for name in strategies:
+            if name not in outcomes:
+                return None
+            outcome = outcomes[name]
+            if outcome is not None and outcome[1].passed:
+                return name
         return None
     
+    def _adaptation_strategies(self, brief: ShoppingBrief, enriched: List[EnrichedProduct], ranked_list: RankedList,
+                               report: VerificationReport) -> Dict[str, Callable[[], Awaitable]]:
+        """Applicable strategies in ADAPTATION_PREFERENCE order, by name.
+        
+        Each returns the adapted ranking (None if it has nothing to offer)
+        and the brief to verify it against.
+        """
+        # Features are cached under the request that enriched the products
+        features_id = enriched[0].trace.request_id if enriched and enriched[0].trace else brief.trace.request_id
+        constraints = compile_constraints(brief.constraints)
+        strategies = {}
+        
+        if not report.checks.get("budget", True) and constraints.get("max_price") is not None:
+            async def budget():
+                # Drop products violating the constraints and re-rank
+                return await self._rerank(features_id, enriched, brief.weights, brief.use_case, constraints), brief
+            strategies["budget"] = budget
+        
+        if not report.checks.get("evidence", True) and brief.success.get("min_reviews", 0) > 1:
+            async def evidence():
+                # Lower evidence threshold: the ranking stands, only its verification changes
+                relaxed = brief.model_copy(update={"success": {**brief.success, "min_reviews": 1}})
+                return ranked_list, relaxed
+            strategies["evidence"] = evidence
+        
+        if not report.checks.get("diversity", True):
+            async def diversity():
+                # Adjust ranking to promote diversity
+                return await self._rerank(features_id, enriched, diversity_weights(brief.weights), brief.use_case,
+                                          constraints), brief
+            strategies["diversity"] = diversity
+        
+        return {name: strategies[name] for name in ADAPTATION_PREFERENCE if name in strategies}
+    
+    async def _rerank(self, request_id: str, enriched: List[EnrichedProduct], weights: Dict[str, float],
+                      use_case: Optional[str] = None, constraints: Optional[ConstraintSet] = None) -> RankedList:
+        """Re-rank from cached features, falling back to a full ranking.
+        
+        Products failing `constraints` are left out.
+        """
+        reranked = await self.ranker.rerank(request_id, weights, constraints=constraints, use_case=use_case)
+        if reranked is None:
+            if constraints is not None:
+                enriched = constraints.check(enriched).kept()
+            reranked = await self.ranker.rank_products(enriched, weights, use_case=use_case)
+        return reranked
+    
     def _get_product_image_url(self, product_name: str) -> str:
         """Get product-specific image URL based on product name."""
         name_lower = product_name.lower()
@@ -192,8 +831,12 @@ class PlannerAgent(AgentBase):
             # Default earbuds image
             return "https://images.unsplash.com/photo-1590658268037-6bf12165a8df?w=300&h=300&fit=crop"
     
-    def _to_product_cards(self, ranked_list: RankedList, request_id: str) -> Dict:
-        """Convert ranked list to final product cards format."""
+    def _to_product_cards(self, ranked_list: RankedList, request_id: str, degraded: List[str] = ()) -> Dict:
+        """Convert ranked list to final product cards format.
+        
+        `degraded` lists stages that returned partial results because the
+        request ran out of time.
+        """
         recommendations = []
         
         for product in ranked_list.items[:5]:  # Top 5
@@ -216,5 +859,6 @@ class PlannerAgent(AgentBase):
             "query": ranked_list.items[0].trace.request_id if ranked_list.items else request_id,
             "recommendations": recommendations,
             "total_found": len(ranked_list.items),
-            "request_id": request_id
+            "request_id": request_id,
+            "degraded": list(degraded)
         }
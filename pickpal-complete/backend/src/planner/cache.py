@@ -0,0 +1,249 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import aiosqlite
+from ..common.messages import ShoppingBrief
+from ..common.utils import logger
+
+def brief_cache_key(brief: ShoppingBrief, search_category: str, search_queries: List[str]) -> str:
+    """Cache key for everything that decides a brief's results.
+
+    The raw query text is left out: differently worded queries that parse
+    to the same brief and search plan share an entry.
+    """
+    normalized = {
+        "category": brief.category,
+        "search_category": search_category,
+        "search_queries": sorted(search_queries),
+        "use_case": brief.use_case,
+        "constraints": brief.constraints,
+        "weights": brief.weights,
+        "k": brief.success.get("k")
+    }
+    return hashlib.blake2b(json.dumps(normalized, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+@dataclass
+class CacheEntry:
+    result: Dict
+    category: str
+    created: float
+
+class PlannerResultCache:
+    """TTL + LRU cache of final planner results with stale-while-revalidate.
+
+    Entries younger than `ttl` are served as is. Entries up to
+    `stale_ttl` old are served immediately while a background refresh
+    (at most one per key) recomputes them. Concurrent misses for the same
+    key share one computation. An optional SQLite tier at `path`
+    (PLANNER_CACHE_PATH by default; memory only when unset) keeps
+    entries across restarts; it is read on in-memory misses and written
+    on `put` through one shared aiosqlite connection, off the event loop.
+    `invalidate` drops entries, by category or all, and notifies
+    registered invalidation hooks.
+    """
+
+    def __init__(self, ttl: float = 300.0, stale_ttl: float = 3600.0, max_entries: int = 256,
+                 path: Optional[str] = None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.path = path if path is not None else os.getenv("PLANNER_CACHE_PATH")
+
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[str] = set()
+        self._hooks = []
+        self._db: Optional[aiosqlite.Connection] = None
+        self._db_lock = asyncio.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Dict, bool]]:
+        """(result copy, is_stale) for a servable in-memory entry, else None."""
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+        return copy.deepcopy(entry.result), time.time() - entry.created > self.ttl
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict]],
+                             refresh: Callable[[], Awaitable[Dict]] = None, category: str = "") -> Tuple[Dict, str]:
+        """Cached result for key, computing it on a miss.
+
+        Returns (result, status) with status "hit", "stale" (served while
+        `refresh` - or `compute` - runs in the background) or "miss".
+        """
+        cached = self.get(key)
+        if cached is None and key not in self._in_flight:
+            entry = await self._load(key)
+            if entry is not None:
+                self._store(key, entry)
+                cached = self.get(key)
+
+        if cached is not None:
+            result, stale = cached
+            if stale:
+                self._schedule_refresh(key, refresh or compute, category)
+                return result, "stale"
+            return result, "hit"
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            result = await asyncio.shield(in_flight)
+            if result is None:
+                # The computation we joined was cancelled with its caller; compute for ourselves
+                return await self.get_or_compute(key, compute, refresh, category)
+            return copy.deepcopy(result), "miss"
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await compute()
+            future.set_result(result)
+            await self.put(key, result, category)
+            return result, "miss"
+        except asyncio.CancelledError:
+            if not future.done():
+                future.set_result(None)
+            raise
+        except BaseException as e:
+            if future.done():
+                raise
+            future.set_exception(e)
+            # Nobody else may be waiting; don't leave "exception never retrieved" behind
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def put(self, key: str, result: Dict, category: str = ""):
+        """Store a result. Only successful, complete (not degraded) results are cached."""
+        if not result.get("success") or result.get("degraded"):
+            return
+        entry = CacheEntry(result=copy.deepcopy(result), category=category, created=time.time())
+        self._store(key, entry)
+        await self._persist(key, entry)
+
+    async def invalidate(self, category: str = None) -> int:
+        """Drop all entries, or those of one category. Returns how many were dropped."""
+        if category is None:
+            dropped = len(self._entries)
+            self._entries.clear()
+        else:
+            keys = [key for key, entry in self._entries.items() if entry.category == category]
+            for key in keys:
+                del self._entries[key]
+            dropped = len(keys)
+
+        db = await self._connect()
+        if db is not None:
+            try:
+                if category is None:
+                    await db.execute("DELETE FROM planner_results")
+                else:
+                    await db.execute("DELETE FROM planner_results WHERE category = ?", (category,))
+                await db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to invalidate persisted planner results: {e}")
+
+        for hook in self._hooks:
+            hook(category)
+
+        return dropped
+
+    def add_invalidation_hook(self, hook: Callable[[Optional[str]], None]):
+        """Call `hook(category)` (None for everything) whenever entries are invalidated."""
+        self._hooks.append(hook)
+
+    async def close(self):
+        """Close the SQLite connection, if one was opened."""
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    def _schedule_refresh(self, key: str, refresh: Callable[[], Awaitable[Dict]], category: str):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def run():
+            try:
+                await self.put(key, await refresh(), category)
+            except Exception as e:
+                logger.warning(f"Background refresh of cached planner result failed: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        asyncio.create_task(run())
+
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry.created > self.stale_ttl:
+            self._entries.pop(key, None)
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, entry: CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _connect(self) -> Optional[aiosqlite.Connection]:
+        """The SQLite tier's connection, if configured (opened and its table created on first use)."""
+        if not self.path:
+            return None
+        async with self._db_lock:
+            if self._db is None:
+                try:
+                    db = await aiosqlite.connect(self.path)
+                    await db.execute("""
+                        CREATE TABLE IF NOT EXISTS planner_results (
+                            key TEXT PRIMARY KEY,
+                            category TEXT NOT NULL,
+                            created REAL NOT NULL,
+                            result TEXT NOT NULL
+                        )
+                    """)
+                    await db.commit()
+                    self._db = db
+                except sqlite3.Error as e:
+                    logger.warning(f"Planner result cache persistence unavailable ({self.path}): {e}")
+                    self.path = None
+        return self._db
+
+    async def _load(self, key: str) -> Optional[CacheEntry]:
+        db = await self._connect()
+        if db is None:
+            return None
+        try:
+            async with db.execute("SELECT category, created, result FROM planner_results WHERE key = ?", (key,)) as cursor:
+                row = await cursor.fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read persisted planner result: {e}")
+            return None
+        if row is None:
+            return None
+        return CacheEntry(result=json.loads(row[2]), category=row[0], created=row[1])
+
+    async def _persist(self, key: str, entry: CacheEntry):
+        db = await self._connect()
+        if db is None:
+            return
+        try:
+            await db.execute(
+                "INSERT OR REPLACE INTO planner_results (key, category, created, result) VALUES (?, ?, ?, ?)",
+                (key, entry.category, entry.created, json.dumps(entry.result, default=str))
+            )
+            await db.commit()
+        except (sqlite3.Error, TypeError) as e:
+            logger.warning(f"Failed to persist planner result: {e}")
@@ -0,0 +1,69 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from ..common.messages import ShoppingBrief, EnrichedProduct, ProductCandidate, ClarificationRequest
+
+@dataclass
+class SessionState:
+    """What a session's last search left behind for follow-up refinements."""
+    brief: ShoppingBrief  # Brief of the last answer, refined briefs build on it
+    pool_constraints: dict  # Constraints the pool was discovered under
+    enriched: List[EnrichedProduct]  # The enriched (and ranked) candidate pool
+    candidates: List[ProductCandidate] = field(default_factory=list)  # Everything discovered, before pruning
+    pruned: List[ProductCandidate] = field(default_factory=list)  # Candidates pruned before enrichment
+    updated: float = field(default_factory=time.time)
+
+    @property
+    def features_id(self) -> str:
+        """Request id the ranker caches the pool's feature matrix under."""
+        return self.enriched[0].trace.request_id if self.enriched and self.enriched[0].trace else ""
+
+@dataclass
+class PendingClarification:
+    """A clarification awaiting answers, with discovery already running for the brief as-is."""
+    brief: ShoppingBrief
+    request: ClarificationRequest
+    session_id: str  # Session the speculative run records its candidate pool under
+    speculation: "asyncio.Task[Dict]"
+    created: float = field(default_factory=time.time)
+
+class SessionStore:
+    """In-memory session preference store, keyed by session id.
+
+    Holds each session's last brief and candidate pool so conversational
+    follow-ups ("same but under $100") re-filter and re-rank locally
+    instead of running discovery again. The pool's feature matrix lives
+    in the ranker's feature cache under `SessionState.features_id`.
+    Sessions expire `ttl` seconds after their last use and the least
+    recently used are evicted beyond `max_sessions`, which bounds memory.
+    """
+
+    def __init__(self, ttl: float = 1800.0, max_sessions: int = 1000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        state = self._sessions.get(session_id)
+        if state is None:
+            return None
+        if time.time() - state.updated > self.ttl:
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return state
+
+    def put(self, session_id: str, state: SessionState):
+        state.updated = time.time()
+        self._sessions[session_id] = state
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def drop(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -0,0 +1,75 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+from ..common.utils import logger, log_context
+
+T = TypeVar("T")
+
+# Marks the end of a stage's input
+_DONE = object()
+
+# A stage handles one item and returns the item for the next stage (None to emit nothing)
+StageHandler = Callable[[Any], Awaitable[Optional[Any]]]
+
+class StagePipeline:
+    """Linear stage graph connected by bounded async queues.
+
+    The producer emits items into the first stage while it is still
+    running; each stage processes items as they arrive and passes its
+    output downstream, so all stages overlap. Queues are bounded, so a
+    slow stage applies backpressure instead of buffering everything.
+
+    Stages here are speculative: an exception in a stage is logged and
+    the item dropped, it never fails the run. `run` returns the
+    producer's own result once every stage has drained, which is the
+    barrier the caller builds its deterministic final result on.
+    """
+
+    def __init__(self, request_id: str, queue_size: int = 4):
+        self.request_id = request_id
+        self.queue_size = queue_size
+        self.stages: List[Tuple[str, StageHandler]] = []
+
+    def add_stage(self, name: str, handler: StageHandler) -> "StagePipeline":
+        self.stages.append((name, handler))
+        return self
+
+    async def run(self, producer: Callable[[Callable[[Any], Awaitable[None]]], Awaitable[T]]) -> T:
+        """Run `producer(emit)` with every emitted item flowing through the stages."""
+        if not self.stages:
+            async def discard(item):
+                return None
+            return await producer(discard)
+
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        workers = [
+            asyncio.create_task(self._work(name, handler, queues[i], queues[i + 1] if i + 1 < len(queues) else None))
+            for i, (name, handler) in enumerate(self.stages)
+        ]
+
+        try:
+            result = await producer(queues[0].put)
+            await queues[0].put(_DONE)
+            await asyncio.gather(*workers)
+            return result
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    async def _work(self, name: str, handler: StageHandler, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]):
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                break
+
+            try:
+                output = await handler(item)
+            except Exception as e:
+                with log_context(self.request_id):
+                    logger.warning(f"Pipeline stage '{name}' failed on an item, skipping it: {e}")
+                continue
+
+            if outbox is not None and output is not None:
+                await outbox.put(output)
+
+        if outbox is not None:
+            await outbox.put(_DONE)
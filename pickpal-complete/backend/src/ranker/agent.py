@@ -1,131 +1,325 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple, Optional, Sequence
+from datetime import datetime
 import statistics
+import numpy as np
 from ..common.messages import *
 from ..common.bus import AgentBase
 from ..common.utils import logger, log_context
-from ..common.scoring import calculate_composite_score
-from ..common.aspects import extract_pros_and_cons, detect_product_category
+from ..common.scoring import calculate_score_components, calculate_score_bounds, select_top_k, DEFAULT_WEIGHTS
+from ..common.calibration import ScoreCalibrator
+from ..common.constraints import ConstraintSet
+from ..common.aspects import analyze_reviews, pros_and_cons_from_analysis, detect_product_category
+from .diversity import DiversityReranker
+from .features import FeatureMatrix, FeatureCache
+from .streaming import StreamingRanker
 
 class RankerAgent(AgentBase):
     """Agent responsible for ranking products and extracting pros/cons."""
     
-    def __init__(self):
+    def __init__(self, pool_factor: int = 4, feature_cache_size: int = 64):
         super().__init__("ranker")
+        self.pool_factor = pool_factor  # Candidates kept per result slot by the pre-ranking cascade
+        self.diversity = DiversityReranker()
+        self.features = FeatureCache(feature_cache_size)  # Per-request feature matrices for re-ranking
+        self.calibrator = ScoreCalibrator()  # Category score populations across requests
     
-    async def rank_products(self, enriched: List[EnrichedProduct], weights: Dict[str, float] = None, topk: int = 3) -> RankedList:
-        """Rank products and generate pros/cons."""
+    def prune_candidates(self, candidates: List[ProductCandidate], weights: Dict[str, float] = None,
+                         topk: int = 3,
+                         alternatives: Sequence[Tuple[Dict[str, float], Optional[ConstraintSet]]] = ()
+                         ) -> List[ProductCandidate]:
+        """Cheap pre-ranking cascade run before enrichment.
+        
+        Scores are bounded from the star rating and the review dates and
+        helpful votes, without any text analysis. A candidate is pruned only
+        if at least `topk` others are guaranteed to outscore it, so nothing
+        that could reach the top-k is dropped. The same holds for each
+        (weights, constraints) in `alternatives`, the rankings adaptation
+        may recompute from the enriched pool. Beyond that, the best
+        `pool_factor * topk` candidates by upper bound (ties broken by
+        evidence score and review count) are kept as headroom for the
+        diversity filter. Survivors keep their discovery order.
+        """
+        pool_size = self.pool_factor * topk
+        if len(candidates) <= pool_size:
+            return candidates
+        
+        lower, upper = self._score_bounds(candidates, weights)
+        keep = self._contender_mask(lower, upper, topk)
+        for alt_weights, alt_constraints in alternatives:
+            kept = {id(c) for c in self.contenders(candidates, alt_weights, topk, alt_constraints)}
+            keep |= np.array([id(c) in kept for c in candidates], dtype=bool)
+        
+        evidence = np.array([c.meta.get("evidence_score", 0) for c in candidates], dtype=np.float64)
+        reviews = np.array([c.meta.get("reviews_count", 0) or len(c.raw_reviews) for c in candidates], dtype=np.float64)
+        best = np.lexsort((-reviews, -evidence, -upper))[:pool_size]
+        keep[best] = True
+        
+        survivors = [c for c, kept in zip(candidates, keep) if kept]
+        
+        with log_context(candidates[0].trace.request_id if candidates[0].trace else "unknown"):
+            logger.info(f"Pre-ranking cascade: kept {len(survivors)} of {len(candidates)} candidates")
+        
+        return survivors
+    
+    def contenders(self, candidates: List[ProductCandidate], weights: Dict[str, float] = None, topk: int = 3,
+                   constraints: Optional[ConstraintSet] = None) -> List[ProductCandidate]:
+        """Candidates that could reach the top-k under `weights`, by the cascade's score bounds.
+        
+        With `constraints`, only candidates passing them compete. A pool
+        holding every contender loses nothing that could reach the top-k.
+        """
+        if constraints is not None:
+            candidates = constraints.check(candidates).kept()
+        if len(candidates) <= topk:
+            return list(candidates)
+        
+        keep = self._contender_mask(*self._score_bounds(candidates, weights), topk)
+        return [c for c, kept in zip(candidates, keep) if kept]
+    
+    def _score_bounds(self, candidates: List[ProductCandidate],
+                      weights: Optional[Dict[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """(lower, upper) composite score bounds of un-enriched candidates."""
+        stars = np.array([c.stars or 0 for c in candidates], dtype=np.float64)
+        review_ranges = np.array([self._review_signal_ranges(c.raw_reviews) for c in candidates], dtype=np.float64)
+        return calculate_score_bounds(
+            stars,
+            weights or None,
+            recency_days_range=(review_ranges[:, 0], review_ranges[:, 1]),
+            helpfulness_range=(np.zeros(len(candidates)), review_ranges[:, 2])
+        )
+    
+    def _contender_mask(self, lower: np.ndarray, upper: np.ndarray, topk: int) -> np.ndarray:
+        """Whether each candidate is not guaranteed to be outscored by at least `topk` others."""
+        # k-th best guaranteed score; composite scores are rounded to 0.01
+        threshold = np.partition(lower, -topk)[-topk] - 0.01
+        return upper >= threshold
+    
+    def _review_signal_ranges(self, reviews: List[Dict]) -> Tuple[float, float, float]:
+        """Range of the review-derived signals any subset of these reviews could produce.
+        
+        Review filtering during enrichment may drop reviews, so the median
+        review age can land anywhere between the newest and oldest review
+        (or the 365-day default when none are dated) and average helpfulness
+        anywhere up to the largest vote count. Returns
+        (min_recency_days, max_recency_days, max_helpfulness).
+        """
+        now = datetime.now()
+        days = [365]
+        max_helpful = 0
+        
+        for review in reviews:
+            if not isinstance(review, dict):
+                continue
+            max_helpful = max(max_helpful, min(review.get("helpful", 0) or 0, 100))
+            date_str = review.get("date")
+            if date_str:
+                try:
+                    days.append((now - datetime.strptime(date_str, "%Y-%m-%d")).days)
+                except ValueError:
+                    continue
+        
+        return min(days), max(days), max_helpful
+    
+    async def rank_products(self, enriched: List[EnrichedProduct], weights: Dict[str, float] = None,
+                            topk: int = 3, offset: int = 0, use_case: Optional[str] = None) -> RankedList:
+        """Rank products and generate pros/cons for the requested page.
+        
+        Ranking runs in two phases. The scoring phase scores every product
+        and picks the diverse top (offset + topk) from scores and prices
+        alone. The presentation phase then extracts pros and cons only for
+        the items on the returned page; later pages are presented on demand
+        by calling again with a larger `offset`.
+        
+        With a `use_case` and a "use_case" weight, products are also scored
+        on how well their aspect sentiments fit the use case.
+        
+        Per-product features are cached per request, so ranking a subset
+        of already ranked products (or the same products with other
+        weights) reuses them instead of recomputing.
+        """
         if not enriched:
             return RankedList(trace=Trace(request_id="", step="rank", source_agent="ranker"), items=[])
         
-        trace = self.create_trace(enriched[0].trace.request_id, "rank")
+        request_id = enriched[0].trace.request_id
+        features = self.features.get(request_id)
+        rows = features.rows_for(enriched) if features is not None else None
         
-        with log_context(trace.request_id):
+        observe = rows is None
+        if rows is None:
+            features = self.build_features(enriched)
+            self.features.put(request_id, features)
+            rows = np.arange(len(enriched))
+        
+        with log_context(request_id):
             logger.info(f"Ranking {len(enriched)} enriched products")
         
-        if weights is None:
-            weights = {
-                "rating": 0.4,
-                "sentiment": 0.3,
-                "recency": 0.2,
-                "helpfulness": 0.1
-            }
+        return self.rank_rows(features, rows, weights, topk, offset, use_case,
+                              self.create_trace(request_id, "rank"), observe=observe)
+    
+    async def rerank(self, request_id: str, weights: Dict[str, float] = None, topk: int = 3, offset: int = 0,
+                     constraints: Optional[ConstraintSet] = None, use_case: Optional[str] = None) -> Optional[RankedList]:
+        """Re-rank a request's products from cached features.
         
-        ranked_products = []
+        Only the weighted sum and top-k are recomputed; pros and cons of
+        products presented before are reused. Products failing
+        `constraints` are left out. Returns None if the request has no
+        cached features (never ranked, or evicted).
+        """
+        features = self.features.get(request_id)
+        if features is None:
+            return None
         
-        for product in enriched:
-            # Calculate composite score
-            rating = product.stars or 0
-            recency_days = product.quality_signals.get("recency_days_p50", 365)
-            helpfulness = product.quality_signals.get("avg_helpful", 0)
-            
-            # Calculate overall sentiment from reviews
-            sentiment = self._calculate_product_sentiment(product)
-            
-            score = calculate_composite_score(
-                rating=rating,
-                sentiment=sentiment,
-                recency_days=recency_days,
-                helpfulness=helpfulness,
-                weights=weights
-            )
-            
-            # Extract pros and cons from actual reviews
-            category = detect_product_category(product.name, "")
-            pros, cons = extract_pros_and_cons(product.raw_reviews, category)
-            
-            # Enhanced fallback with actual review content
-            if not pros and product.raw_reviews:
-                # Extract positive aspects from high-rated reviews
-                positive_reviews = [r for r in product.raw_reviews if r.get("stars", 0) >= 4]
-                if positive_reviews:
-                    pros = self._extract_key_positives(positive_reviews[:3])
-                else:
-                    pros = ["High-quality product with good reviews"]
-            elif not pros:
-                pros = ["High-quality product with good reviews"]
-                
-            if not cons and product.raw_reviews:
-                # Extract negative aspects from low-rated reviews
-                negative_reviews = [r for r in product.raw_reviews if r.get("stars", 0) <= 3]
-                if negative_reviews:
-                    cons = self._extract_key_negatives(negative_reviews[:3])
-                else:
-                    cons = ["Some users reported minor issues"]
-            elif not cons:
-                cons = ["Some users reported minor issues"]
-            elif not pros and not cons:
-                # Reviews exist but no clear pros/cons extracted
-                pros = ["Generally positive feedback"]
-                cons = ["Minor issues reported"]
-            
-            why = {
-                "rating_contribution": rating * weights["rating"],
-                "sentiment_contribution": (sentiment + 1) * 5 * weights["sentiment"],
-                "recency_contribution": 10 * (1 - min(recency_days / 365, 1)) * weights["recency"],
-                "helpfulness_contribution": min(helpfulness / 10, 1) * 10 * weights["helpfulness"]
-            }
-            
-            ranked_product = RankedProduct(
-                name=product.name,
-                price=product.price,
-                stars=product.stars,
-                url=product.url,
-                raw_reviews=product.raw_reviews,
-                aspects=product.aspects,
-                quality_signals=product.quality_signals,
-                score=score,
-                pros=pros,
-                cons=cons,
-                why=why,
-                meta=product.meta,
-                trace=trace,
-                image_url=product.image_url
-            )
-            
-            ranked_products.append(ranked_product)
+        if constraints is not None:
+            rows = np.flatnonzero(constraints.mask(features.products))
+        else:
+            rows = np.arange(len(features))
         
-        # Sort by score
-        ranked_products.sort(key=lambda x: x.score, reverse=True)
+        with log_context(request_id):
+            logger.info(f"Re-ranking {len(rows)} of {len(features)} products from cached features")
         
-        # Apply diversity consideration (ensure variety in top results)
-        if len(ranked_products) > 3:
-            ranked_products = self._apply_diversity_filter(ranked_products)
+        return self.rank_rows(features, rows, weights, topk, offset, use_case,
+                              self.create_trace(request_id, "rank"))
+    
+    def stream(self, topk: int = 3, weights: Dict[str, float] = None,
+               use_case: Optional[str] = None) -> StreamingRanker:
+        """Start an incremental ranking that accepts products as they are enriched."""
+        return StreamingRanker(self, topk=topk, weights=weights, use_case=use_case)
+    
+    def rank_rows(self, features: FeatureMatrix, rows: np.ndarray, weights: Optional[Dict[str, float]],
+                  topk: int, offset: int, use_case: Optional[str], trace: Trace,
+                  observe: bool = False) -> RankedList:
+        """Score, select and present the given feature rows.
+        
+        The step every ranking path shares (full, re-rank and streaming).
+        With `observe`, the scores also join their category populations
+        (done once per request, not on re-ranks).
+        """
+        if weights is None:
+            weights = DEFAULT_WEIGHTS
+        
+        # Scoring phase
+        scores, contributions = features.scores(weights, use_case)
+        if observe:
+            self.calibrator.observe(features.category, scores[rows], weights)
+        selected = self._select_diverse(features, rows, scores, offset + topk)
+        page = selected[offset:offset + topk]
+        calibration = self.calibrator.calibrate(features.category, scores[page], weights)
+        
+        # Presentation phase: only the page being returned
+        ranked_products = []
+        for i, row in enumerate(page):
+            if row not in features.pros_cons:
+                features.pros_cons[row] = self._extract_pros_cons(features.products[row])
+            pros, cons = features.pros_cons[row]
+            why = {f"{name}_contribution": float(values[row]) for name, values in contributions.items()}
+            if calibration is not None:
+                # Score relative to the category's scores under these weights across requests
+                why["category_percentile"] = round(float(calibration[0][i]), 1)
+                why["category_z"] = round(float(calibration[1][i]), 2)
+            ranked_products.append(self._build_ranked_product(
+                features.products[row], float(scores[row]), list(pros), list(cons), why, trace
+            ))
         
         with log_context(trace.request_id):
-            logger.info(f"Ranking complete: {len(ranked_products)} products scored")
-            logger.info(f"Top score: {ranked_products[0].score:.2f} ({ranked_products[0].name})")
-            logger.info(f"Score breakdown for top product:")
-            top_why = ranked_products[0].why
-            for component, value in top_why.items():
-                logger.info(f"  - {component}: {value:.2f}")
+            logger.info(f"Ranking complete: {len(rows)} products scored, {len(ranked_products)} presented")
+            if ranked_products:
+                logger.info(f"Top score: {ranked_products[0].score:.2f} ({ranked_products[0].name})")
+                logger.info(f"Score breakdown for top product:")
+                top_why = ranked_products[0].why
+                for component, value in top_why.items():
+                    logger.info(f"  - {component}: {value:.2f}")
             
             # Log pros/cons extraction results
             for i, product in enumerate(ranked_products[:3]):  # Top 3
-                logger.info(f"Product {i+1} ({product.name}): {len(product.pros)} pros, {len(product.cons)} cons")
+                logger.info(f"Product {offset+i+1} ({product.name}): {len(product.pros)} pros, {len(product.cons)} cons")
         
         return RankedList(
             trace=trace,
-            items=ranked_products[:topk]
+            items=ranked_products
+        )
+    
+    def build_features(self, enriched: List[EnrichedProduct]) -> FeatureMatrix:
+        """Compute the unweighted score components of every product in one vectorized pass.
+        
+        Feature matrices from here can be scored and passed to `rank_rows`.
+        """
+        rating = np.array([product.stars or 0 for product in enriched], dtype=np.float64)
+        sentiment = np.array([self._calculate_product_sentiment(product) for product in enriched], dtype=np.float64)
+        recency_days = np.array([product.quality_signals.get("recency_days_p50", 365) for product in enriched], dtype=np.float64)
+        helpfulness = np.array([product.quality_signals.get("avg_helpful", 0) for product in enriched], dtype=np.float64)
+        
+        return FeatureMatrix(enriched, calculate_score_components(rating, sentiment, recency_days, helpfulness))
+    
+    def _select_diverse(self, features: FeatureMatrix, rows: np.ndarray, scores: np.ndarray, limit: int) -> List[int]:
+        """Best `limit` of the given rows after diversity reranking, best first."""
+        n = len(rows)
+        
+        # Only the best candidates by score compete for the diverse slots
+        order = rows[select_top_k(scores[rows], min(n, self.pool_factor * limit))].tolist()
+        
+        # Apply diversity consideration (ensure variety in top results)
+        if n <= 3:
+            return order[:limit]
+        
+        return self.diversity.select(order, scores, features.prices, limit,
+                                     aspect_profiles=features.aspect_profiles if features.aspect_names else None,
+                                     brands=features.brands)
+    
+    def _extract_pros_cons(self, product: EnrichedProduct) -> Tuple[List[str], List[str]]:
+        """Extract pros and cons from a product's reviews."""
+        # Extract pros and cons from the review analysis done during enrichment
+        analysis = product.analysis
+        if analysis is None:
+            category = detect_product_category(product.name, "")
+            analysis = analyze_reviews(product.raw_reviews, category)
+        pros, cons = pros_and_cons_from_analysis(analysis)
+        
+        # Enhanced fallback with actual review content
+        if not pros and product.raw_reviews:
+            # Extract positive aspects from high-rated reviews
+            positive_reviews = [r for r in product.raw_reviews if r.get("stars", 0) >= 4]
+            if positive_reviews:
+                pros = self._extract_key_positives(positive_reviews[:3])
+            else:
+                pros = ["High-quality product with good reviews"]
+        elif not pros:
+            pros = ["High-quality product with good reviews"]
+            
+        if not cons and product.raw_reviews:
+            # Extract negative aspects from low-rated reviews
+            negative_reviews = [r for r in product.raw_reviews if r.get("stars", 0) <= 3]
+            if negative_reviews:
+                cons = self._extract_key_negatives(negative_reviews[:3])
+            else:
+                cons = ["Some users reported minor issues"]
+        elif not cons:
+            cons = ["Some users reported minor issues"]
+        elif not pros and not cons:
+            # Reviews exist but no clear pros/cons extracted
+            pros = ["Generally positive feedback"]
+            cons = ["Minor issues reported"]
+        
+        return pros, cons
+    
+    def _build_ranked_product(self, product: EnrichedProduct, score: float, pros: List[str], cons: List[str],
+                              why: Dict[str, float], trace: Trace) -> RankedProduct:
+        """Build a ranked product for presentation."""
+        return RankedProduct(
+            name=product.name,
+            price=product.price,
+            stars=product.stars,
+            url=product.url,
+            raw_reviews=product.raw_reviews,
+            aspects=product.aspects,
+            quality_signals=product.quality_signals,
+            score=score,
+            pros=pros,
+            cons=cons,
+            why=why,
+            meta=product.meta,
+            trace=trace,
+            image_url=product.image_url,
+            canonical_id=product.canonical_id
         )
     
     def _extract_key_positives(self, positive_reviews: List[Dict]) -> List[str]:
@@ -191,36 +385,6 @@ class RankerAgent(AgentBase):
         
         return final_sentiment
     
-    def _apply_diversity_filter(self, ranked_products: List[RankedProduct]) -> List[RankedProduct]:
-        """Apply diversity filter to avoid too similar products in top results."""
-        if len(ranked_products) <= 3:
-            return ranked_products
-        
-        diverse_products = [ranked_products[0]]  # Always include top product
-        
-        for product in ranked_products[1:]:
-            # Check if this product is too similar to already selected ones
-            is_diverse = True
-            
-            for selected in diverse_products:
-                # Simple diversity check based on price range
-                if product.price and selected.price:
-                    price_diff_pct = abs(product.price - selected.price) / max(product.price, selected.price)
-                    if price_diff_pct < 0.15:  # Less than 15% price difference
-                        score_diff = abs(product.score - selected.score)
-                        if score_diff < 1.0:  # And similar scores
-                            is_diverse = False
-                            break
-            
-            if is_diverse:
-                diverse_products.append(product)
-            
-            # Stop when we have enough diverse products
-            if len(diverse_products) >= len(ranked_products):
-                break
-        
-        return diverse_products
-    
     async def handle_rank_request(self, message):
         """Handle rank request from message bus."""
         try:
@@ -229,7 +393,7 @@ class RankerAgent(AgentBase):
             weights = data.get("weights", {})
             response_topic = message.payload["response_topic"]
             
-            ranked_list = await self.rank_products(enriched, weights)
+            ranked_list = await self.rank_products(enriched, weights, use_case=data.get("use_case"))
             
             # Send response
             await self.send_message(response_topic, ranked_list, message.trace)
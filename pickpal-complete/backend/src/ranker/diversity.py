@@ -0,0 +1,105 @@
+from typing import Dict, List, Optional
+import numpy as np
+
+class DiversityReranker:
+    """Maximal Marginal Relevance selection over price, aspect profile and brand.
+
+    Each step picks the candidate maximizing
+        lambda * relevance - (1 - lambda) * max similarity to the picks so far.
+    Similarity mixes price proximity (within `price_window`, relative to the
+    higher price), cosine similarity of aspect profiles and same-brand. The
+    per-candidate max similarity is updated incrementally after each pick:
+    price conflicts come from a sorted price index (two binary searches),
+    brand conflicts from a brand -> candidates map. Selection stops as soon
+    as `k` items are chosen.
+    """
+
+    def __init__(self, mmr_lambda: float = 0.7, price_window: float = 0.15,
+                 price_weight: float = 0.5, aspect_weight: float = 0.3, brand_weight: float = 0.2):
+        self.mmr_lambda = mmr_lambda
+        self.price_window = price_window
+        self.price_weight = price_weight
+        self.aspect_weight = aspect_weight
+        self.brand_weight = brand_weight
+
+    def select(self, candidates: List[int], scores: np.ndarray, prices: np.ndarray, k: int,
+               aspect_profiles: Optional[np.ndarray] = None, brands: Optional[List[str]] = None) -> List[int]:
+        """Pick up to `k` diverse indices from `candidates` (given best first).
+
+        `scores`, `prices`, `aspect_profiles` (rows) and `brands` are indexed
+        by product index, like `candidates`.
+        """
+        if k <= 0 or not candidates:
+            return []
+
+        cand = np.asarray(candidates, dtype=np.int64)
+        n = len(cand)
+
+        # Relevance normalized over the candidate pool
+        cand_scores = np.asarray(scores, dtype=np.float64)[cand]
+        spread = cand_scores.max() - cand_scores.min()
+        relevance = (cand_scores - cand_scores.min()) / spread if spread > 0 else np.ones(n)
+
+        # Sorted price index over the pool (zero/unknown prices never conflict)
+        cand_prices = np.asarray(prices, dtype=np.float64)[cand]
+        priced = np.flatnonzero(cand_prices > 0)
+        price_order = priced[np.argsort(cand_prices[priced], kind="stable")]
+        sorted_prices = cand_prices[price_order]
+
+        brand_index: Dict[str, List[int]] = {}
+        if brands is not None:
+            for position, index in enumerate(cand):
+                brand = brands[index]
+                if brand:
+                    brand_index.setdefault(brand, []).append(position)
+
+        unit_profiles = None
+        if aspect_profiles is not None and self.aspect_weight > 0:
+            profiles = np.asarray(aspect_profiles, dtype=np.float64)[cand]
+            norms = np.linalg.norm(profiles, axis=1, keepdims=True)
+            unit_profiles = np.divide(profiles, norms, out=np.zeros_like(profiles), where=norms > 0)
+
+        max_similarity = np.zeros(n)
+        available = np.ones(n, dtype=bool)
+        picks = []
+
+        while len(picks) < min(k, n):
+            mmr = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * max_similarity
+            mmr[~available] = -np.inf
+            # argmax returns the first maximum, i.e. the better-ranked candidate on ties
+            position = int(np.argmax(mmr))
+            available[position] = False
+            picks.append(position)
+
+            max_similarity = np.maximum(
+                max_similarity,
+                self._similarity_to(position, cand_prices, price_order, sorted_prices,
+                                    brand_index, brands[cand[position]] if brands is not None else None,
+                                    unit_profiles)
+            )
+
+        return [int(cand[p]) for p in picks]
+
+    def _similarity_to(self, position: int, cand_prices: np.ndarray, price_order: np.ndarray,
+                       sorted_prices: np.ndarray, brand_index: Dict[str, List[int]],
+                       brand: Optional[str], unit_profiles: Optional[np.ndarray]) -> np.ndarray:
+        """Similarity of every pool candidate to the candidate at `position`."""
+        similarity = np.zeros(len(cand_prices))
+
+        price = cand_prices[position]
+        if price > 0 and self.price_weight > 0:
+            # |p - price| / max(p, price) < window  <=>  price * (1 - w) < p < price / (1 - w)
+            lo = np.searchsorted(sorted_prices, price * (1 - self.price_window), side="right")
+            hi = np.searchsorted(sorted_prices, price / (1 - self.price_window), side="left")
+            neighbours = price_order[lo:hi]
+            neighbour_prices = cand_prices[neighbours]
+            diff_pct = np.abs(neighbour_prices - price) / np.maximum(neighbour_prices, price)
+            similarity[neighbours] += self.price_weight * (1 - diff_pct / self.price_window)
+
+        if brand and self.brand_weight > 0:
+            similarity[brand_index.get(brand, [])] += self.brand_weight
+
+        if unit_profiles is not None:
+            similarity += self.aspect_weight * np.clip(unit_profiles @ unit_profiles[position], 0, 1)
+
+        return similarity
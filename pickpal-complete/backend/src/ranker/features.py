@@ -0,0 +1,116 @@
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ..common.messages import EnrichedProduct
+from ..common.scoring import combine_score_components
+from ..common.aspects import use_case_weight_vector
+
+class FeatureMatrix:
+    """Ranking features for the enriched products of one request.
+
+    Holds the unweighted 0-10 score components, prices, brands and aspect
+    profiles of every product (one row each), plus the pros and cons of
+    rows that have already been presented. Re-ranking with other weights
+    or over a subset of the rows only redoes the weighted sum and top-k.
+
+    The aspect-sentiment vectors from enrichment are stacked into one
+    dense matrix per category, so use-case fit is one matrix-vector
+    product per category.
+    """
+
+    def __init__(self, products: List[EnrichedProduct], components: Dict[str, np.ndarray]):
+        self.products = products
+        self.components = components
+        self.prices = np.array([product.price or 0 for product in products], dtype=np.float64)
+        self.brands = [product.name.split()[0].lower() if product.name.split() else "" for product in products]
+        # One discovery sweep covers one category; products whose own category
+        # was not recognised take the most common recognised one
+        categories = Counter(
+            product.meta.get("category") or (product.analysis.category if product.analysis is not None else "general")
+            for product in products
+        )
+        categories.pop("general", None)
+        self.category = categories.most_common(1)[0][0] if categories else "general"
+
+        self.aspect_names = sorted({aspect for product in products for aspect in product.aspects})
+        self.aspect_profiles = np.array(
+            [[product.aspects.get(aspect, 0.0) for aspect in self.aspect_names] for product in products],
+            dtype=np.float64
+        ).reshape(len(products), len(self.aspect_names))
+
+        by_category = defaultdict(list)
+        for row, product in enumerate(products):
+            if product.analysis is not None and product.analysis.aspect_vector:
+                by_category[product.analysis.category].append(row)
+        # category -> (rows, rows x aspects sentiment matrix)
+        self.aspect_matrices: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            category: (np.array(rows, dtype=np.int64),
+                       np.array([products[row].analysis.aspect_vector for row in rows], dtype=np.float64))
+            for category, rows in by_category.items()
+        }
+        self._use_case_scores: Dict[Optional[str], np.ndarray] = {}
+
+        # row -> (pros, cons), filled in as rows are presented
+        self.pros_cons: Dict[int, Tuple[List[str], List[str]]] = {}
+        self._rows = {id(product): row for row, product in enumerate(products)}
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def rows_for(self, products: List[EnrichedProduct]) -> Optional[np.ndarray]:
+        """Rows of `products` in the given order, or None if any is not in the matrix."""
+        rows = [self._rows.get(id(product)) for product in products]
+        if any(row is None for row in rows):
+            return None
+        return np.array(rows, dtype=np.int64)
+
+    def use_case_scores(self, use_case: Optional[str]) -> np.ndarray:
+        """0-10 fit of every row to a use case.
+
+        The weighted mean of the product's aspect sentiments under the use
+        case's aspect weights, mapped from [-1, 1]. Products without
+        analysed aspects (or use cases without weights) score a neutral 5.
+        """
+        if use_case not in self._use_case_scores:
+            fit = np.zeros(len(self))
+            if use_case:
+                for category, (rows, matrix) in self.aspect_matrices.items():
+                    weights = use_case_weight_vector(category, use_case)
+                    total = weights.sum()
+                    if total > 0:
+                        fit[rows] = matrix @ weights / total
+            self._use_case_scores[use_case] = (np.clip(fit, -1, 1) + 1) * 5
+        return self._use_case_scores[use_case]
+
+    def scores(self, weights: Dict[str, float] = None,
+               use_case: Optional[str] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Composite scores and weighted contributions for every row.
+
+        A "use_case" weight adds the use-case fit as a component.
+        """
+        components = self.components
+        if weights and "use_case" in weights:
+            components = {**components, "use_case": self.use_case_scores(use_case)}
+        return combine_score_components(components, weights)
+
+class FeatureCache:
+    """Bounded LRU of feature matrices keyed by request id."""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, FeatureMatrix]" = OrderedDict()
+
+    def get(self, request_id: str) -> Optional[FeatureMatrix]:
+        features = self._entries.get(request_id)
+        if features is not None:
+            self._entries.move_to_end(request_id)
+        return features
+
+    def put(self, request_id: str, features: FeatureMatrix):
+        self._entries[request_id] = features
+        self._entries.move_to_end(request_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, request_id: str):
+        self._entries.pop(request_id, None)
@@ -0,0 +1,99 @@
+import heapq
+import itertools
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from ..common.messages import EnrichedProduct, RankedList, Trace
+
+if TYPE_CHECKING:
+    from .agent import RankerAgent
+
+class StreamingRanker:
+    """Incremental top-k ranking over products as they are enriched.
+
+    Products are scored on arrival and kept in a bounded min-heap of the
+    best `pool_factor * topk` (the same candidate pool the full ranking
+    lets compete for diverse slots), so memory stays O(k) however many
+    products stream through. `provisional()` runs diversity selection
+    and presentation over the retained pool at any point; once every
+    product has been pushed it matches `RankerAgent.rank_products` over
+    the whole list.
+    """
+
+    def __init__(self, ranker: "RankerAgent", topk: int = 3, weights: Dict[str, float] = None,
+                 use_case: Optional[str] = None):
+        self.ranker = ranker
+        self.topk = topk
+        self.weights = weights
+        self.use_case = use_case
+        self.capacity = max(ranker.pool_factor * topk, topk)
+        self.seen = 0
+
+        # Min-heap of (score, -arrival, arrival, product): the root is the weakest
+        # retained product, later arrivals losing ties like in the full ranking
+        self._heap: List[Tuple[float, int, int, EnrichedProduct]] = []
+        self._arrivals = itertools.count()
+        self._request_id = ""
+        # arrival -> (pros, cons) of products presented by earlier snapshots
+        self._pros_cons: Dict[int, Tuple[List[str], List[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, product: EnrichedProduct) -> bool:
+        """Add one product. Returns whether it made the retained pool."""
+        return self.extend([product]) == 1
+
+    def extend(self, products: Iterable[EnrichedProduct]) -> int:
+        """Add a batch of products, scored in one vectorized pass. Returns how many were retained."""
+        products = list(products)
+        if not products:
+            return 0
+
+        if not self._request_id and products[0].trace:
+            self._request_id = products[0].trace.request_id
+
+        scores, _ = self.ranker.build_features(products).scores(self.weights, self.use_case)
+        self.seen += len(products)
+
+        retained = 0
+        for product, score in zip(products, scores.tolist()):
+            arrival = next(self._arrivals)
+            entry = (score, -arrival, arrival, product)
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, entry)
+                retained += 1
+            elif entry > self._heap[0]:
+                evicted = heapq.heapreplace(self._heap, entry)
+                self._pros_cons.pop(evicted[2], None)
+                retained += 1
+        return retained
+
+    def retained(self) -> List[EnrichedProduct]:
+        """Retained products in arrival order."""
+        return [entry[3] for entry in self._entries()]
+
+    def provisional(self, topk: int = None, offset: int = 0) -> RankedList:
+        """Ranking of everything pushed so far, with diversity and pros/cons.
+
+        Only the retained pool is ranked, so pages beyond the first
+        `topk` may be incomplete.
+        """
+        trace = self.ranker.create_trace(self._request_id, "rank")
+        entries = self._entries()
+        if not entries:
+            return RankedList(trace=trace, items=[])
+
+        features = self.ranker.build_features([entry[3] for entry in entries])
+        arrivals = [entry[2] for entry in entries]
+        features.pros_cons = {row: self._pros_cons[arrival] for row, arrival in enumerate(arrivals)
+                              if arrival in self._pros_cons}
+
+        ranked = self.ranker.rank_rows(features, np.arange(len(entries)), self.weights,
+                                       topk or self.topk, offset, self.use_case, trace)
+
+        for row, pros_cons in features.pros_cons.items():
+            self._pros_cons[arrivals[row]] = pros_cons
+        return ranked
+
+    def _entries(self) -> List[Tuple[float, int, int, EnrichedProduct]]:
+        return sorted(self._heap, key=lambda entry: entry[2])
@@ -1,35 +1,47 @@
-from typing import List, Dict
+import asyncio
+from typing import List, Dict, Optional
 from ..common.messages import *
 from ..common.bus import AgentBase
 from ..common.utils import logger, log_context
+from ..common.context import current_request_id, request_context
+from ..common.constraints import compile_constraints, ConstraintSet
+from ..common.deadline import Deadline, within
+from .availability import AvailabilityChecker, availability_key
 
 class VerifierAgent(AgentBase):
     """Agent responsible for verifying ranked products against constraints."""
     
-    def __init__(self):
+    def __init__(self, availability: AvailabilityChecker = None, stock_check_timeout: float = 2.0):
         super().__init__("verifier")
+        self.availability = availability or AvailabilityChecker()
+        self.stock_check_timeout = stock_check_timeout  # Upper bound, within the request deadline
     
     async def verify_products(self, ranked_list: RankedList, brief: ShoppingBrief) -> VerificationReport:
         """Verify ranked products against shopping brief constraints."""
-        trace = self.create_trace(ranked_list.trace.request_id, "verify")
-        self._current_request_id = trace.request_id
+        trace = self.create_trace(ranked_list.trace.request_id, "verify", brief.trace.deadline)
         
+        # The checks log under the request being verified
+        with request_context(trace.request_id):
+            return await self._run_checks(ranked_list, brief, trace)
+    
+    async def _run_checks(self, ranked_list: RankedList, brief: ShoppingBrief, trace: Trace) -> VerificationReport:
         with log_context(trace.request_id):
             logger.info(f"Starting verification of {len(ranked_list.items)} ranked products")
         
         checks = {}
         notes = []
         all_passed = True
+        constraints = compile_constraints(brief.constraints, brief.success)
         
         # Budget check
-        budget_passed = self._check_budget(ranked_list.items, brief.constraints)
+        budget_passed = self._check_budget(ranked_list.items, constraints)
         checks["budget"] = budget_passed
         if not budget_passed:
             all_passed = False
             notes.append("Some products exceed budget constraints")
         
-        # Out of stock check (mock - always passes for demo)
-        oos_passed = self._check_out_of_stock(ranked_list.items)
+        # Out of stock check
+        oos_passed = await self._check_out_of_stock(ranked_list.items, trace.deadline)
         checks["out_of_stock"] = oos_passed
         if not oos_passed:
             all_passed = False
@@ -43,7 +55,7 @@ class VerifierAgent(AgentBase):
             notes.append("Duplicate products found in results")
         
         # Evidence threshold check
-        evidence_passed = self._check_evidence_threshold(ranked_list.items, brief.success)
+        evidence_passed = self._check_evidence_threshold(ranked_list.items, constraints)
         checks["evidence"] = evidence_passed
         if not evidence_passed:
             all_passed = False
@@ -77,36 +89,53 @@ class VerifierAgent(AgentBase):
             notes=notes
         )
     
-    def _check_budget(self, products: List[RankedProduct], constraints: Dict) -> bool:
+    async def prefetch_availability(self, products: List[RankedProduct], deadline: Optional[Deadline] = None):
+        """Warm the availability cache for provisional top results ahead of verification."""
+        try:
+            await within(deadline, self.availability.check(availability_key(product) for product in products[:3]),
+                         cap=self.stock_check_timeout)
+        except asyncio.TimeoutError:
+            pass  # Speculative: verification does its own bounded check
+    
+    def _check_budget(self, products: List[RankedProduct], constraints: ConstraintSet) -> bool:
         """Check if products meet budget constraints."""
-        if "max_price" not in constraints:
+        if constraints.get("max_price") is None:
             return True
         
-        max_price = constraints["max_price"]
-        violations = []
+        check = constraints.check(products, names=["max_price"])
         
-        for product in products:
-            if product.price > max_price:
-                violations.append(f"{product.name} (${product.price}) > ${max_price}")
-        
-        if violations:
-            with log_context(getattr(self, '_current_request_id', 'unknown')):
+        if not check.ok:
+            violations = check.violations()
+            max_price = constraints.get("max_price").limit
+            with log_context(current_request_id()):
                 logger.warning(f"Budget violations found: {len(violations)} products exceed max_price ${max_price}")
-                for violation in violations:
-                    logger.warning(f"  - {violation}")
+                for product, reason in violations:
+                    logger.warning(f"  - {product.name}: {reason}")
             return False
         
         return True
     
-    def _check_out_of_stock(self, products: List[RankedProduct]) -> bool:
-        """Check if products are in stock (mock implementation)."""
-        # Mock implementation - randomly mark some products as OOS for demo
-        import random
-        
-        for product in products[:3]:
-            # 10% chance of being out of stock
-            if random.random() < 0.1:
-                return False
+    async def _check_out_of_stock(self, products: List[RankedProduct], deadline: Optional[Deadline] = None) -> bool:
+        """Check if the top products are in stock (one batched lookup at most).
+        
+        If the lookup runs out of time the products are assumed in stock,
+        like a failed lookup, and the result is marked degraded.
+        """
+        keys = [availability_key(product) for product in products[:3]]
+        try:
+            statuses = await within(deadline, self.availability.check(keys), cap=self.stock_check_timeout)
+        except asyncio.TimeoutError:
+            with log_context(current_request_id()):
+                logger.warning("Stock check ran out of time, assuming in stock")
+            if deadline is not None:
+                deadline.degrade("verifier: stock check timed out")
+            return True
+        
+        out_of_stock = [key for key in keys if not statuses.get(key, True)]
+        if out_of_stock:
+            with log_context(current_request_id()):
+                logger.warning(f"Out of stock: {out_of_stock}")
+            return False
         
         return True
     
@@ -115,24 +144,16 @@ class VerifierAgent(AgentBase):
         seen_ids = set()
         
         for product in products:
-            product_id = getattr(product, 'canonical_id', product.name)
+            product_id = product.canonical_id or product.name
             if product_id in seen_ids:
                 return False
             seen_ids.add(product_id)
         
         return True
     
-    def _check_evidence_threshold(self, products: List[RankedProduct], success_criteria: Dict) -> bool:
-        """Check if products have sufficient review evidence."""
-        min_reviews = success_criteria.get("min_reviews", 50)
-        
-        for product in products[:3]:  # Check top 3
-            # We don't have review count in RankedProduct, so we'll estimate from score
-            # In a real implementation, this would check actual review counts
-            if product.score < 5.0:  # Assume low scores indicate insufficient evidence
-                return False
-        
-        return True
+    def _check_evidence_threshold(self, products: List[RankedProduct], constraints: ConstraintSet) -> bool:
+        """Check if the top products have at least `success["min_reviews"]` reviews."""
+        return constraints.check_evidence(products).ok
     
     def _check_diversity(self, products: List[RankedProduct], success_criteria: Dict) -> bool:
         """Check if results have sufficient diversity."""
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from ..common.utils import logger
+
+def availability_key(product) -> str:
+    """Stock lookup key for a product: its canonical id, else URL, else name."""
+    return getattr(product, "canonical_id", "") or product.url or product.name.lower()
+
+class StockBackend(ABC):
+    """Pluggable stock service. One `lookup` call is one round trip for a batch of keys."""
+
+    @abstractmethod
+    async def lookup(self, keys: List[str]) -> Dict[str, bool]:
+        """Map each key to whether it is in stock; keys left out are unknown."""
+
+class LocalStockService(StockBackend):
+    """In-process stand-in for a stock service.
+
+    Everything is in stock except the keys in `out_of_stock`. Round trips
+    and looked-up keys are counted so batching and caching can be observed.
+    """
+
+    def __init__(self, out_of_stock: Iterable[str] = (), latency: float = 0.0):
+        self.out_of_stock: Set[str] = set(out_of_stock)
+        self.latency = latency
+        self.calls = 0
+        self.keys_looked_up = 0
+
+    async def lookup(self, keys: List[str]) -> Dict[str, bool]:
+        self.calls += 1
+        self.keys_looked_up += len(keys)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return {key: key not in self.out_of_stock for key in keys}
+
+class AvailabilityChecker:
+    """Batched, cached, coalescing front end to a StockBackend.
+
+    Statuses are cached for `ttl` seconds. Lookups missing from the cache
+    join a pending batch that is flushed to the backend after
+    `batch_window` seconds (by default on the next event-loop turn) in
+    chunks of `max_batch`, and a key already being looked up is awaited
+    rather than requested again.
+
+    If the backend fails, the affected products are reported in stock
+    and nothing is cached, so availability never blocks a result.
+    """
+
+    def __init__(self, backend: StockBackend = None, ttl: float = 300.0, batch_window: float = 0.0,
+                 max_batch: int = 50, max_entries: int = 10000):
+        self.backend = backend or LocalStockService()
+        self.ttl = ttl
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_entries = max_entries
+
+        self._cache: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def check(self, keys: Iterable[str]) -> Dict[str, bool]:
+        """In-stock status for each key."""
+        now = time.monotonic()
+        results: Dict[str, bool] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+
+        for key in dict.fromkeys(keys):
+            cached = self._cache.get(key)
+            if cached is not None and now - cached[1] < self.ttl:
+                results[key] = cached[0]
+                continue
+
+            future = self._in_flight.get(key)
+            if future is None:
+                future = asyncio.get_running_loop().create_future()
+                self._in_flight[key] = future
+                self._pending.append(key)
+            waiting[key] = future
+
+        if self._pending and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+
+        for key, future in waiting.items():
+            # Shield so a cancelled caller does not cancel a lookup others share
+            results[key] = await asyncio.shield(future)
+
+        return results
+
+    def invalidate(self, key: str = None):
+        """Drop one cached status, or all of them."""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+    async def _flush_after_window(self):
+        try:
+            if self.batch_window > 0 and len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.batch_window)
+            else:
+                # Still yield once so lookups issued in the same tick join the batch
+                await asyncio.sleep(0)
+
+            while self._pending:
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                await self._lookup_batch(batch)
+        finally:
+            self._flush_task = None
+
+    async def _lookup_batch(self, batch: List[str]):
+        try:
+            statuses = await self.backend.lookup(batch)
+        except Exception as e:
+            logger.warning(f"Stock lookup failed for {len(batch)} products, assuming in stock: {e}")
+            statuses = {}
+
+        checked_at = time.monotonic()
+        for key in batch:
+            status = statuses.get(key)
+            if status is not None:
+                self._cache[key] = (bool(status), checked_at)
+                self._cache.move_to_end(key)
+
+            future = self._in_flight.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(True if status is None else bool(status))
+
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
@@ -0,0 +1,19 @@
+import logging
+import pytest
+from src.planner.agent import PlannerAgent
+
+@pytest.fixture(autouse=True)
+def quiet_logs():
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
+
+@pytest.fixture
+async def offline_planner():
+    """A planner searching only the offline mock catalog."""
+    planner = PlannerAgent()
+    for name, config in planner.discovery.sources.items():
+        config["enabled"] = name == "mock_fallback"
+    yield planner
+    if planner.discovery.session is not None:
+        await planner.discovery.session.close()
@@ -0,0 +1,38 @@
+from src.common.messages import RankedList, RankedProduct, Trace
+from src.planner.agent import PlannerAgent
+
+def ranked(trace, reviews):
+    return RankedList(trace=trace, items=[
+        RankedProduct(name=f"Product {i}", price=price, stars=4.5, url=f"https://example.com/{i}",
+                      raw_reviews=[{"text": "fine"}] * reviews, aspects={}, quality_signals={}, score=score,
+                      pros=[], cons=[], why={}, trace=trace)
+        for i, (price, score) in enumerate([(100.0, 8.0), (150.0, 6.5), (200.0, 5.0)])
+    ])
+
+async def test_evidence_strategy_relaxes_the_check_the_verifier_runs():
+    planner = PlannerAgent()
+    trace = planner.create_trace("r1", "parse")
+    brief = planner._build_shopping_brief("wireless earbuds", {}, trace)
+    brief.success["min_reviews"] = 50
+    ranked_list = ranked(trace, reviews=4)
+
+    report = await planner.verifier.verify_products(ranked_list, brief)
+    assert report.checks["evidence"] is False
+
+    strategies = planner._adaptation_strategies(brief, [], ranked_list, report)
+    adapted, relaxed = await strategies["evidence"]()
+
+    assert adapted is ranked_list
+    assert (await planner.verifier.verify_products(adapted, relaxed)).checks["evidence"]
+
+async def test_evidence_strategy_skipped_when_nothing_to_relax():
+    planner = PlannerAgent()
+    trace = planner.create_trace("r1", "parse")
+    brief = planner._build_shopping_brief("wireless earbuds", {}, trace)
+    brief.success["min_reviews"] = 1
+    ranked_list = ranked(trace, reviews=0)
+
+    report = await planner.verifier.verify_products(ranked_list, brief)
+
+    assert report.checks["evidence"] is False
+    assert "evidence" not in planner._adaptation_strategies(brief, [], ranked_list, report)
@@ -0,0 +1,26 @@
+from src.common.aspects import AspectMatcher, get_aspect_matcher
+
+def test_keywords_match_with_simple_inflections():
+    matcher = AspectMatcher("wireless_earbuds")
+
+    mentions = matcher.match("The connection drops twice a day. ANC blocked the train!")
+
+    assert mentions == {
+        "connectivity": ["the connection drops twice a day"],
+        "noise_cancellation": ["anc blocked the train"]
+    }
+
+def test_keywords_match_whole_words_only():
+    matcher = AspectMatcher("wireless_earbuds")
+
+    mentions = matcher.match("Crystal clear highs, better than last year's pair")
+
+    assert "comfort" not in mentions  # "ear" inside "clear" and "year"
+    assert mentions == {"sound_quality": ["crystal clear highs, better than last year's pair"]}
+
+def test_unknown_categories_match_nothing():
+    assert AspectMatcher("toaster").match("Great sound and battery") == {}
+
+def test_matchers_are_shared_by_equivalent_category_spellings():
+    assert get_aspect_matcher(" Wireless_Earbuds ") is get_aspect_matcher("wireless_earbuds")
+    assert get_aspect_matcher("toaster") is get_aspect_matcher("blender")
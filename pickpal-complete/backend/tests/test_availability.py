@@ -0,0 +1,58 @@
+import asyncio
+from src.verifier.availability import AvailabilityChecker, LocalStockService
+
+class FailingStockService(LocalStockService):
+    async def lookup(self, keys):
+        await super().lookup(keys)
+        raise ConnectionError("stock service down")
+
+async def test_concurrent_checks_share_one_round_trip():
+    backend = LocalStockService(out_of_stock={"b"}, latency=0.01)
+    checker = AvailabilityChecker(backend)
+
+    results = await asyncio.gather(checker.check(["a", "b"]), checker.check(["b", "c"]), checker.check(["a"]))
+
+    assert results == [{"a": True, "b": False}, {"b": False, "c": True}, {"a": True}]
+    assert backend.calls == 1
+    assert backend.keys_looked_up == 3
+
+async def test_cached_statuses_skip_the_backend():
+    backend = LocalStockService()
+    checker = AvailabilityChecker(backend)
+
+    await checker.check(["a", "b"])
+    assert await checker.check(["b", "a"]) == {"b": True, "a": True}
+    assert backend.calls == 1
+
+    checker.invalidate("a")
+    await checker.check(["a", "b"])
+    assert (backend.calls, backend.keys_looked_up) == (2, 3)
+
+async def test_lookups_are_chunked_by_max_batch():
+    backend = LocalStockService()
+    checker = AvailabilityChecker(backend, max_batch=50)
+
+    results = await checker.check([f"sku-{i}" for i in range(120)])
+
+    assert len(results) == 120
+    assert backend.calls == 3
+
+async def test_backend_failure_reports_in_stock_without_caching():
+    backend = FailingStockService(out_of_stock={"a"})
+    checker = AvailabilityChecker(backend)
+
+    assert await checker.check(["a"]) == {"a": True}
+    assert await checker.check(["a"]) == {"a": True}
+    assert backend.calls == 2
+
+async def test_cancelled_caller_does_not_cancel_a_shared_lookup():
+    backend = LocalStockService(out_of_stock={"a"}, latency=0.01)
+    checker = AvailabilityChecker(backend)
+
+    cancelled = asyncio.create_task(checker.check(["a"]))
+    waiting = asyncio.create_task(checker.check(["a"]))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await waiting == {"a": False}
+    assert backend.calls == 1
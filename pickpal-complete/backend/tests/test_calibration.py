@@ -0,0 +1,33 @@
+import asyncio
+import json
+import numpy as np
+from src.common.calibration import ScoreCalibrator, population_key
+from src.common.scoring import DEFAULT_WEIGHTS
+
+def test_populations_are_kept_per_weights():
+    calibrator = ScoreCalibrator(path="", min_count=1)
+    rating_heavy = {**DEFAULT_WEIGHTS, "rating": 0.7}
+
+    calibrator.observe("wireless_earbuds", np.array([8.0, 8.5, 9.0]), DEFAULT_WEIGHTS)
+    calibrator.observe("wireless_earbuds", np.array([5.0, 5.5]), rating_heavy)
+
+    assert calibrator.stats[population_key("wireless_earbuds", DEFAULT_WEIGHTS)].count == 3
+    assert calibrator.stats[population_key("wireless_earbuds", rating_heavy)].count == 2
+    percentiles, _ = calibrator.calibrate("wireless_earbuds", np.array([7.0]), DEFAULT_WEIGHTS)
+    assert percentiles[0] == 0
+    assert calibrator.calibrate("wireless_earbuds", np.array([7.0]), {"rating": 1.0}) is None
+
+async def test_saves_are_batched_and_flushed(tmp_path):
+    path = tmp_path / "calibration.json"
+    calibrator = ScoreCalibrator(path=str(path), save_interval=0.05)
+
+    for _ in range(10):
+        calibrator.observe("standing_desk", np.array([6.0, 7.0]), DEFAULT_WEIGHTS)
+    assert not path.exists()
+
+    await asyncio.sleep(0.1)
+    assert json.loads(path.read_text())[population_key("standing_desk", DEFAULT_WEIGHTS)]["count"] == 20
+
+    calibrator.observe("standing_desk", np.array([8.0]), DEFAULT_WEIGHTS)
+    await calibrator.flush()
+    assert ScoreCalibrator(path=str(path)).stats[population_key("standing_desk", DEFAULT_WEIGHTS)].count == 21
@@ -0,0 +1,57 @@
+import pytest
+from src.common.messages import ProductCandidate
+from src.normalizer.canon import ReviewDeduplicator, simhash
+
+LONG = "The battery easily lasts a full work day and the case charges quickly over usb"
+
+def product(name, texts):
+    return ProductCandidate(name=name, raw_reviews=[{"text": t, "verified": True, "helpful": 5} for t in texts])
+
+def test_simhash_is_close_for_near_duplicates_only():
+    fingerprint, tokens = simhash(LONG)
+    near, _ = simhash(LONG + "!")
+    other, _ = simhash("Sound is muddy and the left bud keeps disconnecting from my phone during calls")
+
+    assert tokens == 15
+    assert (fingerprint ^ near).bit_count() <= 3
+    assert (fingerprint ^ other).bit_count() > 3
+
+def test_bands_must_exceed_the_distance_for_an_exact_index():
+    with pytest.raises(ValueError):
+        ReviewDeduplicator(max_distance=4, bands=4)
+
+def test_near_duplicates_dropped_within_a_product_and_long_ones_across_products():
+    deduplicator = ReviewDeduplicator()
+
+    filtered, stats = deduplicator.filter_batch([
+        product("A", [LONG, LONG.upper(), "Great sound"]),
+        product("B", [LONG + "!", "Great sound"])
+    ])
+
+    # Short phrases legitimately repeat across products
+    assert [[r["text"] for r in c.raw_reviews] for c in filtered] == [[LONG, "Great sound"], ["Great sound"]]
+    assert stats == {"low_quality": 0, "duplicates": 2, "kept": 3}
+
+def test_empty_and_low_quality_reviews_are_dropped():
+    filtered, stats = ReviewDeduplicator().filter_batch([
+        ProductCandidate(name="A", raw_reviews=["", {"text": "meh", "helpful": 0, "total_votes": 10}, {"text": LONG, "verified": True}])
+    ])
+
+    assert [r["text"] for r in filtered[0].raw_reviews] == [LONG]
+    assert stats["low_quality"] == 2
+
+def test_band_index_finds_every_fingerprint_within_the_distance():
+    deduplicator = ReviewDeduplicator(max_distance=3, bands=4)
+    mask = (1 << deduplicator.band_bits) - 1
+    keys = lambda fp: [(band, (fp >> (band * deduplicator.band_bits)) & mask) for band in range(4)]
+    indexed = 0x0123_4567_89AB_CDEF
+    index = {}
+    for key in keys(indexed):
+        index.setdefault(key, []).append((indexed, 0, True))
+
+    # One flipped bit in each of three bands: only the last band still matches exactly
+    three_bands = indexed ^ (1 | 1 << 16 | 1 << 32)
+    four_bands = three_bands ^ (1 << 48)
+
+    assert deduplicator._is_duplicate(index, keys(three_bands), three_bands, 0, True)
+    assert not deduplicator._is_duplicate(index, keys(four_bands), four_bands, 0, True)
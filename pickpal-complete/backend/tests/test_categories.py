@@ -0,0 +1,35 @@
+from src.common.categories import candidate_categories, detect_category
+
+def test_detects_clear_category():
+    assert detect_category("best wireless earbuds under $200") == "wireless_earbuds"
+    assert detect_category("gaming headphones") == "noise_canceling_headphones"
+
+def test_ambiguous_query_has_no_category_but_hinted_candidates():
+    assert detect_category("headphones or earbuds for running") is None
+    assert [category for category, _ in candidate_categories("headphones or earbuds for running")] == [
+        "wireless_earbuds", "noise_canceling_headphones"
+    ]
+
+def test_unrelated_query_has_no_candidates():
+    assert detect_category("coffee maker") is None
+    assert candidate_categories("coffee maker") == []
+
+async def test_ambiguous_query_merges_only_hinted_categories(offline_planner):
+    result = await offline_planner.handle_user_goal("headphones or earbuds for running", {})
+
+    assert result["categories"] == ["wireless_earbuds", "noise_canceling_headphones"]
+    assert {card["category"] for card in result["recommendations"]} == set(result["categories"])
+
+async def test_unrelated_query_runs_one_search(offline_planner):
+    searched = []
+    discover = offline_planner.discovery.discover_streaming
+
+    async def counting(brief, on_batch):
+        searched.append(brief.category)
+        return await discover(brief, on_batch)
+
+    offline_planner.discovery.discover_streaming = counting
+    result = await offline_planner.handle_user_goal("coffee maker", {})
+
+    assert searched == [None]
+    assert "categories" not in result
@@ -0,0 +1,34 @@
+from src.common.constraints import compile_constraints
+
+def product(name, price, stars=4.5, reviews=10):
+    return {"name": name, "price": price, "stars": stars, "reviews_count": reviews}
+
+def test_filters_keep_products_within_bounds():
+    items = [product("a", 99.0), product("b", 250.0), product("c", 150.0, stars=3.9)]
+    check = compile_constraints({"max_price": 200, "min_rating": 4.0}).check(items)
+
+    assert [item["name"] for item in check.kept()] == ["a"]
+    assert check.failed("max_price") and check.failed("min_rating")
+    assert [reason for _, reason in check.violations("max_price")] == ["price $250 > max $200"]
+
+def test_success_min_reviews_compiles_to_evidence_check():
+    constraints = compile_constraints({}, {"min_reviews": 5, "k": 5})
+    top = [product("a", 10.0, reviews=12), product("b", 10.0, reviews=3), product("c", 10.0, reviews=8)]
+
+    assert not constraints.check_evidence(top).ok
+    assert compile_constraints({}, {"min_reviews": 1}).check_evidence(top).ok
+
+def test_evidence_checks_only_the_top_results():
+    constraints = compile_constraints({}, {"min_reviews": 5})
+    ranked = [product(name, 10.0, reviews=9) for name in "abc"] + [product("d", 10.0, reviews=0)]
+
+    assert constraints.check_evidence(ranked).ok
+
+def test_no_success_criteria_means_no_evidence_check():
+    assert compile_constraints({"max_price": 100}).evidence == ()
+
+def test_narrows():
+    pool = compile_constraints({"max_price": 200})
+    assert compile_constraints({"max_price": 100, "min_rating": 4.5}).narrows(pool)
+    assert not compile_constraints({"max_price": 300}).narrows(pool)
+    assert not compile_constraints({}).narrows(pool)
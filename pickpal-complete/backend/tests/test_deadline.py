@@ -0,0 +1,47 @@
+import asyncio
+import time
+import pytest
+from src.common.deadline import Deadline, within
+
+def test_share_is_bounded_by_the_remaining_budget_and_cap():
+    deadline = Deadline(10.0)
+
+    assert deadline.share(0.5).budget == pytest.approx(5.0, abs=0.01)
+    assert deadline.share(0.5, cap=1.0).budget == 1.0
+    assert deadline.share(0.5).expires_at <= deadline.expires_at
+
+def test_sub_deadlines_report_degradation_once_for_the_request():
+    deadline = Deadline(10.0)
+
+    deadline.share(0.5).degrade("ranker: provisional ranking")
+    deadline.share(0.2).share(0.5).degrade("ranker: provisional ranking")
+    deadline.degrade("discovery: search expansion skipped")
+
+    assert deadline.degraded == ["ranker: provisional ranking", "discovery: search expansion skipped"]
+
+def test_expired_deadline_leaves_no_time():
+    deadline = Deadline(0.0, expires_at=time.monotonic() - 1)
+
+    assert deadline.expired
+    assert deadline.timeout(cap=5.0) == 0.0
+
+async def test_within_raises_past_the_deadline_or_cap():
+    with pytest.raises(asyncio.TimeoutError):
+        await within(Deadline(0.01), asyncio.sleep(1))
+    with pytest.raises(asyncio.TimeoutError):
+        await within(None, asyncio.sleep(1), cap=0.01)
+    assert await within(Deadline(1.0), asyncio.sleep(0, result="done")) == "done"
+
+async def test_expansion_timeout_without_a_deadline_keeps_the_candidates(offline_planner, monkeypatch):
+    async def expand(*args, **kwargs):
+        raise asyncio.TimeoutError()
+    monkeypatch.setattr(offline_planner.discovery, "_expand_search", expand)
+    trace = offline_planner.create_trace("r1", "discovery")
+    brief = offline_planner._build_shopping_brief("wireless earbuds", {}, trace)
+    candidate = {"name": "Acme Buds A1", "price": 99.0, "stars": 4.5, "url": "https://example.com/a1",
+                 "reviews_count": 120, "source": "amazon"}
+
+    candidates = await offline_planner.discovery._finalize_candidates([candidate], [], brief, "wireless_earbuds", trace)
+
+    assert trace.deadline is None
+    assert [c.name for c in candidates] == ["Acme Buds A1"]
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from src.ranker.diversity import DiversityReranker
+
+def naive_mmr(reranker, candidates, scores, prices, k, profiles, brands):
+    """MMR recomputing every pairwise similarity from its definition."""
+    pool_scores = scores[candidates]
+    spread = pool_scores.max() - pool_scores.min()
+    relevance = {c: (scores[c] - pool_scores.min()) / spread if spread > 0 else 1.0 for c in candidates}
+
+    def similarity(a, b):
+        total = 0.0
+        if prices[a] > 0 and prices[b] > 0:
+            diff_pct = abs(prices[a] - prices[b]) / max(prices[a], prices[b])
+            if diff_pct < reranker.price_window:
+                total += reranker.price_weight * (1 - diff_pct / reranker.price_window)
+        if brands[a] and brands[a] == brands[b]:
+            total += reranker.brand_weight
+        norm = np.linalg.norm(profiles[a]) * np.linalg.norm(profiles[b])
+        if norm > 0:
+            total += reranker.aspect_weight * min(max(profiles[a] @ profiles[b] / norm, 0), 1)
+        return total
+
+    picks = []
+    while len(picks) < min(k, len(candidates)):
+        best = max((c for c in candidates if c not in picks), key=lambda c: (
+            reranker.mmr_lambda * relevance[c]
+            - (1 - reranker.mmr_lambda) * max((similarity(c, p) for p in picks), default=0),
+            -candidates.index(c)))
+        picks.append(best)
+    return picks
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_mmr_matches_the_pairwise_definition(seed):
+    rng = np.random.default_rng(seed)
+    n = 30
+    scores = np.round(rng.uniform(5, 9, n), 2)
+    prices = np.round(rng.choice([0, 1], n, p=[0.1, 0.9]) * rng.uniform(50, 300, n), 2)
+    profiles = rng.uniform(-1, 1, (n, 4))
+    brands = [f"brand{b}" if b else "" for b in rng.integers(0, 5, n)]
+    candidates = [int(i) for i in np.argsort(-scores, kind="stable")[:20]]
+    reranker = DiversityReranker()
+
+    assert reranker.select(candidates, scores, prices, 5, aspect_profiles=profiles, brands=brands) == \
+           naive_mmr(reranker, candidates, scores, prices, 5, profiles, brands)
+
+def test_near_duplicate_gives_way_to_a_different_product():
+    scores = np.array([9.0, 8.9, 8.6, 7.0])
+    prices = np.array([199.0, 199.0, 89.0, 120.0])
+    brands = ["sony", "sony", "jabra", "anker"]
+
+    picks = DiversityReranker().select([0, 1, 2, 3], scores, prices, 3, brands=brands)
+
+    assert picks[:2] == [0, 2]
+    assert DiversityReranker(mmr_lambda=1.0).select([0, 1, 2, 3], scores, prices, 3, brands=brands) == [0, 1, 2]
@@ -0,0 +1,27 @@
+from src.common.messages import ProductCandidate, Trace
+from src.normalizer.agent import NormalizerAgent
+
+COPIED = "Battery easily lasts a full work day and the noise canceling blocks out the whole office"
+
+def candidate(name, reviews, source, trace):
+    return ProductCandidate(
+        name=name, price=99.0, stars=4.5, url=f"https://{source}.example/{name.split()[-1]}",
+        raw_reviews=[{"text": text, "verified": True, "helpful": 5, "total_votes": 5} for text in reviews],
+        meta={"source": source, "category": "wireless_earbuds"}, trace=trace
+    )
+
+async def test_final_pass_reuses_enrichments_from_prewarmed_batches():
+    normalizer = NormalizerAgent()
+    trace = Trace(request_id="r1", step="discovery", source_agent="discovery")
+    first = [candidate("Acme Buds A1", [COPIED, "Comfortable fit for long runs and quick pairing"], "amazon", trace)]
+    second = [candidate("Zeta Pods Z9", [COPIED + "!", "Sound is clear with punchy bass on every track"], "bestbuy", trace)]
+
+    # Sources finish in either order; the copied review only shows up once both are in
+    for batch in (second, first):
+        await normalizer.prewarm(batch, trace)
+    prewarmed = set(normalizer._enrichment_cache)
+
+    enriched = await normalizer.normalize_products(first + second)
+
+    assert set(normalizer._enrichment_cache) == prewarmed
+    assert [len(product.raw_reviews) for product in enriched] == [1, 2]
@@ -0,0 +1,34 @@
+import asyncio
+from src.discovery.cache import CandidatePoolCache
+
+KEY = ("mock_fallback", "wireless_earbuds", ("wireless earbuds",), 3)
+
+async def test_callers_never_share_any_part_of_a_candidate():
+    cache = CandidatePoolCache()
+    release = asyncio.Event()
+    fetches = 0
+
+    async def fetch():
+        nonlocal fetches
+        fetches += 1
+        await release.wait()
+        return [{"name": "Acme Buds A1", "reviews": [{"text": "Great fit", "helpful": 3}]}]
+
+    async def annotate():
+        pool = await cache.get_or_fetch(KEY, fetch)
+        pool[0]["evidence_score"] = 9
+        pool[0]["reviews"][0]["helpful"] = 100
+        pool[0]["reviews"].append({"text": "Added by this request"})
+        return pool
+
+    fetcher = asyncio.create_task(annotate())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get_or_fetch(KEY, fetch))
+    await asyncio.sleep(0)
+    release.set()
+    await fetcher
+
+    for pool in (await waiter, await cache.get_or_fetch(KEY, fetch)):
+        assert pool == [{"name": "Acme Buds A1", "reviews": [{"text": "Great fit", "helpful": 3}]}]
+    assert fetches == 1
+    assert cache.hits == 2
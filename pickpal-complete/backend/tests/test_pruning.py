@@ -0,0 +1,80 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from src.common.constraints import compile_constraints
+from src.common.messages import ProductCandidate, Trace
+from src.common.scoring import DEFAULT_WEIGHTS, select_top_k
+from src.normalizer.agent import NormalizerAgent
+from src.planner.agent import diversity_weights
+from src.ranker.agent import RankerAgent
+
+REVIEWS = [
+    "Comfortable fit for long runs and the battery lasts all day",
+    "Sound is clear with punchy bass, pairing was quick every time",
+    "Noise canceling works well on the train but the case feels cheap",
+    "Calls sound muffled outdoors, otherwise a solid pair for the price",
+]
+
+def candidates(n, seed=0):
+    rng = random.Random(seed)
+    trace = Trace(request_id=f"prune-{seed}", step="discovery", source_agent="discovery")
+    today = datetime.now()
+    return [
+        ProductCandidate(
+            name=f"Brand{i} Buds X{i}", price=round(rng.uniform(50, 300), 2), stars=round(rng.uniform(3, 5), 1),
+            url=f"https://example.com/x{i}",
+            raw_reviews=[
+                {"text": f"{text} ({i})", "verified": True, "helpful": rng.randint(0, 30), "total_votes": 30,
+                 "date": (today - timedelta(days=rng.randint(0, 500))).strftime("%Y-%m-%d")}
+                for text in rng.sample(REVIEWS, rng.randint(1, len(REVIEWS)))
+            ],
+            meta={"source": "mock", "category": "wireless_earbuds"}, trace=trace
+        )
+        for i in range(n)
+    ]
+
+@pytest.mark.parametrize("seed", range(3))
+async def test_pruning_bounds_hold_and_keep_every_top_k_product(seed):
+    pool = candidates(40, seed)
+    ranker = RankerAgent(pool_factor=1)
+    budget = compile_constraints({"max_price": 120})
+    rankings = [(DEFAULT_WEIGHTS, None), (DEFAULT_WEIGHTS, budget), (diversity_weights(DEFAULT_WEIGHTS), budget)]
+    survivors = {c.name for c in ranker.prune_candidates(pool, DEFAULT_WEIGHTS, alternatives=rankings[1:])}
+    assert len(survivors) < len(pool)
+
+    enriched = await NormalizerAgent().normalize_products(pool)
+    assert len(enriched) == len(pool)
+    features = ranker.build_features(enriched)
+    names = [product.name for product in enriched]
+    by_name = {c.name: c for c in pool}
+
+    for weights, constraints in rankings:
+        scores, _ = features.scores(weights)
+        lower, upper = ranker._score_bounds([by_name[name] for name in names], weights)
+        # Scores are rounded to 0.01
+        assert (scores >= lower - 0.005).all() and (scores <= upper + 0.005).all()
+        allowed = {p.name for p in constraints.check(enriched).kept()} if constraints else set(names)
+        rows = [row for row, name in enumerate(names) if name in allowed]
+        assert {names[rows[i]] for i in select_top_k(scores[rows], 3)} <= survivors
+
+def test_pruning_keeps_contenders_of_the_adapted_rankings():
+    trace = Trace(request_id="prune-budget", step="discovery", source_agent="discovery")
+    review = {"text": REVIEWS[0], "verified": True, "helpful": 5, "total_votes": 5,
+              "date": datetime.now().strftime("%Y-%m-%d")}
+    pool = [
+        ProductCandidate(name=f"Premium Buds P{i}", price=250.0, stars=5.0, url=f"https://example.com/p{i}",
+                         raw_reviews=[review], meta={}, trace=trace)
+        for i in range(6)
+    ] + [
+        ProductCandidate(name=f"Budget Buds B{i}", price=60.0, stars=2.5 - i / 10, url=f"https://example.com/b{i}",
+                         raw_reviews=[review], meta={}, trace=trace)
+        for i in range(6)
+    ]
+    ranker = RankerAgent(pool_factor=1)
+    budget = compile_constraints({"max_price": 100})
+
+    assert all(c.price > 100 for c in ranker.prune_candidates(pool, DEFAULT_WEIGHTS))
+    survivors = ranker.prune_candidates(pool, DEFAULT_WEIGHTS, alternatives=[(DEFAULT_WEIGHTS, budget)])
+    assert {c.name for c in ranker.contenders(pool, DEFAULT_WEIGHTS, constraints=budget)} <= \
+           {c.name for c in survivors}
+    assert {"Budget Buds B0", "Budget Buds B1", "Budget Buds B2"} <= {c.name for c in survivors}
@@ -0,0 +1,56 @@
+import pytest
+from src.common.messages import ProductCandidate
+from src.planner.agent import PlannerAgent
+from src.planner.memory import SessionState
+
+@pytest.fixture
+def planner():
+    return PlannerAgent()
+
+@pytest.mark.parametrize("query, expected", [
+    ("same but at least 4.5 stars", {"min_rating": 4.5}),
+    ("under 4.5 stars", {"min_rating": 4.5}),
+    ("same but under $100", {"max_price": 100.0}),
+    ("same but under 99.99.", {"max_price": 99.99}),
+    ("over $50 and 4+ stars", {"min_price": 50.0, "min_rating": 4.0}),
+])
+def test_parse_bounds_keeps_ratings_out_of_prices(planner, query, expected):
+    assert planner._parse_bounds(query.lower(), {}) == expected
+
+def test_refined_brief_keeps_price_bounds_for_rating_follow_up(planner):
+    trace = planner.create_trace("r1", "parse")
+    previous = planner._build_shopping_brief("wireless earbuds", {"max_price": 200}, trace)
+
+    refined = planner._refine_brief(previous, "same but at least 4.5 stars", {}, trace)
+
+    assert refined.constraints == {"max_price": 200, "min_rating": 4.5}
+
+async def test_follow_up_refines_the_search_answered_from_the_result_cache(offline_planner):
+    await offline_planner.handle_user_goal("standing desk")
+
+    await offline_planner.handle_user_goal("wireless earbuds", session_id="s")
+    cached = await offline_planner.handle_user_goal("standing desk", session_id="s")
+    follow_up = await offline_planner.handle_user_goal("same but under $400", session_id="s")
+
+    assert offline_planner.sessions.get("s").brief.category == "standing_desk"
+    assert {card["name"] for card in cached["recommendations"]}.isdisjoint(
+        card["name"] for card in follow_up["recommendations"])
+    assert follow_up["recommendations"]
+    assert all("desk" in card["name"].lower() and card["price"] <= 400 for card in follow_up["recommendations"])
+
+async def test_refinement_needing_pruned_candidates_goes_back_to_discovery(planner):
+    trace = planner.create_trace("r1", "parse")
+    brief = planner._build_shopping_brief("standing desk", {"max_price": 1000}, trace)
+    discovered = [ProductCandidate(name=f"Premium Desk {i}", price=500.0, stars=5.0, trace=trace) for i in range(10)] + \
+                 [ProductCandidate(name=f"Budget Desk {i}", price=150.0, stars=3.0, trace=trace) for i in range(10)]
+    pool = planner.ranker.prune_candidates(discovered, brief.weights)
+    session = SessionState(brief=brief, pool_constraints=dict(brief.constraints),
+                           enriched=await planner.normalizer.normalize_products(pool), candidates=discovered,
+                           pruned=[c for c in discovered if c not in pool])
+    assert session.pruned
+
+    cheaper = planner._refine_brief(brief, "same but under $200", {}, trace)
+    better = planner._refine_brief(brief, "same but at least 4.5 stars", {}, trace)
+
+    assert not planner._pool_covers(session, cheaper)
+    assert planner._pool_covers(session, better)
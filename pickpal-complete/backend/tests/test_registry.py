@@ -0,0 +1,43 @@
+from src.normalizer.registry import CanonicalRegistry
+
+def test_fuzzy_fallback_never_merges_different_model_numbers():
+    registry = CanonicalRegistry(path="")
+    batch = {}
+
+    xm4 = registry.resolve("Sony WF-1000XM4", "", batch)
+    xm5 = registry.resolve("Sony WF-1000XM5", "", batch)
+
+    assert xm4 != xm5
+
+def test_fuzzy_matches_hold_for_their_batch_only():
+    registry = CanonicalRegistry(path="")
+    batch = {}
+
+    desk = registry.resolve("Jarvis Bamboo Standing Desk", "https://a.example/jarvis", batch)
+    typo = registry.resolve("Jarvis Bambo Standing Desk", "https://b.example/jarvis", batch)
+
+    assert typo == desk
+    assert "name:jarvis bambo standing desk" not in registry._aliases
+    assert "url:b.example/jarvis" not in registry._aliases
+
+def test_alias_index_is_bounded():
+    registry = CanonicalRegistry(path="", max_aliases=2)
+
+    for name in ["Sony WF-1000XM4", "Apple AirPods Pro 2", "Bose QC45"]:
+        registry.resolve(name)
+
+    assert list(registry._aliases) == ["name:apple airpods pro 2", "name:bose qc45"]
+    assert "sony" not in registry._trie
+
+async def test_aliases_persist_across_restarts(tmp_path):
+    path = str(tmp_path / "registry.db")
+    registry = CanonicalRegistry(path=path)
+    await registry.load()
+    canonical_id = registry.resolve("Sony WF-1000XM4", "https://example.com/xm4")
+    await registry.flush()
+
+    restarted = CanonicalRegistry(path=path)
+    await restarted.load()
+
+    assert restarted.resolve("Sony WF-1000XM4 Noise Canceling Earbuds") == canonical_id
+    assert restarted.resolve("Sony WF1000XM4", "https://example.com/xm4") == canonical_id
@@ -0,0 +1,65 @@
+import asyncio
+from src.planner.cache import PlannerResultCache
+
+def result(name="a"):
+    return {"success": True, "recommendations": [{"name": name}], "degraded": []}
+
+async def test_concurrent_misses_share_one_computation():
+    cache = PlannerResultCache(path="")
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return result()
+
+    outcomes = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+    assert calls == 1
+    assert [status for _, status in outcomes] == ["miss"] * 5
+    assert (await cache.get_or_compute("k", compute))[1] == "hit"
+
+async def test_degraded_results_are_not_cached():
+    cache = PlannerResultCache(path="")
+    await cache.put("k", {**result(), "degraded": ["discovery: amazon timed out"]})
+    assert cache.get("k") is None
+
+async def test_waiters_recompute_when_the_computing_caller_is_cancelled():
+    cache = PlannerResultCache(path="")
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def fast():
+        return result("b")
+
+    owner = asyncio.create_task(cache.get_or_compute("k", slow))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get_or_compute("k", fast))
+    await asyncio.sleep(0)
+    owner.cancel()
+
+    assert (await waiter)[0]["recommendations"] == [{"name": "b"}]
+
+async def test_sqlite_tier_survives_restart_and_invalidation(tmp_path):
+    path = str(tmp_path / "results.db")
+    cache = PlannerResultCache(path=path)
+    await cache.put("k", result(), category="standing_desk")
+    await cache.close()
+
+    restarted = PlannerResultCache(path=path)
+    invalidated = []
+    restarted.add_invalidation_hook(invalidated.append)
+
+    async def compute():
+        raise AssertionError("should be served from disk")
+
+    assert (await restarted.get_or_compute("k", compute))[1] == "hit"
+    assert await restarted.invalidate("standing_desk") == 1
+    assert invalidated == ["standing_desk"]
+    await restarted.close()
+
+    reopened = PlannerResultCache(path=path)
+    assert await reopened._load("k") is None
+    await reopened.close()
@@ -0,0 +1,23 @@
+import pytest
+from src.common.sentiment import LexiconSentimentEngine
+
+@pytest.fixture
+def engine():
+    return LexiconSentimentEngine()
+
+def test_negators_flip_the_terms_that_follow(engine):
+    assert engine.score_batch(["the fit is great", "the fit is not great", "never had any problems"]) == [1.0, -1.0, 1.0]
+
+def test_negation_stops_at_clause_boundaries_and_the_window(engine):
+    scores = engine.score_batch([
+        "not loud, but great sound",  # "great" is in the next clause
+        "not what i would call a great fit"  # "great" is too far from "not"
+    ])
+
+    assert scores == [1.0, 1.0]
+
+def test_negation_does_not_leak_into_the_next_sentence(engine):
+    assert engine.score_batch(["it is not", "great battery"]) == [0.0, 1.0]
+
+def test_apostrophe_variants_negate(engine):
+    assert engine.score_batch(["doesn't feel cheap", "doesn’t feel cheap"]) == [1.0, 1.0]
@@ -0,0 +1,40 @@
+import random
+import pytest
+from src.common.messages import EnrichedProduct, Trace
+from src.ranker.agent import RankerAgent
+
+def products(n, seed=0):
+    rng = random.Random(seed)
+    trace = Trace(request_id=f"stream-{seed}", step="normalize", source_agent="normalizer")
+    return [
+        EnrichedProduct(
+            name=f"Brand{i % 7} Model {i}", price=round(rng.uniform(50, 400), 2), stars=round(rng.uniform(3, 5), 1),
+            url=f"https://example.com/{i}", raw_reviews=[], aspects={"comfort": rng.random()},
+            quality_signals={"recency_days_p50": rng.randint(0, 400), "avg_helpful": rng.uniform(0, 10),
+                             "rating_variance": rng.uniform(0, 1)},
+            meta={"category": "wireless_earbuds"}, trace=trace
+        )
+        for i in range(n)
+    ]
+
+@pytest.mark.parametrize("seed", range(5))
+async def test_streaming_matches_a_full_ranking(seed):
+    enriched = products(40, seed)
+    ranker = RankerAgent()
+    stream = ranker.stream()
+    for start in range(0, len(enriched), 7):
+        stream.extend(enriched[start:start + 7])
+
+    full = await RankerAgent().rank_products(enriched)
+
+    assert [(item.name, item.score) for item in stream.provisional().items] == \
+           [(item.name, item.score) for item in full.items]
+
+def test_stream_keeps_a_bounded_pool():
+    ranker = RankerAgent(pool_factor=4)
+    stream = ranker.stream(topk=3)
+
+    stream.extend(products(40))
+
+    assert stream.seen == 40
+    assert len(stream) == 12
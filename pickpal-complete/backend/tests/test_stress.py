@@ -0,0 +1,112 @@
+"""Concurrency stress test for one shared PlannerAgent.
+
+Runs many overlapping searches through a single planner, as app/main.py
+does for all requests. Every result must match the same search run alone,
+and every log line must carry the id of the request whose task (or one of
+its subtasks) logged it: per-request state leaking between concurrent
+requests shows up as either. Only the offline mock catalog source is used
+and the result cache is bypassed, so every search runs the full pipeline.
+"""
+import asyncio
+import logging
+import random
+import pytest
+from src.common.utils import logger
+from src.planner.agent import PlannerAgent
+from src.planner.cache import PlannerResultCache
+
+SEARCHES = [
+    ("best wireless earbuds under $200", {"max_price": 200}),
+    ("wireless earbuds for running", {"max_price": 150}),
+    ("wireless earbuds for work calls", {}),
+    ("standing desk for small spaces", {}),
+    ("standing desk", {"max_price": 500}),
+    ("gaming laptop with good battery life", {}),
+    ("gaming laptop", {"max_price": 1500}),
+    ("noise canceling headphones for travel", {"max_price": 400}),
+    ("headphones or earbuds for running", {}),  # Ambiguous: searched in several categories
+    ("gift for dad", {"max_price": 300})  # No category at all: one search on its own words
+]
+
+class UncachedResults(PlannerResultCache):
+    """Computes every result: no cache hits and no sharing of in-flight computations."""
+
+    async def get_or_compute(self, key, compute, refresh=None, category=""):
+        return await compute(), "miss"
+
+class RequestLog(logging.Handler):
+    """Log records paired with the request whose task logged them."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        task = asyncio.current_task()
+        self.records.append((getattr(task, "origin", None), getattr(record, "request_id", None), record))
+
+def origin_task_factory(loop, coro, **kwargs):
+    """Tasks remember the request of the task that created them."""
+    task = asyncio.Task(coro, loop=loop, **kwargs)
+    task.origin = getattr(asyncio.current_task(loop), "origin", None)
+    return task
+
+def new_planner() -> PlannerAgent:
+    planner = PlannerAgent(result_cache=UncachedResults())
+    for name, config in planner.discovery.sources.items():
+        config["enabled"] = name == "mock_fallback"
+    return planner
+
+def fingerprint(result: dict):
+    return result["success"], [(card["name"], card["price"]) for card in result["recommendations"]]
+
+async def close(planner: PlannerAgent):
+    if planner.discovery.session is not None:
+        await planner.discovery.session.close()
+
+@pytest.fixture
+async def request_log():
+    loop = asyncio.get_running_loop()
+    factory = loop.get_task_factory()
+    handler = RequestLog()
+    logging.disable(logging.NOTSET)
+    logger.addHandler(handler)
+    loop.set_task_factory(origin_task_factory)
+    yield handler
+    loop.set_task_factory(factory)
+    logger.removeHandler(handler)
+
+async def test_concurrent_searches_keep_their_results_and_log_lines_apart(request_log):
+    planner = new_planner()
+    expected = [fingerprint(await planner.handle_user_goal(query, dict(constraints)))
+                for query, constraints in SEARCHES]
+    await close(planner)
+    request_log.records.clear()
+
+    planner = new_planner()
+    rng = random.Random(0)
+    picks = [rng.randrange(len(SEARCHES)) for _ in range(120)]
+
+    async def search(request_id: str, index: int):
+        query, constraints = SEARCHES[index]
+        return await planner.handle_user_goal(query, dict(constraints), request_id=request_id)
+
+    tasks = []
+    for number, index in enumerate(picks):
+        task = asyncio.create_task(search(f"stress-{number}", index))
+        task.origin = f"stress-{number}"
+        tasks.append(task)
+    results = await asyncio.gather(*tasks)
+    await close(planner)
+
+    for number, (index, result) in enumerate(zip(picks, results)):
+        assert fingerprint(result) == expected[index], SEARCHES[index][0]
+        assert not result["success"] or result["request_id"] == f"stress-{number}"
+
+    logged = [(origin, request_id, record) for origin, request_id, record in request_log.records if origin]
+    assert {origin for origin, _, _ in logged} == {f"stress-{number}" for number in range(len(picks))}
+    # Searches across several categories log under "<request id>:<category>"
+    mixed_up = [f"[{request_id}] in {origin}: {record.getMessage()}"
+                for origin, request_id, record in logged
+                if request_id != origin and not str(request_id).startswith(f"{origin}:")]
+    assert not mixed_up, "\n".join(mixed_up[:5])